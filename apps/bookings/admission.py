@@ -0,0 +1,109 @@
+"""
+Booking admission
+Saves bookings only while the provider has free capacity for the slot,
+serializing concurrent admissions per provider and day
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from bookings.availability import BLOCKING_STATUSES, DEFAULT_CAPACITY, LoadProfile, minute_offset
+from bookings.models import Booking, ProviderDayLock
+from users.models import ServiceProviderProfile
+
+
+class SlotUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The provider has no free capacity for this time slot.'
+    default_code = 'slot_unavailable'
+
+
+def booking_days(booking):
+    """
+    Calendar days a booking occupies, in ascending order
+    """
+    end = minute_offset(
+        booking.scheduled_date, booking.scheduled_date, booking.scheduled_time
+    ) + max(booking.estimated_duration_minutes, 1) - 1
+    return [
+        booking.scheduled_date + timedelta(days=offset)
+        for offset in range(end // (24 * 60) + 1)
+    ]
+
+
+def provider_capacity(provider_id):
+    capacity = ServiceProviderProfile.objects.filter(
+        user_id=provider_id
+    ).values_list('max_concurrent_bookings', flat=True).first()
+    return capacity or DEFAULT_CAPACITY
+
+
+def peak_load(booking):
+    """
+    Highest number of other holding bookings overlapping this one
+    """
+    origin = booking.scheduled_date
+    days = booking_days(booking)
+
+    # Bookings from the previous day can run past midnight into this one
+    rows = Booking.objects.filter(
+        provider_id=booking.provider_id,
+        status__in=BLOCKING_STATUSES,
+        scheduled_date__gte=origin - timedelta(days=1),
+        scheduled_date__lte=days[-1]
+    )
+    if booking.pk:
+        rows = rows.exclude(pk=booking.pk)
+
+    intervals = []
+    for day, clock, duration in rows.order_by().values_list(
+        'scheduled_date', 'scheduled_time', 'estimated_duration_minutes'
+    ):
+        start = minute_offset(origin, day, clock)
+        intervals.append((start, start + duration))
+
+    start = minute_offset(origin, origin, booking.scheduled_time)
+    return LoadProfile(intervals).peak(start, start + booking.estimated_duration_minutes)
+
+
+def lock_provider_days(provider_id, days):
+    """
+    Take the admission locks for a provider on the given (sorted) days
+
+    The conditional insert creates missing lock rows without racing, and
+    the UPDATE takes a row lock on each that is held until commit. Days are
+    locked in ascending order so overlapping admissions cannot deadlock.
+    """
+    ProviderDayLock.objects.bulk_create(
+        [ProviderDayLock(provider_id=provider_id, date=day) for day in days],
+        ignore_conflicts=True
+    )
+    for day in days:
+        ProviderDayLock.objects.filter(
+            provider_id=provider_id,
+            date=day
+        ).update(version=F('version') + 1)
+
+
+def admit_booking(booking, capacity=None, update_fields=None):
+    """
+    Save a new or rescheduled booking if the provider has capacity
+    Raises SlotUnavailable otherwise; update_fields is passed to save()
+    """
+    if capacity is None:
+        capacity = provider_capacity(booking.provider_id)
+
+    # Unlocked pre-check rejects full slots without queueing on the lock
+    if peak_load(booking) >= capacity:
+        raise SlotUnavailable()
+
+    with transaction.atomic():
+        lock_provider_days(booking.provider_id, booking_days(booking))
+        if peak_load(booking) >= capacity:
+            raise SlotUnavailable()
+        booking.save(update_fields=update_fields)
+
+    return booking
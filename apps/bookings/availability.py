@@ -0,0 +1,162 @@
+"""
+Availability engine
+Computes bookable slots from ServiceAvailability windows minus existing
+bookings, honoring each provider's max_concurrent_bookings
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from bookings.models import Booking
+from services.models import ServiceAvailability
+from users.models import ServiceProviderProfile
+
+# Statuses that occupy provider capacity, for both the slot finder and
+# admission. Pending bookings hold capacity too, otherwise concurrent
+# requests could all be admitted before any of them is confirmed
+BLOCKING_STATUSES = [
+    Booking.BookingStatus.PENDING,
+    Booking.BookingStatus.CONFIRMED,
+    Booking.BookingStatus.IN_PROGRESS,
+]
+
+DEFAULT_CAPACITY = 1
+MINUTES_PER_DAY = 24 * 60
+
+
+class LoadProfile:
+    """
+    Piecewise-constant count of concurrent bookings over time
+
+    Built with one sweep over booking intervals (in minutes), then queried
+    for the peak load inside any window with a binary search.
+    """
+
+    def __init__(self, intervals):
+        events = defaultdict(int)
+        for start, end in intervals:
+            if end > start:
+                events[start] += 1
+                events[end] -= 1
+
+        self.starts = []
+        self.ends = []
+        self.loads = []
+
+        load = 0
+        points = sorted(events)
+        for index, point in enumerate(points[:-1]):
+            load += events[point]
+            if load > 0:
+                self.starts.append(point)
+                self.ends.append(points[index + 1])
+                self.loads.append(load)
+
+    def peak(self, start, end):
+        """
+        Highest concurrent load anywhere in [start, end)
+        """
+        # Last segment starting at or before `start` may still overlap it
+        index = max(bisect_right(self.starts, start) - 1, 0)
+        peak = 0
+        while index < len(self.starts) and self.starts[index] < end:
+            if self.ends[index] > start:
+                peak = max(peak, self.loads[index])
+            index += 1
+        return peak
+
+
+def minute_offset(origin, day, clock):
+    """Minutes between origin date midnight and (day, clock)"""
+    return (day - origin).days * MINUTES_PER_DAY + clock.hour * 60 + clock.minute
+
+
+def _clock(minutes):
+    minutes %= MINUTES_PER_DAY
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def find_available_slots(provider_ids, start_date, end_date, duration_minutes=60, step_minutes=30):
+    """
+    Bookable slots for many providers over [start_date, end_date]
+
+    Issues three queries regardless of the number of providers or days.
+    Returns {provider_id: [{'date', 'start', 'end', 'remaining_capacity'}]}.
+    """
+    provider_ids = list(provider_ids)
+
+    windows = defaultdict(lambda: defaultdict(list))
+    for provider_id, day, start, end in ServiceAvailability.objects.filter(
+        provider_id__in=provider_ids,
+        is_available=True
+    ).values_list('provider_id', 'day_of_week', 'start_time', 'end_time'):
+        windows[provider_id][day].append((start, end))
+
+    capacities = dict(
+        ServiceProviderProfile.objects.filter(
+            user_id__in=provider_ids
+        ).order_by().values_list('user_id', 'max_concurrent_bookings')
+    )
+
+    # Bookings from the previous day can run past midnight into the range
+    busy = defaultdict(list)
+    for provider_id, day, clock, duration in Booking.objects.filter(
+        provider_id__in=provider_ids,
+        status__in=BLOCKING_STATUSES,
+        scheduled_date__gte=start_date - timedelta(days=1),
+        scheduled_date__lte=end_date
+    ).order_by().values_list('provider_id', 'scheduled_date', 'scheduled_time', 'estimated_duration_minutes'):
+        start = minute_offset(start_date, day, clock)
+        busy[provider_id].append((start, start + duration))
+
+    now = timezone.localtime()
+    earliest = None
+    if start_date <= now.date() <= end_date:
+        earliest = minute_offset(start_date, now.date(), now.time()) + 1
+
+    results = {}
+    for provider_id in provider_ids:
+        capacity = capacities.get(provider_id) or DEFAULT_CAPACITY
+        profile = LoadProfile(busy[provider_id])
+        slots = []
+
+        day = start_date
+        while day <= end_date:
+            seen = set()
+            for window_start, window_end in sorted(windows[provider_id].get(day.weekday(), [])):
+                first = minute_offset(start_date, day, window_start)
+                last = minute_offset(start_date, day, window_end) - duration_minutes
+
+                for slot_start in range(first, last + 1, step_minutes):
+                    if slot_start in seen or (earliest is not None and slot_start < earliest):
+                        continue
+                    seen.add(slot_start)
+
+                    load = profile.peak(slot_start, slot_start + duration_minutes)
+                    if load >= capacity:
+                        continue
+                    slots.append({
+                        'date': day.isoformat(),
+                        'start': _clock(slot_start),
+                        'end': _clock(slot_start + duration_minutes),
+                        'remaining_capacity': capacity - load,
+                    })
+            day += timedelta(days=1)
+
+        results[provider_id] = slots
+
+    return results
+
+
+def is_slot_available(provider_id, scheduled_date, scheduled_time, duration_minutes):
+    """
+    Whether a single booking fits the provider's windows and capacity
+    """
+    slots = find_available_slots(
+        [provider_id], scheduled_date, scheduled_date,
+        duration_minutes=duration_minutes, step_minutes=1
+    )[provider_id]
+    wanted = scheduled_time.strftime('%H:%M')
+    return any(slot['start'] == wanted for slot in slots)
@@ -0,0 +1,53 @@
+"""
+Booking counters
+Keep the booking totals on services and provider profiles in step with
+booking rows using atomic F() deltas
+"""
+from collections import Counter
+
+from django.utils import timezone
+
+from core.counters import apply_deltas
+
+
+def signed(counts, sign):
+    return {key: count * sign for key, count in counts.items()}
+
+
+def count_completions(provider_ids, sign=1):
+    """
+    Add (sign=-1: remove) completed bookings to provider counters: one
+    UPDATE per distinct increment rather than one read-modify-write per
+    booking
+    """
+    from users.models import ServiceProviderProfile
+    
+    apply_deltas(
+        ServiceProviderProfile, 'completed_bookings',
+        signed(Counter(provider_ids), sign), key='user_id', updated_at=timezone.now()
+    )
+
+
+def count_bookings(bookings, sign=1):
+    """
+    Add (sign=-1: remove) bookings to their service and provider totals
+    """
+    from bookings.models import Booking
+    from services.models import Service
+    from users.models import ServiceProviderProfile
+    
+    bookings = list(bookings)
+    # Bump updated_at too: cached list rows are keyed on it
+    now = timezone.now()
+    apply_deltas(
+        Service, 'booking_count',
+        signed(Counter(booking.service_id for booking in bookings), sign), updated_at=now
+    )
+    apply_deltas(
+        ServiceProviderProfile, 'total_bookings',
+        signed(Counter(booking.provider_id for booking in bookings), sign), key='user_id', updated_at=now
+    )
+    count_completions([
+        booking.provider_id for booking in bookings
+        if booking.status == Booking.BookingStatus.COMPLETED
+    ], sign)
@@ -0,0 +1,117 @@
+"""
+Booking notification events
+Events for booking changes, emailed through the outbox, added to the
+in-app feeds of the people involved and pushed to their open streams
+"""
+from django.db.models import Max, Q
+
+from bookings.models import BookingStatusHistory
+from notifications import push
+from notifications.feed import publish
+from notifications.models import OutboxMessage
+from notifications.outbox import Event, enqueue
+
+STATUS_EVENT = 'booking.status'
+
+
+def notify(events):
+    """
+    Queue emails and fan out feed entries; call inside the transaction
+    making the change
+    """
+    events = list(events)
+    enqueue(events)
+    publish(events)
+
+
+def booking_payload(booking, **extra):
+    return {
+        'booking_reference': booking.booking_reference,
+        'service_title': booking.service.title,
+        'scheduled_date': str(booking.scheduled_date),
+        'scheduled_time': str(booking.scheduled_time),
+        **extra
+    }
+
+
+def booking_created_events(booking):
+    """
+    New-booking email for the provider and confirmation for the customer
+    """
+    kind = OutboxMessage.Kind.BOOKING_CREATED
+    return [
+        Event(
+            booking.provider_id,
+            kind,
+            booking_payload(booking, role='provider', customer_name=booking.customer.full_name),
+            f'booking:{booking.pk}:created:provider'
+        ),
+        Event(
+            booking.customer_id,
+            kind,
+            booking_payload(booking, role='customer', provider_name=booking.provider.full_name),
+            f'booking:{booking.pk}:created:customer'
+        ),
+    ]
+
+
+def status_changed_events(booking, from_status):
+    """
+    Status update for the customer and provider
+    Transitions never repeat, so (booking, from, to) identifies the event
+    """
+    payload = booking_payload(booking, from_status=from_status, status=booking.status)
+    key = f'booking:{booking.pk}:{from_status}:{booking.status}'
+    return [
+        Event(booking.customer_id, OutboxMessage.Kind.BOOKING_STATUS, payload, f'{key}:customer'),
+        Event(booking.provider_id, OutboxMessage.Kind.BOOKING_STATUS, payload, f'{key}:provider'),
+    ]
+
+
+def status_history_data(history):
+    return {
+        'id': history.pk,
+        'booking_reference': history.booking.booking_reference,
+        'from_status': history.from_status,
+        'to_status': history.to_status,
+        'changed_by': history.changed_by_id,
+        'created_at': history.created_at.isoformat(),
+    }
+
+
+def status_push_events(history):
+    """
+    Push events for new status history rows, for the customer and provider
+    """
+    return [
+        push.PushEvent(
+            (row.booking.customer_id, row.booking.provider_id),
+            STATUS_EVENT,
+            status_history_data(row),
+            row.pk
+        )
+        for row in history
+    ]
+
+
+def user_status_history(user_id):
+    return BookingStatusHistory.objects.filter(
+        Q(booking__customer_id=user_id) | Q(booking__provider_id=user_id)
+    )
+
+
+def status_history_since(user_id, last_id, limit):
+    """
+    Push events a stream missed after last_id, oldest first, at most limit
+    """
+    history = user_status_history(user_id).filter(
+        pk__gt=last_id
+    ).select_related('booking').order_by('pk')[:limit]
+    return status_push_events(history)
+
+
+def latest_status_history_id(user_id):
+    """
+    Id of the newest status event for the user's bookings, or None
+    """
+    return user_status_history(user_id).aggregate(latest=Max('pk'))['latest']
@@ -0,0 +1,179 @@
+"""
+Management command to benchmark booking admission under contention
+Hammers a single provider slot from many threads and verifies capacity holds
+Usage: python manage.py benchmark_booking_admission [--threads N] [--attempts N] [--capacity N]
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, time as clock, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from bookings.admission import SlotUnavailable, admit_booking
+from bookings.availability import LoadProfile, minute_offset
+from bookings.models import Booking, ProviderDayLock
+from services.models import ServiceCategory, Service
+from users.models import User, ServiceProviderProfile
+
+
+class Command(BaseCommand):
+    help = 'Measure booking admission throughput and check for overbooking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=10, help='Attempts per thread')
+        parser.add_argument('--capacity', type=int, default=3, help='Provider max_concurrent_bookings')
+        parser.add_argument('--slots', type=int, default=2, help='Distinct overlapping start times to contend on')
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        fixtures = self.create_fixtures(suffix, options['capacity'])
+        try:
+            self.run(fixtures, options)
+        finally:
+            self.delete_fixtures(fixtures)
+
+    def create_fixtures(self, suffix, capacity):
+        digits = str(int(suffix, 16))[-8:]
+        customer = User.objects.create_user(
+            email=f'bench-customer-{suffix}@example.com',
+            password=None,
+            first_name='Bench',
+            last_name='Customer',
+            phone=f'+70{digits}',
+            role=User.UserRole.CUSTOMER
+        )
+        provider = User.objects.create_user(
+            email=f'bench-provider-{suffix}@example.com',
+            password=None,
+            first_name='Bench',
+            last_name='Provider',
+            phone=f'+71{digits}',
+            role=User.UserRole.SERVICE_PROVIDER
+        )
+        ServiceProviderProfile.objects.create(
+            user=provider,
+            business_name='Benchmark',
+            business_description='Admission benchmark',
+            max_concurrent_bookings=capacity
+        )
+        category = ServiceCategory.objects.create(
+            name=f'Benchmark {suffix}',
+            slug=f'benchmark-{suffix}'
+        )
+        service = Service.objects.create(
+            title='Benchmark service',
+            slug=f'benchmark-{suffix}',
+            description='Admission benchmark',
+            short_description='Admission benchmark',
+            provider=provider,
+            category=category,
+            base_price=100
+        )
+        return {
+            'customer': customer,
+            'provider': provider,
+            'category': category,
+            'service': service,
+            'capacity': capacity,
+        }
+
+    def delete_fixtures(self, fixtures):
+        Booking.objects.filter(provider=fixtures['provider']).delete()
+        ProviderDayLock.objects.filter(provider=fixtures['provider']).delete()
+        fixtures['service'].delete()
+        fixtures['category'].delete()
+        fixtures['provider'].delete()
+        fixtures['customer'].delete()
+
+    def run(self, fixtures, options):
+        scheduled_date = date.today() + timedelta(days=1)
+        # Start times 30 minutes apart so 60 minute bookings overlap pairwise
+        starts = [clock(10, 0)] + [
+            clock(10 + (index * 30) // 60, (index * 30) % 60)
+            for index in range(1, options['slots'])
+        ]
+        outcomes = Counter()
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+
+        def worker(worker_index):
+            local = Counter()
+            local_latencies = []
+            try:
+                barrier.wait()
+                for attempt in range(options['attempts']):
+                    booking = Booking(
+                        customer=fixtures['customer'],
+                        provider=fixtures['provider'],
+                        service=fixtures['service'],
+                        scheduled_date=scheduled_date,
+                        scheduled_time=starts[(worker_index + attempt) % len(starts)],
+                        estimated_duration_minutes=60,
+                        service_address='1 Benchmark Way',
+                        service_city='Bench',
+                        service_state='BN',
+                        service_postal_code='00000',
+                        base_price=100
+                    )
+                    began = time.perf_counter()
+                    try:
+                        admit_booking(booking, capacity=fixtures['capacity'])
+                        local['admitted'] += 1
+                    except SlotUnavailable:
+                        local['rejected'] += 1
+                    except Exception:
+                        local['errors'] += 1
+                    local_latencies.append(time.perf_counter() - began)
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(local)
+                    latencies.extend(local_latencies)
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(options['threads'])
+        ]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        intervals = []
+        for day, start, duration in Booking.objects.filter(
+            provider=fixtures['provider']
+        ).values_list('scheduled_date', 'scheduled_time', 'estimated_duration_minutes'):
+            offset = minute_offset(scheduled_date, day, start)
+            intervals.append((offset, offset + duration))
+        peak = LoadProfile(intervals).peak(0, 24 * 60)
+
+        latencies.sort()
+        attempts = sum(outcomes.values())
+        p50 = latencies[len(latencies) // 2] if latencies else 0
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+
+        self.stdout.write(f"Threads: {options['threads']}, attempts: {attempts}")
+        self.stdout.write(
+            f"Admitted: {outcomes['admitted']}, rejected: {outcomes['rejected']}, "
+            f"errors: {outcomes['errors']}"
+        )
+        self.stdout.write(
+            f"Elapsed: {elapsed:.3f}s, throughput: {attempts / elapsed:.1f} attempts/s, "
+            f"p50: {p50 * 1000:.1f}ms, p99: {p99 * 1000:.1f}ms"
+        )
+
+        if peak > fixtures['capacity']:
+            self.stdout.write(self.style.ERROR(
+                f"Overbooked: peak concurrency {peak} exceeds capacity {fixtures['capacity']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Peak concurrency {peak} within capacity {fixtures['capacity']}"
+            ))
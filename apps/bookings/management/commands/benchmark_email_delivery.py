@@ -0,0 +1,67 @@
+"""
+Management command to benchmark email delivery
+Sends the same messages through the stock SMTP backend and the pooled
+backend against a local fake SMTP server with simulated handshake latency
+Usage: python manage.py benchmark_email_delivery [--messages N] [--latency SECONDS] [--rate N]
+"""
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from core.fake_smtp import FakeSMTPServer
+from core.mail import close_pools, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message SMTP connections with pooled, batched delivery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds per new connection (TCP/TLS/login)')
+        parser.add_argument('--per-connection', type=int, default=100, help='Max messages per pooled connection')
+        parser.add_argument('--rate', type=float, default=0, help='Pooled rate cap in messages/second (0 = none)')
+
+    def handle(self, *args, **options):
+        messages = [
+            EmailMessage(f'Benchmark {index}', 'Body', 'bench@example.com', [f'user{index}@example.com'])
+            for index in range(options['messages'])
+        ]
+
+        with FakeSMTPServer(connect_latency=options['latency']) as server:
+            smtp = {
+                'host': server.host,
+                'port': server.port,
+                'use_tls': False,
+                'username': '',
+                'password': '',
+            }
+
+            def stock():
+                # What send_mail() per message does today
+                for message in messages:
+                    get_connection('django.core.mail.backends.smtp.EmailBackend', **smtp).send_messages([message])
+
+            def pooled():
+                send_batch(messages, connection=get_connection(
+                    'core.mail.PooledEmailBackend',
+                    max_messages_per_connection=options['per_connection'],
+                    rate_limit=options['rate'],
+                    **smtp
+                ))
+
+            try:
+                for name, send in (('stock', stock), ('pooled', pooled)):
+                    connections_before = server.connections
+                    delivered_before = len(server.messages)
+                    began = time.perf_counter()
+                    send()
+                    elapsed = time.perf_counter() - began
+                    delivered = len(server.messages) - delivered_before
+                    self.stdout.write(
+                        f"{name:>6}: {delivered} messages, "
+                        f"{server.connections - connections_before} connections, "
+                        f"{elapsed:.3f}s, {delivered / elapsed:.1f} messages/s"
+                    )
+            finally:
+                close_pools()
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.9 on 2026-10-17 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_day_locks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'booking_day_locks',
+                'unique_together': {('provider', 'date')},
+            },
+        ),
+    ]
@@ -7,12 +7,14 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from users.models import User
 from services.models import Service
+from core.tracker import FieldTrackerMixin
 
 
-class Booking(models.Model):
+class Booking(FieldTrackerMixin, models.Model):
     """
     Service booking model
     """
+    tracked_fields = ('status',)
     
     class BookingStatus(models.TextChoices):
         PENDING = 'PENDING', _('Pending Confirmation')
@@ -158,6 +160,28 @@ class Booking(models.Model):
         )
 
 
+class ProviderDayLock(models.Model):
+    """
+    Admission lock row per provider and calendar day
+    Bookings for the same provider-day serialize on this row; everything
+    else proceeds in parallel
+    """
+    provider = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='booking_day_locks'
+    )
+    date = models.DateField()
+    version = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'booking_day_locks'
+        unique_together = [['provider', 'date']]
+    
+    def __str__(self):
+        return f"{self.provider_id} @ {self.date}"
+
+
 class BookingStatusHistory(models.Model):
     """
     Track booking status changes for audit trail
@@ -1,14 +1,21 @@
 """
 Booking Serializers
 """
+from decimal import Decimal
+
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
 from bookings.models import Booking, BookingStatusHistory, BookingAttachment
+from bookings.admission import admit_booking
+from bookings.events import booking_created_events, notify
+from bookings.transitions import can_transition
 from services.serializers import ServiceListSerializer
-from users.serializers import UserSerializer
+from users.serializers import PublicUserSerializer, UserSerializer
+from core.serializers import SparseFieldsetMixin
 
 
-class BookingListSerializer(serializers.ModelSerializer):
+class BookingListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for booking listings"""
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
     provider_name = serializers.CharField(source='provider.full_name', read_only=True)
@@ -23,9 +30,14 @@ class BookingListSerializer(serializers.ModelSerializer):
             'service', 'service_title', 'scheduled_date', 'scheduled_time',
             'total_amount', 'currency', 'created_at'
         ]
+        expandable_fields = {
+            'customer': PublicUserSerializer,
+            'provider': PublicUserSerializer,
+            'service': ServiceListSerializer,
+        }
 
 
-class BookingDetailSerializer(serializers.ModelSerializer):
+class BookingDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Detailed serializer for booking detail view"""
     customer = UserSerializer(read_only=True)
     provider = UserSerializer(read_only=True)
@@ -97,18 +109,23 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         )
         
         # Calculate tax (example: 10%)
-        booking.tax_amount = booking.base_price * 0.10
-        
-        booking.save()
+        booking.tax_amount = booking.base_price * Decimal('0.10')
         
-        # Create status history
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            from_status='',
-            to_status=booking.status,
-            changed_by=request.user,
-            notes='Booking created'
-        )
+        with transaction.atomic():
+            # Saves only if the provider still has capacity for the slot
+            admit_booking(booking)
+            
+            # Create status history
+            BookingStatusHistory.objects.create(
+                booking=booking,
+                from_status='',
+                to_status=booking.status,
+                changed_by=request.user,
+                notes='Booking created'
+            )
+            
+            # Emailed by the outbox dispatcher once this commits
+            notify(booking_created_events(booking))
         
         return booking
 
@@ -134,6 +151,22 @@ class BookingUpdateSerializer(serializers.ModelSerializer):
                 "Cannot update booking in current status."
             )
         return attrs
+    
+    def update(self, instance, validated_data):
+        rescheduled = any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in ('scheduled_date', 'scheduled_time')
+        )
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        
+        # Write only the edited columns: a full save would put back the
+        # status read earlier over a concurrent transition
+        update_fields = list(validated_data) + ['updated_at']
+        if rescheduled:
+            return admit_booking(instance, update_fields=update_fields)
+        instance.save(update_fields=update_fields)
+        return instance
 
 
 class BookingStatusUpdateSerializer(serializers.Serializer):
@@ -147,25 +180,7 @@ class BookingStatusUpdateSerializer(serializers.Serializer):
         booking = self.context['booking']
         new_status = attrs['status']
         
-        # Define allowed transitions
-        allowed_transitions = {
-            Booking.BookingStatus.PENDING: [
-                Booking.BookingStatus.CONFIRMED,
-                Booking.BookingStatus.CANCELLED
-            ],
-            Booking.BookingStatus.CONFIRMED: [
-                Booking.BookingStatus.IN_PROGRESS,
-                Booking.BookingStatus.CANCELLED
-            ],
-            Booking.BookingStatus.IN_PROGRESS: [
-                Booking.BookingStatus.COMPLETED,
-                Booking.BookingStatus.CANCELLED
-            ],
-            Booking.BookingStatus.COMPLETED: [],
-            Booking.BookingStatus.CANCELLED: [Booking.BookingStatus.REFUNDED],
-        }
-        
-        if new_status not in allowed_transitions.get(booking.status, []):
+        if not can_transition(booking.status, new_status):
             raise serializers.ValidationError(
                 f"Cannot transition from {booking.status} to {new_status}"
             )
@@ -180,6 +195,32 @@ class BookingStatusUpdateSerializer(serializers.Serializer):
         return attrs
 
 
+class BookingBulkStatusSerializer(serializers.Serializer):
+    """Serializer for changing the status of many bookings at once"""
+    MAX_BOOKINGS = 100
+    
+    booking_references = serializers.ListField(
+        child=serializers.CharField(max_length=20),
+        allow_empty=False,
+        max_length=MAX_BOOKINGS
+    )
+    status = serializers.ChoiceField(choices=Booking.BookingStatus.choices)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    cancellation_reason = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate_booking_references(self, value):
+        return list(dict.fromkeys(value))
+    
+    def validate(self, attrs):
+        """Transitions are checked per booking when they are applied"""
+        if attrs['status'] == Booking.BookingStatus.CANCELLED:
+            if not attrs.get('cancellation_reason'):
+                raise serializers.ValidationError(
+                    {"cancellation_reason": "Cancellation reason is required."}
+                )
+        return attrs
+
+
 class BookingAttachmentSerializer(serializers.ModelSerializer):
     """Serializer for booking attachments"""
     uploaded_by_name = serializers.CharField(
@@ -213,4 +254,61 @@ class BookingStatusHistorySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'from_status', 'to_status', 'changed_by',
             'changed_by_name', 'notes', 'created_at'
-        ]
\ No newline at end of file
+        ]
+
+class SlotSearchSerializer(serializers.Serializer):
+    """Query parameters for the batched free-slot search"""
+    MAX_PROVIDERS = 50
+    MAX_DAYS = 31
+    
+    providers = serializers.CharField(
+        help_text='Comma-separated provider IDs'
+    )
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False)
+    duration = serializers.IntegerField(
+        min_value=15,
+        max_value=720,
+        required=False,
+        default=60
+    )
+    step = serializers.IntegerField(
+        min_value=5,
+        max_value=240,
+        required=False,
+        default=30
+    )
+    
+    def validate_providers(self, value):
+        try:
+            provider_ids = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Provider IDs must be integers.")
+        
+        provider_ids = list(dict.fromkeys(provider_ids))
+        if not provider_ids:
+            raise serializers.ValidationError("At least one provider is required.")
+        if len(provider_ids) > self.MAX_PROVIDERS:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_PROVIDERS} providers per request."
+            )
+        return provider_ids
+    
+    def validate(self, attrs):
+        start_date = attrs['start_date']
+        end_date = attrs.setdefault('end_date', start_date)
+        
+        if start_date < timezone.now().date():
+            raise serializers.ValidationError(
+                {"start_date": "Start date cannot be in the past."}
+            )
+        if end_date < start_date:
+            raise serializers.ValidationError(
+                {"end_date": "End date must be on or after start date."}
+            )
+        if (end_date - start_date).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                {"end_date": f"Date range cannot exceed {self.MAX_DAYS} days."}
+            )
+        
+        return attrs
@@ -1,41 +1,42 @@
 """
 Booking signals for automatic updates
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from bookings.counters import count_bookings, count_completions
 from bookings.models import Booking
 
 
 @receiver(post_save, sender=Booking)
 def update_booking_count(sender, instance, created, **kwargs):
     """
-    Update service booking count when booking is created
+    Add new bookings to service and provider booking counts
     """
     if created:
-        service = instance.service
-        service.booking_count += 1
-        service.save(update_fields=['booking_count'])
-        
-        # Update provider total bookings
-        provider_profile = instance.provider.provider_profile
-        provider_profile.total_bookings += 1
-        
-        # Update completed bookings if applicable
-        if instance.status == 'COMPLETED':
-            provider_profile.completed_bookings += 1
-        
-        provider_profile.save(update_fields=['total_bookings', 'completed_bookings'])
+        count_bookings([instance])
 
 
 @receiver(post_save, sender=Booking)
-def update_completed_bookings(sender, instance, created, **kwargs):
+def update_completed_bookings(sender, instance, created, update_fields=None, **kwargs):
     """
-    Update completed bookings count when status changes to completed
+    Update completed bookings count when a save moves status to or from
+    completed (transitions use UPDATE and count their own completions)
     """
-    if not created and instance.status == 'COMPLETED':
-        provider_profile = instance.provider.provider_profile
-        
-        # Check if this is the first time marked as completed
-        if instance.tracker.has_changed('status'):
-            provider_profile.completed_bookings += 1
-            provider_profile.save(update_fields=['completed_bookings'])
\ No newline at end of file
+    if created or not instance.tracker.has_changed('status'):
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    
+    completed = Booking.BookingStatus.COMPLETED
+    was_completed = instance.tracker.previous('status') == completed
+    is_completed = instance.status == completed
+    if is_completed != was_completed:
+        count_completions([instance.provider_id], 1 if is_completed else -1)
+
+
+@receiver(post_delete, sender=Booking)
+def remove_booking_count(sender, instance, **kwargs):
+    """
+    Take deleted bookings out of the counts
+    """
+    count_bookings([instance], -1)
@@ -1,107 +1,22 @@
 """
 Celery tasks for bookings
 """
+import logging
+import time
+from functools import partial
+
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 
+from core.mail import send_batch
 
-@shared_task
-def send_booking_notification(booking_id):
-    """
-    Send notification when a new booking is created
-    """
-    from bookings.models import Booking
-    
-    try:
-        booking = Booking.objects.select_related(
-            'customer', 'provider', 'service'
-        ).get(id=booking_id)
-        
-        # Send email to provider
-        subject = f'New Booking: {booking.service.title}'
-        message = f"""
-        You have a new booking!
-        
-        Booking Reference: {booking.booking_reference}
-        Customer: {booking.customer.full_name}
-        Service: {booking.service.title}
-        Date: {booking.scheduled_date}
-        Time: {booking.scheduled_time}
-        
-        Please log in to confirm or decline this booking.
-        """
-        
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [booking.provider.email],
-            fail_silently=True,
-        )
-        
-        # Send confirmation to customer
-        customer_subject = 'Booking Confirmation'
-        customer_message = f"""
-        Thank you for your booking!
-        
-        Booking Reference: {booking.booking_reference}
-        Service: {booking.service.title}
-        Provider: {booking.provider.full_name}
-        Date: {booking.scheduled_date}
-        Time: {booking.scheduled_time}
-        
-        We will notify you once the provider confirms your booking.
-        """
-        
-        send_mail(
-            customer_subject,
-            customer_message,
-            settings.EMAIL_HOST_USER,
-            [booking.customer.email],
-            fail_silently=True,
-        )
-        
-    except Booking.DoesNotExist:
-        pass
+logger = logging.getLogger(__name__)
 
-
-@shared_task
-def send_status_update_notification(booking_id, old_status, new_status):
-    """
-    Send notification when booking status changes
-    """
-    from bookings.models import Booking
-    
-    try:
-        booking = Booking.objects.select_related(
-            'customer', 'provider', 'service'
-        ).get(id=booking_id)
-        
-        subject = f'Booking Status Update: {booking.booking_reference}'
-        message = f"""
-        Your booking status has been updated.
-        
-        Booking Reference: {booking.booking_reference}
-        Service: {booking.service.title}
-        Status: {new_status}
-        
-        Please log in to view more details.
-        """
-        
-        # Send to both customer and provider
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [booking.customer.email, booking.provider.email],
-            fail_silently=True,
-        )
-        
-    except Booking.DoesNotExist:
-        pass
+REMINDER_BATCH_SIZE = 200
 
 
 @shared_task
@@ -118,10 +33,27 @@ def send_booking_reminders():
         status__in=['CONFIRMED', 'PENDING']
     ).select_related('customer', 'provider', 'service')
     
-    for booking in bookings:
-        # Reminder to customer
-        subject = f'Booking Reminder: {booking.service.title}'
-        message = f"""
+    messages = []
+    sent = 0
+    # One connection for the whole run, sent in bounded batches
+    with get_connection(fail_silently=True) as connection:
+        for booking in bookings.iterator(chunk_size=REMINDER_BATCH_SIZE):
+            messages.extend(reminder_messages(booking))
+            if len(messages) >= REMINDER_BATCH_SIZE:
+                sent += send_batch(messages, connection=connection)
+                messages = []
+        sent += send_batch(messages, connection=connection)
+    return sent
+
+
+def reminder_messages(booking):
+    """
+    Reminder emails for the customer and provider of a booking
+    """
+    # Reminder to customer
+    customer_message = EmailMessage(
+        f'Booking Reminder: {booking.service.title}',
+        f"""
         This is a reminder for your upcoming booking.
         
         Service: {booking.service.title}
@@ -131,59 +63,103 @@ def send_booking_reminders():
         Address: {booking.service_address}
         
         See you tomorrow!
-        """
-        
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [booking.customer.email],
-            fail_silently=True,
-        )
+        """,
+        settings.EMAIL_HOST_USER,
+        [booking.customer.email],
+    )
+    
+    # Reminder to provider
+    provider_message = EmailMessage(
+        f'Booking Reminder: {booking.booking_reference}',
+        f"""
+        Reminder: You have a booking scheduled tomorrow.
         
-        # Reminder to provider
-        send_mail(
-            f'Booking Reminder: {booking.booking_reference}',
-            f"""
-            Reminder: You have a booking scheduled tomorrow.
-            
-            Booking Reference: {booking.booking_reference}
-            Customer: {booking.customer.full_name}
-            Service: {booking.service.title}
-            Date: {booking.scheduled_date}
-            Time: {booking.scheduled_time}
-            """,
-            settings.EMAIL_HOST_USER,
-            [booking.provider.email],
-            fail_silently=True,
+        Booking Reference: {booking.booking_reference}
+        Customer: {booking.customer.full_name}
+        Service: {booking.service.title}
+        Date: {booking.scheduled_date}
+        Time: {booking.scheduled_time}
+        """,
+        settings.EMAIL_HOST_USER,
+        [booking.provider.email],
+    )
+    
+    return [customer_message, provider_message]
+
+
+AUTO_COMPLETE_AFTER = timedelta(hours=2)
+AUTO_COMPLETE_CHUNK_SIZE = 500
+
+
+def complete_bookings(ids, now):
+    """
+    Complete one chunk of in-progress bookings; returns how many moved
+    """
+    from bookings.events import status_push_events
+    from bookings.models import Booking, BookingStatusHistory
+    from bookings.counters import count_completions
+    from bookings.transitions import invalidate_on_commit, update_status
+    from notifications import push
+    
+    with transaction.atomic():
+        completed = update_status(
+            ids, Booking.BookingStatus.IN_PROGRESS, Booking.BookingStatus.COMPLETED, now
         )
+        rows = list(Booking.objects.filter(pk__in=completed).only(
+            'id', 'booking_reference', 'service_id', 'customer_id', 'provider_id'
+        ))
+        history = BookingStatusHistory.objects.bulk_create([
+            BookingStatusHistory(
+                booking=booking,
+                from_status=Booking.BookingStatus.IN_PROGRESS,
+                to_status=Booking.BookingStatus.COMPLETED,
+                notes='Auto-completed by system'
+            )
+            for booking in rows
+        ])
+        count_completions([booking.provider_id for booking in rows])
+        invalidate_on_commit((booking.service_id, booking.provider_id) for booking in rows)
+        transaction.on_commit(partial(push.publish, status_push_events(history)))
+    return len(rows)
 
 
 @shared_task
-def auto_complete_bookings():
+def auto_complete_bookings(chunk_size=AUTO_COMPLETE_CHUNK_SIZE):
     """
     Automatically mark bookings as completed after scheduled time + duration
+    
+    Bookings are completed in id-ordered chunks, each one transaction of a
+    conditional UPDATE, one history INSERT and batched counter increments.
     """
-    from bookings.models import Booking, BookingStatusHistory
+    from bookings.models import Booking
     
-    # Find bookings that should be completed
-    cutoff_time = timezone.now() - timedelta(hours=2)
+    started = time.perf_counter()
+    now = timezone.now()
+    candidates = Booking.objects.filter(
+        status=Booking.BookingStatus.IN_PROGRESS,
+        actual_start_time__lte=now - AUTO_COMPLETE_AFTER
+    ).order_by('id')
     
-    bookings = Booking.objects.filter(
-        status='IN_PROGRESS',
-        actual_start_time__lte=cutoff_time
-    )
+    completed = 0
+    chunks = 0
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        chunks += 1
+        completed += complete_bookings(ids, now)
     
-    for booking in bookings:
-        booking.status = 'COMPLETED'
-        booking.completed_at = timezone.now()
-        booking.actual_end_time = timezone.now()
-        booking.save()
-        
-        # Create history entry
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            from_status='IN_PROGRESS',
-            to_status='COMPLETED',
-            notes='Auto-completed by system'
-        )
\ No newline at end of file
+    elapsed = time.perf_counter() - started
+    report = {
+        'completed': completed,
+        'chunks': chunks,
+        'elapsed': round(elapsed, 3),
+        'per_second': round(completed / elapsed, 1) if elapsed else 0,
+    }
+    logger.info(
+        'Auto-completed %s bookings in %s chunks: %.3fs, %.1f bookings/s',
+        completed, chunks, elapsed, report['per_second']
+    )
+    return report
@@ -1,3 +1,741 @@
-from django.test import TestCase
+"""
+Tests for bookings app
+"""
+from datetime import date, time, timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User, ServiceProviderProfile
+from services.models import ServiceCategory, Service, ServiceAvailability
+from bookings.models import Booking, BookingStatusHistory
+from bookings.availability import LoadProfile, find_available_slots, is_slot_available
+from bookings.serializers import BookingDetailSerializer, BookingListSerializer, BookingUpdateSerializer
+from bookings.tasks import auto_complete_bookings, send_booking_reminders
+from bookings.transitions import (
+    CONFLICT, INVALID, Transition, TransitionConflict, apply_transitions, transition_booking
+)
+from core.eager_loading import EagerLoadingPlan, eager_load
+from core.fake_smtp import FakeSMTPServer
+from notifications.models import Notification, OutboxMessage
+from notifications.outbox import dispatch
+from notifications.push import hub
+from notifications.stream_client import StreamConnection
+from core.mail import close_pools
+
+
+class BookingTestMixin:
+    """Shared fixtures for booking tests"""
+    
+    def create_user(self, email, phone, role):
+        return User.objects.create_user(
+            email=email,
+            password='testpass123',
+            first_name='Test',
+            last_name=role.title(),
+            phone=phone,
+            role=role
+        )
+    
+    def create_fixtures(self):
+        self.customer = self.create_user('customer@example.com', '+1000000101', User.UserRole.CUSTOMER)
+        self.provider = self.create_user('provider@example.com', '+1000000102', User.UserRole.SERVICE_PROVIDER)
+        self.category = ServiceCategory.objects.create(name='Cleaning', slug='cleaning')
+        self.service = Service.objects.create(
+            title='Deep clean',
+            slug='deep-clean',
+            description='Whole home',
+            short_description='Whole home',
+            provider=self.provider,
+            category=self.category,
+            base_price=100
+        )
+    
+    def create_booking(self, **kwargs):
+        values = {
+            'customer': self.customer,
+            'provider': self.provider,
+            'service': self.service,
+            'scheduled_date': date.today() + timedelta(days=1),
+            'scheduled_time': time(10, 0),
+            'estimated_duration_minutes': 60,
+            'service_address': '1 Main St',
+            'service_city': 'Springfield',
+            'service_state': 'IL',
+            'service_postal_code': '62701',
+            'base_price': 100,
+        }
+        values.update(kwargs)
+        return Booking.objects.create(**values)
+
+
+class BookingKeysetPaginationTestCase(BookingTestMixin, APITestCase):
+    """Test cursor pagination on the booking list"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.client.force_authenticate(self.customer)
+        self.bookings = [self.create_booking() for _ in range(7)]
+        # Force timestamp ties so the id tie-breaker is exercised
+        created = timezone.now()
+        Booking.objects.filter(id__in=[b.id for b in self.bookings[:4]]).update(created_at=created)
+        Booking.objects.filter(id__in=[b.id for b in self.bookings[4:]]).update(
+            created_at=created + timedelta(minutes=1)
+        )
+        self.expected = list(
+            Booking.objects.order_by('-created_at', 'id').values_list('booking_reference', flat=True)
+        )
+    
+    def references(self, response):
+        return [item['booking_reference'] for item in response.data['results']]
+    
+    def test_forward_and_backward_traversal(self):
+        """Cursors walk every row exactly once in both directions"""
+        response = self.client.get('/api/bookings/', {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        
+        seen = self.references(response)
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += self.references(response)
+            pages.append(response)
+        self.assertEqual(seen, self.expected)
+        
+        previous = self.client.get(pages[-1].data['previous'])
+        self.assertEqual(self.references(previous), self.references(pages[-2]))
+    
+    def test_approximate_count(self):
+        """with_count returns a capped total"""
+        response = self.client.get('/api/bookings/', {'with_count': 'true'})
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_approximate'])
+    
+    def test_invalid_cursor(self):
+        """Garbage cursors are rejected"""
+        response = self.client.get('/api/bookings/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_legacy_page_param(self):
+        """page=N keeps the page-number response format"""
+        response = self.client.get('/api/bookings/', {'page': 1})
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(response.data['current_page'], 1)
+
+
+class AvailabilityEngineTestCase(BookingTestMixin, APITestCase):
+    """Test free-slot computation and the batched slots endpoint"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.day = date.today() + timedelta(days=7)
+        ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning',
+            max_concurrent_bookings=1
+        )
+        ServiceAvailability.objects.create(
+            provider=self.provider,
+            day_of_week=self.day.weekday(),
+            start_time=time(9, 0),
+            end_time=time(12, 0)
+        )
+    
+    def starts(self, duration=60, step=60):
+        slots = find_available_slots(
+            [self.provider.id], self.day, self.day,
+            duration_minutes=duration, step_minutes=step
+        )[self.provider.id]
+        return [slot['start'] for slot in slots]
+    
+    def test_load_profile_peak(self):
+        profile = LoadProfile([(0, 60), (30, 90), (120, 180)])
+        self.assertEqual(profile.peak(0, 30), 1)
+        self.assertEqual(profile.peak(30, 60), 2)
+        self.assertEqual(profile.peak(90, 120), 0)
+        self.assertEqual(profile.peak(60, 150), 1)
+    
+    def test_blocking_bookings_are_subtracted(self):
+        self.assertEqual(self.starts(), ['09:00', '10:00', '11:00'])
+        
+        self.create_booking(
+            scheduled_date=self.day,
+            scheduled_time=time(10, 0),
+            status=Booking.BookingStatus.CONFIRMED
+        )
+        self.create_booking(
+            scheduled_date=self.day,
+            scheduled_time=time(11, 0),
+            status=Booking.BookingStatus.CANCELLED
+        )
+        self.assertEqual(self.starts(), ['09:00', '11:00'])
+        self.assertEqual(self.starts(step=30), ['09:00', '11:00'])
+        self.assertFalse(
+            is_slot_available(self.provider.id, self.day, time(10, 30), 30)
+        )
+        self.assertTrue(
+            is_slot_available(self.provider.id, self.day, time(11, 15), 30)
+        )
+    
+    def test_pending_bookings_fill_slots(self):
+        ServiceProviderProfile.objects.filter(user=self.provider).update(max_concurrent_bookings=2)
+        for _ in range(2):
+            self.create_booking(scheduled_date=self.day, scheduled_time=time(10, 0))
+        self.assertEqual(self.starts(), ['09:00', '11:00'])
+        self.assertFalse(is_slot_available(self.provider.id, self.day, time(10, 0), 60))
+        
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/bookings/slots/', {
+            'providers': str(self.provider.id),
+            'start_date': self.day.isoformat(),
+        })
+        starts = [slot['start'] for slot in response.data['results'][0]['slots']]
+        self.assertNotIn('10:00', starts)
+    
+    def test_concurrent_capacity(self):
+        ServiceProviderProfile.objects.filter(user=self.provider).update(max_concurrent_bookings=2)
+        self.create_booking(
+            scheduled_date=self.day,
+            scheduled_time=time(10, 0),
+            status=Booking.BookingStatus.IN_PROGRESS
+        )
+        slots = find_available_slots([self.provider.id], self.day, self.day)[self.provider.id]
+        remaining = {slot['start']: slot['remaining_capacity'] for slot in slots}
+        self.assertEqual(remaining['09:00'], 2)
+        self.assertEqual(remaining['10:00'], 1)
+        
+        self.create_booking(
+            scheduled_date=self.day,
+            scheduled_time=time(10, 30),
+            estimated_duration_minutes=30,
+            status=Booking.BookingStatus.CONFIRMED
+        )
+        self.assertEqual(self.starts(), ['09:00', '11:00'])
+    
+    def test_batched_endpoint(self):
+        other = self.create_user('other@example.com', '+1000000103', User.UserRole.SERVICE_PROVIDER)
+        self.client.force_authenticate(self.customer)
+        
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/bookings/slots/', {
+                'providers': f'{self.provider.id},{other.id}',
+                'start_date': self.day.isoformat(),
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {item['provider']: item['slots'] for item in response.data['results']}
+        self.assertEqual(len(results[self.provider.id]), 5)
+        self.assertEqual(results[other.id], [])
+    
+    def test_endpoint_validates_range(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/bookings/slots/', {
+            'providers': str(self.provider.id),
+            'start_date': self.day.isoformat(),
+            'end_date': (self.day + timedelta(days=40)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookingAdmissionTestCase(BookingTestMixin, APITestCase):
+    """Test capacity enforcement when creating and rescheduling bookings"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.day = date.today() + timedelta(days=3)
+        ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning',
+            max_concurrent_bookings=1
+        )
+        self.client.force_authenticate(self.customer)
+    
+    def book(self, scheduled_time, duration=60, scheduled_date=None):
+        return self.client.post('/api/bookings/create/', {
+            'service': self.service.id,
+            'scheduled_date': (scheduled_date or self.day).isoformat(),
+            'scheduled_time': scheduled_time,
+            'estimated_duration_minutes': duration,
+            'service_address': '1 Main St',
+            'service_city': 'Springfield',
+            'service_state': 'IL',
+            'service_postal_code': '62701',
+        })
+    
+    def test_overlapping_booking_is_rejected(self):
+        self.assertEqual(self.book('10:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('10:30').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book('11:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.count(), 2)
+    
+    def test_created_booking_notifies_through_the_outbox(self):
+        self.assertEqual(self.book('10:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('10:30').status_code, status.HTTP_409_CONFLICT)
+        # Only the admitted booking queued messages
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        
+        dispatch()
+        subjects = {message.to[0]: message.subject for message in mail.outbox}
+        self.assertEqual(subjects, {
+            'provider@example.com': 'New Booking: Deep clean',
+            'customer@example.com': 'Booking Confirmation',
+        })
+    
+    def test_cancelled_bookings_release_capacity(self):
+        self.create_booking(
+            scheduled_date=self.day,
+            scheduled_time=time(10, 0),
+            status=Booking.BookingStatus.CANCELLED
+        )
+        self.assertEqual(self.book('10:00').status_code, status.HTTP_201_CREATED)
+    
+    def test_overnight_booking_blocks_next_day(self):
+        self.assertEqual(self.book('23:30', duration=120).status_code, status.HTTP_201_CREATED)
+        next_day = self.day + timedelta(days=1)
+        self.assertEqual(
+            self.book('01:00', scheduled_date=next_day).status_code,
+            status.HTTP_409_CONFLICT
+        )
+        self.assertEqual(
+            self.book('01:30', scheduled_date=next_day).status_code,
+            status.HTTP_201_CREATED
+        )
+    
+    def test_reschedule_into_full_slot_is_rejected(self):
+        self.create_booking(scheduled_date=self.day, scheduled_time=time(10, 0))
+        other = self.create_booking(scheduled_date=self.day, scheduled_time=time(14, 0))
+        
+        url = f'/api/bookings/{other.booking_reference}/update/'
+        response = self.client.patch(url, {'scheduled_time': '10:15'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        
+        response = self.client.patch(url, {'scheduled_time': '14:30'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other.refresh_from_db()
+        self.assertEqual(other.scheduled_time, time(14, 30))
+    
+    def test_reschedule_keeps_concurrent_status_change(self):
+        booking = self.create_booking(scheduled_date=self.day, scheduled_time=time(10, 0))
+        serializer = BookingUpdateSerializer(booking, data={'scheduled_time': '11:00'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        # A transition commits between reading the booking and saving it
+        Booking.objects.filter(pk=booking.pk).update(status=Booking.BookingStatus.CANCELLED)
+        serializer.save()
+        
+        booking.refresh_from_db()
+        self.assertEqual((booking.scheduled_time, booking.status), (time(11, 0), Booking.BookingStatus.CANCELLED))
+
+
+class EagerLoadingTestCase(BookingTestMixin, APITestCase):
+    """Test eager loading plans derived from serializers"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.client.force_authenticate(self.customer)
+    
+    def test_plan_follows_nested_serializers(self):
+        plan = EagerLoadingPlan(BookingDetailSerializer())
+        self.assertEqual(set(plan.select_related()), {
+            'customer', 'customer__profile', 'customer__provider_profile',
+            'provider', 'provider__profile', 'provider__provider_profile',
+            'service', 'service__category', 'service__provider',
+        })
+        self.assertEqual(plan.prefetch_related(), [])
+    
+    def test_plan_restricts_columns(self):
+        columns = EagerLoadingPlan(BookingListSerializer()).root.only_columns()
+        # get_status_display reads status; service_title reads only the title
+        self.assertIn('status', columns)
+        self.assertIn('service__title', columns)
+        self.assertNotIn('customer_notes', columns)
+        self.assertNotIn('service__description', columns)
+    
+    def test_serialization_needs_no_further_queries(self):
+        booking = self.create_booking()
+        booking = eager_load(Booking.objects.all(), BookingDetailSerializer).get(pk=booking.pk)
+        with self.assertNumQueries(0):
+            BookingDetailSerializer(booking).data
+    
+    def test_restricted_rows_serialize_identically(self):
+        self.create_booking()
+        self.create_booking(scheduled_time=time(14, 0))
+        restricted = eager_load(Booking.objects.all(), BookingListSerializer, restrict_fields=True)
+        with self.assertNumQueries(1):
+            data = BookingListSerializer(restricted, many=True).data
+        self.assertEqual(data, BookingListSerializer(Booking.objects.all(), many=True).data)
+    
+    def test_list_query_count_is_constant(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/bookings/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+        
+        self.create_booking()
+        single = list_queries()
+        for hour in range(11, 16):
+            self.create_booking(scheduled_time=time(hour, 0))
+        self.assertEqual(list_queries(), single)
+    
+    def test_cancel_response_is_eager_loaded(self):
+        booking = self.create_booking()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/bookings/{booking.booking_reference}/cancel/',
+                {'cancellation_reason': 'Plans changed'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['service']['category_name'], 'Cleaning')
+        selects = [q for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+
+class BookingTransitionTestCase(BookingTestMixin, APITestCase):
+    """Test the booking state machine"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning'
+        )
+        self.client.force_authenticate(self.provider)
+    
+    def test_status_update_writes_history(self):
+        booking = self.create_booking()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                f'/api/bookings/{booking.booking_reference}/status/',
+                {'status': 'CONFIRMED', 'notes': 'See you then'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'CONFIRMED')
+        self.assertIsNotNone(response.data['confirmed_at'])
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'CONFIRMED')
+        history = BookingStatusHistory.objects.get(booking=booking)
+        self.assertEqual((history.from_status, history.to_status), ('PENDING', 'CONFIRMED'))
+        self.assertEqual(history.changed_by, self.provider)
+        # Notifications are queued and fanned out in the same transaction
+        recipients = sorted([self.customer.pk, self.provider.pk])
+        self.assertEqual(sorted(OutboxMessage.objects.values_list('recipient', flat=True)), recipients)
+        self.assertEqual(sorted(Notification.objects.values_list('recipient', flat=True)), recipients)
+        # Cache invalidation and the stream push wait for commit
+        self.assertEqual(len(callbacks), 2)
+    
+    def test_invalid_transition_is_rejected(self):
+        booking = self.create_booking()
+        response = self.client.post(
+            f'/api/bookings/{booking.booking_reference}/status/',
+            {'status': 'COMPLETED'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BookingStatusHistory.objects.exists())
+    
+    def test_stale_status_is_a_conflict(self):
+        booking = self.create_booking()
+        # Someone else confirms the booking after we loaded it
+        Booking.objects.filter(pk=booking.pk).update(status='CONFIRMED')
+        with self.assertRaises(TransitionConflict):
+            transition_booking(booking, 'CANCELLED', cancellation_reason='Plans changed')
+        self.assertEqual(booking.status, 'PENDING')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'CONFIRMED')
+        self.assertFalse(BookingStatusHistory.objects.exists())
+    
+    def test_batch_reports_each_booking(self):
+        moved, stale, finished = [self.create_booking(scheduled_time=time(hour, 0)) for hour in (9, 11, 13)]
+        Booking.objects.filter(pk=stale.pk).update(status='CANCELLED')
+        Booking.objects.filter(pk=finished.pk).update(status='COMPLETED')
+        finished.status = 'COMPLETED'
+        
+        result = apply_transitions(
+            [Transition(booking, 'CONFIRMED', self.provider) for booking in (moved, stale, finished)],
+            notify=False
+        )
+        self.assertEqual([booking.pk for booking, _ in result.applied], [moved.pk])
+        self.assertEqual(result.rejected, {stale.pk: CONFLICT, finished.pk: INVALID})
+        self.assertEqual(Booking.objects.get(pk=moved.pk).status, 'CONFIRMED')
+        self.assertEqual(BookingStatusHistory.objects.count(), 1)
+    
+    def test_auto_complete_keeps_start_time(self):
+        started = timezone.now() - timedelta(hours=3)
+        booking = self.create_booking(status='IN_PROGRESS', actual_start_time=started)
+        self.create_booking(status='IN_PROGRESS', actual_start_time=timezone.now(), scheduled_time=time(14, 0))
+        
+        self.assertEqual(auto_complete_bookings()['completed'], 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'COMPLETED')
+        self.assertEqual(booking.actual_start_time, started)
+        self.assertIsNotNone(booking.completed_at)
+        self.assertIsNotNone(booking.actual_end_time)
+    
+    def test_auto_complete_is_set_based(self):
+        started = timezone.now() - timedelta(hours=3)
+        for hour in range(8, 15):
+            self.create_booking(status='IN_PROGRESS', actual_start_time=started, scheduled_time=time(hour, 0))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                report = auto_complete_bookings(chunk_size=3)
+        self.assertEqual((report['completed'], report['chunks']), (7, 3))
+        # Per chunk: ids, UPDATE, completed rows, history INSERT, counter UPDATE
+        self.assertLessEqual(len(queries), 1 + 3 * 5 + 6)
+        self.assertEqual(Booking.objects.filter(status='COMPLETED').count(), 7)
+        self.assertEqual(BookingStatusHistory.objects.filter(to_status='COMPLETED').count(), 7)
+        self.provider.provider_profile.refresh_from_db()
+        self.assertEqual(self.provider.provider_profile.completed_bookings, 7)
+    
+    def test_completion_through_the_api_counts_for_the_provider(self):
+        booking = self.create_booking(status='IN_PROGRESS')
+        self.client.post(f'/api/bookings/{booking.booking_reference}/status/', {'status': 'COMPLETED'})
+        self.provider.provider_profile.refresh_from_db()
+        self.assertEqual(self.provider.provider_profile.completed_bookings, 1)
+
+
+class BookingEventStreamTestCase(BookingTestMixin, APITestCase):
+    """Test pushing status history to open streams"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning'
+        )
+        self.booking = self.create_booking()
+        self.other = self.create_user('other@example.com', '+1000000103', User.UserRole.CUSTOMER)
+    
+    def token(self, user):
+        return str(AccessToken.for_user(user))
+    
+    def transition(self, to_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_booking(self.booking, to_status, changed_by=self.provider)
+        return BookingStatusHistory.objects.filter(booking=self.booking).latest('pk')
+    
+    async def test_transition_is_pushed_to_both_parties(self):
+        streams = [
+            await StreamConnection(token=self.token(user)).open()
+            for user in (self.customer, self.provider, self.other)
+        ]
+        history = await sync_to_async(self.transition)(Booking.BookingStatus.CONFIRMED)
+        
+        for stream in streams[:2]:
+            events = await stream.wait_for_events(1)
+            self.assertEqual(events[0]['id'], history.pk)
+            self.assertEqual(events[0]['event'], 'booking.status')
+            self.assertEqual(events[0]['data']['booking_reference'], self.booking.booking_reference)
+            self.assertEqual(
+                (events[0]['data']['from_status'], events[0]['data']['to_status']), ('PENDING', 'CONFIRMED')
+            )
+        self.assertEqual(streams[2].events(), [])
+        for stream in streams:
+            await stream.close()
+        self.assertEqual(hub.stream_count(), 0)
+    
+    async def test_reconnect_replays_missed_events(self):
+        confirmed = await sync_to_async(self.transition)(Booking.BookingStatus.CONFIRMED)
+        started = await sync_to_async(self.transition)(Booking.BookingStatus.IN_PROGRESS)
+        
+        stream = await StreamConnection(token=self.token(self.customer), last_event_id=confirmed.pk).open()
+        events = await stream.wait_for_events(1)
+        self.assertEqual([event['id'] for event in events], [started.pk])
+        
+        # Live events follow the replay
+        completed = await sync_to_async(self.transition)(Booking.BookingStatus.COMPLETED)
+        events = await stream.wait_for_events(2)
+        self.assertEqual([event['id'] for event in events], [started.pk, completed.pk])
+        await stream.close()
+        
+        # Other users' bookings are never replayed
+        stream = await StreamConnection(token=self.token(self.other), last_event_id=0).open()
+        await stream.close()
+        self.assertEqual(stream.events(), [])
+    
+    @override_settings(PUSH_REPLAY_LIMIT=1)
+    async def test_long_gap_asks_the_client_to_reload(self):
+        for to_status in (Booking.BookingStatus.CONFIRMED, Booking.BookingStatus.IN_PROGRESS):
+            await sync_to_async(self.transition)(to_status)
+        latest = await sync_to_async(self.transition)(Booking.BookingStatus.COMPLETED)
+        stream = await StreamConnection(token=self.token(self.customer), last_event_id=0).open()
+        events = await stream.wait_for_events(1)
+        # The reset carries the newest id, so the next reconnect resumes after it
+        self.assertEqual([(event['event'], event['id']) for event in events], [('reset', latest.pk)])
+        await stream.close()
+
+
+class BookingCounterTestCase(BookingTestMixin, APITestCase):
+    """Test booking counters and the status tracker"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.profile = ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning'
+        )
+    
+    def counts(self):
+        self.service.refresh_from_db()
+        self.profile.refresh_from_db()
+        return self.service.booking_count, self.profile.total_bookings, self.profile.completed_bookings
+    
+    def test_created_and_deleted_bookings_are_counted(self):
+        bookings = [self.create_booking() for _ in range(3)]
+        self.create_booking(status=Booking.BookingStatus.COMPLETED)
+        self.assertEqual(self.counts(), (4, 4, 1))
+        
+        bookings[0].delete()
+        self.assertEqual(self.counts(), (3, 3, 1))
+    
+    def test_stale_instances_do_not_lose_increments(self):
+        stale_service = Service.objects.get(pk=self.service.pk)
+        self.create_booking()
+        self.create_booking()
+        # A save of other fields from an old copy no longer carries the count
+        stale_service.title = 'Deeper clean'
+        stale_service.save(update_fields=['title'])
+        self.assertEqual(self.counts(), (2, 2, 0))
+    
+    def test_saved_status_changes_update_completions(self):
+        booking = Booking.objects.get(pk=self.create_booking(status=Booking.BookingStatus.IN_PROGRESS).pk)
+        self.assertFalse(booking.tracker.has_changed('status'))
+        
+        booking.status = Booking.BookingStatus.COMPLETED
+        self.assertTrue(booking.tracker.has_changed('status'))
+        self.assertEqual(booking.tracker.changed(), {'status': Booking.BookingStatus.IN_PROGRESS})
+        booking.save()
+        self.assertEqual(self.counts()[2], 1)
+        self.assertEqual(booking.tracker.changed(), {})
+        
+        # Saving again, or saving other fields, counts nothing
+        booking.save()
+        booking.customer_notes = 'Side door'
+        booking.save(update_fields=['customer_notes'])
+        self.assertEqual(self.counts()[2], 1)
+        
+        booking.status = Booking.BookingStatus.REFUNDED
+        booking.save()
+        self.assertEqual(self.counts()[2], 0)
+    
+    def test_deferred_status_counts_as_changed_once_assigned(self):
+        booking = Booking.objects.only('id').get(pk=self.create_booking().pk)
+        self.assertFalse(booking.tracker.has_changed('status'))
+        booking.status = Booking.BookingStatus.CONFIRMED
+        self.assertTrue(booking.tracker.has_changed('status'))
+
+
+class BookingBulkStatusTestCase(BookingTestMixin, APITestCase):
+    """Test the bulk status endpoint"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.client.force_authenticate(self.provider)
+        self.other_customer = self.create_user('other@example.com', '+1000000103', User.UserRole.CUSTOMER)
+    
+    def bulk_update(self, references, **data):
+        data.setdefault('status', 'CONFIRMED')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/bookings/bulk-status/',
+                {'booking_references': references, **data},
+                format='json'
+            )
+    
+    def test_applies_valid_transitions_and_reports_the_rest(self):
+        pending = [self.create_booking(scheduled_time=time(hour, 0)) for hour in (9, 11)]
+        completed = self.create_booking(scheduled_time=time(13, 0), status='COMPLETED')
+        references = [booking.booking_reference for booking in pending + [completed]]
+        
+        response = self.bulk_update(references + ['BK000000000000'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], references[:2])
+        self.assertEqual(response.data['failed'], [
+            {'booking_reference': completed.booking_reference, 'error': 'invalid'},
+            {'booking_reference': 'BK000000000000', 'error': 'not_found'},
+        ])
+        self.assertEqual(Booking.objects.filter(status='CONFIRMED').count(), 2)
+        self.assertEqual(BookingStatusHistory.objects.filter(changed_by=self.provider).count(), 2)
+    
+    def test_one_notification_per_recipient(self):
+        bookings = [self.create_booking(scheduled_time=time(hour, 0)) for hour in (9, 11)]
+        bookings.append(self.create_booking(customer=self.other_customer, scheduled_time=time(13, 0)))
+        
+        response = self.bulk_update([booking.booking_reference for booking in bookings])
+        self.assertEqual(len(response.data['updated']), 3)
+        OutboxMessage.objects.update(available_at=timezone.now())
+        dispatch()
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ['customer@example.com', 'other@example.com', 'provider@example.com'])
+    
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def queries_for(count):
+            references = [
+                self.create_booking(scheduled_date=date.today() + timedelta(days=count), scheduled_time=time(8 + hour, 0)).booking_reference
+                for hour in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(
+                    '/api/bookings/bulk-status/',
+                    {'booking_references': references, 'status': 'CONFIRMED'},
+                    format='json'
+                )
+            return len(queries)
+        
+        self.assertEqual(queries_for(2), queries_for(8))
+    
+    def test_other_providers_bookings_are_not_found(self):
+        other_provider = self.create_user('provider2@example.com', '+1000000104', User.UserRole.SERVICE_PROVIDER)
+        booking = self.create_booking(provider=other_provider)
+        response = self.bulk_update([booking.booking_reference])
+        self.assertEqual(response.data['failed'][0]['error'], 'not_found')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'PENDING')
+    
+    def test_customers_are_forbidden(self):
+        booking = self.create_booking()
+        self.client.force_authenticate(self.customer)
+        response = self.bulk_update([booking.booking_reference])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_cancellation_requires_reason(self):
+        booking = self.create_booking()
+        response = self.bulk_update([booking.booking_reference], status='CANCELLED')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookingReminderEmailTestCase(BookingTestMixin, APITestCase):
+    """Test batched reminder delivery"""
+    
+    def setUp(self):
+        self.create_fixtures()
+        self.server = FakeSMTPServer().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(close_pools)
+    
+    def test_reminders_share_one_connection(self):
+        for hour in (9, 11, 13):
+            self.create_booking(scheduled_time=time(hour, 0))
+        self.create_booking(scheduled_date=date.today() + timedelta(days=2))
+        
+        with override_settings(
+            EMAIL_BACKEND='core.mail.PooledEmailBackend',
+            EMAIL_HOST=self.server.host,
+            EMAIL_PORT=self.server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD=''
+        ):
+            self.assertEqual(send_booking_reminders(), 6)
+        self.assertEqual(len(self.server.messages), 6)
+        self.assertEqual(self.server.connections, 1)
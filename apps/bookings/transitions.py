@@ -0,0 +1,208 @@
+"""
+Booking state machine
+Applies status transitions as conditional UPDATEs and writes their history
+and notifications in the same transaction
+"""
+from collections import Counter, defaultdict, namedtuple
+from functools import partial
+
+from django.db import transaction
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from bookings.counters import count_completions
+from bookings.models import Booking, BookingStatusHistory
+from bookings.events import notify as notify_users, status_changed_events, status_push_events
+from notifications import push
+from core.cache import invalidate_tags
+
+BookingStatus = Booking.BookingStatus
+
+ALLOWED_TRANSITIONS = {
+    BookingStatus.PENDING: [BookingStatus.CONFIRMED, BookingStatus.CANCELLED],
+    BookingStatus.CONFIRMED: [BookingStatus.IN_PROGRESS, BookingStatus.CANCELLED],
+    BookingStatus.IN_PROGRESS: [BookingStatus.COMPLETED, BookingStatus.CANCELLED],
+    BookingStatus.COMPLETED: [],
+    BookingStatus.CANCELLED: [BookingStatus.REFUNDED],
+    BookingStatus.REFUNDED: [],
+}
+
+# Timestamps set on entering a status: (field, keep an existing value)
+STATUS_TIMESTAMPS = {
+    BookingStatus.CONFIRMED: [('confirmed_at', False)],
+    BookingStatus.IN_PROGRESS: [('actual_start_time', True)],
+    BookingStatus.COMPLETED: [('completed_at', False), ('actual_end_time', True)],
+    BookingStatus.CANCELLED: [('cancelled_at', False)],
+}
+
+# Reasons a transition was not applied
+INVALID = 'invalid'
+CONFLICT = 'conflict'
+
+Transition = namedtuple(
+    'Transition',
+    ['booking', 'to_status', 'changed_by', 'notes', 'cancellation_reason'],
+    defaults=(None, '', '')
+)
+
+# applied: [(booking, from_status)], rejected: {booking id: INVALID or CONFLICT}
+TransitionResult = namedtuple('TransitionResult', ['applied', 'rejected'])
+
+
+class InvalidTransition(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'This status change is not allowed.'
+    default_code = 'invalid_transition'
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The booking status was changed by someone else; reload and try again.'
+    default_code = 'transition_conflict'
+
+
+def can_transition(from_status, to_status):
+    return to_status in ALLOWED_TRANSITIONS.get(from_status, [])
+
+
+def transition_values(to_status, now, cancellation_reason=''):
+    """
+    Column values for an UPDATE entering to_status
+    """
+    values = {'status': to_status, 'updated_at': now}
+    for field, keep_existing in STATUS_TIMESTAMPS.get(to_status, []):
+        if keep_existing:
+            values[field] = Coalesce(field, Value(now, output_field=DateTimeField()))
+        else:
+            values[field] = now
+    if to_status == BookingStatus.CANCELLED:
+        values['cancellation_reason'] = cancellation_reason
+    return values
+
+
+def mark_applied(booking, to_status, now, cancellation_reason=''):
+    """
+    Mirror an applied UPDATE on the in-memory instance
+    """
+    booking.status = to_status
+    booking.updated_at = now
+    for field, keep_existing in STATUS_TIMESTAMPS.get(to_status, []):
+        if not keep_existing or getattr(booking, field) is None:
+            setattr(booking, field, now)
+    if to_status == BookingStatus.CANCELLED:
+        booking.cancellation_reason = cancellation_reason
+
+
+def update_status(ids, from_status, to_status, now, cancellation_reason=''):
+    """
+    Move the bookings in ids still in from_status; returns the ids moved
+
+    Django has no UPDATE ... RETURNING, so when some rows were already
+    moved by someone else, this call's rows are the ones carrying its
+    updated_at value.
+    """
+    ids = set(ids)
+    updated = Booking.objects.filter(
+        pk__in=ids, status=from_status
+    ).update(**transition_values(to_status, now, cancellation_reason))
+    if updated < len(ids):
+        ids = set(Booking.objects.filter(
+            pk__in=ids, status=to_status, updated_at=now
+        ).values_list('pk', flat=True))
+    return ids
+
+
+def invalidate_on_commit(bookings):
+    """
+    UPDATE sends no post_save, so invalidate what the signal would
+    """
+    tags = set()
+    for service_id, provider_id in bookings:
+        tags.update((f'service:{service_id}', f'provider:{provider_id}'))
+    if tags:
+        transaction.on_commit(partial(invalidate_tags, *tags))
+
+
+def apply_transitions(transitions, notify=True):
+    """
+    Apply many status transitions at once
+
+    Each booking moves only if its row still has the status the caller
+    loaded: transitions are grouped by (from, to, cancellation reason) and
+    every group is one `UPDATE ... WHERE id IN (...) AND status = <from>`.
+    Rows someone else moved first are reported as conflicts rather than
+    overwritten. History rows, provider completion counts, queued emails
+    and feed entries are written in the same transaction; cache
+    invalidation and stream pushes run after commit. Applied bookings are
+    updated in memory.
+    """
+    now = timezone.now()
+    rejected = {}
+    groups = defaultdict(list)
+    # A booking may appear only once per call
+    occurrences = Counter(transition.booking.pk for transition in transitions)
+    for transition in transitions:
+        booking = transition.booking
+        if occurrences[booking.pk] > 1 or not can_transition(booking.status, transition.to_status):
+            rejected[booking.pk] = INVALID
+            continue
+        key = (booking.status, transition.to_status, transition.cancellation_reason)
+        groups[key].append(transition)
+
+    applied = []
+    history = []
+    with transaction.atomic():
+        for (from_status, to_status, reason), group in groups.items():
+            ids = update_status(
+                [transition.booking.pk for transition in group],
+                from_status, to_status, now, reason
+            )
+
+            for transition in group:
+                booking = transition.booking
+                if booking.pk not in ids:
+                    rejected[booking.pk] = CONFLICT
+                    continue
+                mark_applied(booking, to_status, now, reason)
+                applied.append((booking, from_status))
+                history.append(BookingStatusHistory(
+                    booking=booking,
+                    from_status=from_status,
+                    to_status=to_status,
+                    changed_by=transition.changed_by,
+                    notes=transition.notes
+                ))
+
+        BookingStatusHistory.objects.bulk_create(history)
+        count_completions([
+            booking.provider_id for booking, _ in applied
+            if booking.status == BookingStatus.COMPLETED
+        ])
+        invalidate_on_commit((booking.service_id, booking.provider_id) for booking, _ in applied)
+        if notify:
+            notify_users(
+                event for booking, from_status in applied
+                for event in status_changed_events(booking, from_status)
+            )
+            transaction.on_commit(partial(push.publish, status_push_events(history)))
+
+    return TransitionResult(applied, rejected)
+
+
+def transition_booking(booking, to_status, changed_by=None, notes='', cancellation_reason='', notify=True):
+    """
+    Apply a single transition; raises InvalidTransition or TransitionConflict
+    """
+    result = apply_transitions(
+        [Transition(booking, to_status, changed_by, notes, cancellation_reason)],
+        notify=notify
+    )
+    reason = result.rejected.get(booking.pk)
+    if reason == INVALID:
+        raise InvalidTransition(f'Cannot transition from {booking.status} to {to_status}')
+    if reason == CONFLICT:
+        raise TransitionConflict()
+    return booking
@@ -10,6 +10,8 @@ urlpatterns = [
     # Booking Management
     path('', views.BookingListView.as_view(), name='booking_list'),
     path('create/', views.BookingCreateView.as_view(), name='booking_create'),
+    path('slots/', views.AvailableSlotsView.as_view(), name='booking_slots'),
+    path('bulk-status/', views.BookingBulkStatusUpdateView.as_view(), name='booking_bulk_status'),
     path('<str:booking_reference>/', views.BookingDetailView.as_view(), name='booking_detail'),
     path('<str:booking_reference>/update/', views.BookingUpdateView.as_view(), name='booking_update'),
     path('<str:booking_reference>/status/', views.BookingStatusUpdateView.as_view(), name='booking_status'),
@@ -4,7 +4,6 @@ Booking Views
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
 from django.db.models import Q
 
 from bookings.models import Booking, BookingStatusHistory, BookingAttachment
@@ -12,9 +11,17 @@ from bookings.serializers import (
     BookingListSerializer, BookingDetailSerializer,
     BookingCreateSerializer, BookingUpdateSerializer,
     BookingStatusUpdateSerializer, BookingAttachmentSerializer,
-    BookingStatusHistorySerializer
+    BookingStatusHistorySerializer, SlotSearchSerializer,
+    BookingBulkStatusSerializer
 )
-from users.permissions import IsCustomer, IsServiceProvider, IsOwnerOrAdmin
+from bookings.availability import find_available_slots
+from bookings.transitions import Transition, apply_transitions, transition_booking
+from users.permissions import (
+    IsCustomer, IsServiceProvider, IsOwnerOrAdmin, IsSuperAdminOrAdmin
+)
+from core.pagination import KeysetPagination
+from core.eager_loading import eager_load
+from core.mixins import EagerLoadingMixin
 
 
 class BookingCreateView(generics.CreateAPIView):
@@ -30,23 +37,23 @@ class BookingCreateView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         booking = serializer.save()
         
-        # Trigger async task for notification
-        from bookings.tasks import send_booking_notification
-        send_booking_notification.delay(booking.id)
-        
+        # One query for everything the detail serializer reads
+        booking = eager_load(Booking.objects.all(), BookingDetailSerializer).get(pk=booking.pk)
         return Response(
             BookingDetailSerializer(booking).data,
             status=status.HTTP_201_CREATED
         )
 
 
-class BookingListView(generics.ListAPIView):
+class BookingListView(EagerLoadingMixin, generics.ListAPIView):
     """
     List bookings
     GET /api/bookings/
     """
     permission_classes = [IsAuthenticated]
     serializer_class = BookingListSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ['-created_at', 'id']
     
     def get_queryset(self):
         user = self.request.user
@@ -77,7 +84,7 @@ class BookingListView(generics.ListAPIView):
         ).order_by('-created_at')
 
 
-class BookingDetailView(generics.RetrieveAPIView):
+class BookingDetailView(EagerLoadingMixin, generics.RetrieveAPIView):
     """
     Get booking details
     GET /api/bookings/{booking_reference}/
@@ -119,7 +126,9 @@ class BookingStatusUpdateView(views.APIView):
     
     def post(self, request, booking_reference):
         try:
-            booking = Booking.objects.get(booking_reference=booking_reference)
+            booking = eager_load(
+                Booking.objects.all(), BookingDetailSerializer
+            ).get(booking_reference=booking_reference)
         except Booking.DoesNotExist:
             return Response(
                 {'error': 'Booking not found'},
@@ -145,42 +154,69 @@ class BookingStatusUpdateView(views.APIView):
         )
         serializer.is_valid(raise_exception=True)
         
-        old_status = booking.status
-        new_status = serializer.validated_data['status']
-        notes = serializer.validated_data.get('notes', '')
-        
-        # Update booking status
-        booking.status = new_status
+        # Conditional update + history; notifies after commit
+        transition_booking(
+            booking,
+            serializer.validated_data['status'],
+            changed_by=user,
+            notes=serializer.validated_data.get('notes', ''),
+            cancellation_reason=serializer.validated_data.get('cancellation_reason', '')
+        )
         
-        if new_status == Booking.BookingStatus.CONFIRMED:
-            booking.confirmed_at = timezone.now()
-        elif new_status == Booking.BookingStatus.COMPLETED:
-            booking.completed_at = timezone.now()
-            if not booking.actual_end_time:
-                booking.actual_end_time = timezone.now()
-        elif new_status == Booking.BookingStatus.CANCELLED:
-            booking.cancelled_at = timezone.now()
-            booking.cancellation_reason = serializer.validated_data.get('cancellation_reason', '')
-        elif new_status == Booking.BookingStatus.IN_PROGRESS:
-            if not booking.actual_start_time:
-                booking.actual_start_time = timezone.now()
+        return Response(BookingDetailSerializer(booking).data)
+
+
+class BookingBulkStatusUpdateView(views.APIView):
+    """
+    Update the status of many bookings at once (Provider or Admin)
+    POST /api/bookings/bulk-status/
+    """
+    permission_classes = [IsAuthenticated, IsServiceProvider | IsSuperAdminOrAdmin]
+    
+    def post(self, request):
+        serializer = BookingBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        references = params['booking_references']
         
-        booking.save()
+        user = request.user
+        bookings = Booking.objects.filter(
+            booking_reference__in=references
+        ).select_related('service')
+        if user.role == 'SERVICE_PROVIDER':
+            # Other providers' bookings are reported as not found
+            bookings = bookings.filter(provider=user)
+        bookings = {booking.booking_reference: booking for booking in bookings}
         
-        # Create status history
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            from_status=old_status,
-            to_status=new_status,
-            changed_by=user,
-            notes=notes
+        result = apply_transitions(
+            [
+                Transition(
+                    booking,
+                    params['status'],
+                    changed_by=user,
+                    notes=params.get('notes', ''),
+                    cancellation_reason=params.get('cancellation_reason', '')
+                )
+                for booking in bookings.values()
+            ]
         )
         
-        # Send notification
-        from bookings.tasks import send_status_update_notification
-        send_status_update_notification.delay(booking.id, old_status, new_status)
+        # Report in request order
+        updated, failed = [], []
+        for reference in references:
+            booking = bookings.get(reference)
+            if booking is None:
+                failed.append({'booking_reference': reference, 'error': 'not_found'})
+            elif booking.pk in result.rejected:
+                failed.append({'booking_reference': reference, 'error': result.rejected[booking.pk]})
+            else:
+                updated.append(reference)
         
-        return Response(BookingDetailSerializer(booking).data)
+        return Response({
+            'status': params['status'],
+            'updated': updated,
+            'failed': failed
+        })
 
 
 class BookingCancelView(views.APIView):
@@ -192,7 +228,9 @@ class BookingCancelView(views.APIView):
     
     def post(self, request, booking_reference):
         try:
-            booking = Booking.objects.get(booking_reference=booking_reference)
+            booking = eager_load(
+                Booking.objects.all(), BookingDetailSerializer
+            ).get(booking_reference=booking_reference)
         except Booking.DoesNotExist:
             return Response(
                 {'error': 'Booking not found'},
@@ -222,25 +260,18 @@ class BookingCancelView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        old_status = booking.status
-        booking.status = Booking.BookingStatus.CANCELLED
-        booking.cancelled_at = timezone.now()
-        booking.cancellation_reason = cancellation_reason
-        booking.save()
-        
-        # Create status history
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            from_status=old_status,
-            to_status=Booking.BookingStatus.CANCELLED,
+        transition_booking(
+            booking,
+            Booking.BookingStatus.CANCELLED,
             changed_by=user,
-            notes=f"Cancelled by {user.get_role_display()}"
+            notes=f"Cancelled by {user.get_role_display()}",
+            cancellation_reason=cancellation_reason
         )
         
         return Response(BookingDetailSerializer(booking).data)
 
 
-class BookingAttachmentView(generics.ListCreateAPIView):
+class BookingAttachmentView(EagerLoadingMixin, generics.ListCreateAPIView):
     """
     Manage booking attachments
     GET/POST /api/bookings/{booking_reference}/attachments/
@@ -271,7 +302,7 @@ class BookingAttachmentView(generics.ListCreateAPIView):
         )
 
 
-class BookingHistoryView(generics.ListAPIView):
+class BookingHistoryView(EagerLoadingMixin, generics.ListAPIView):
     """
     Get booking status history
     GET /api/bookings/{booking_reference}/history/
@@ -283,4 +314,34 @@ class BookingHistoryView(generics.ListAPIView):
         booking_reference = self.kwargs['booking_reference']
         return BookingStatusHistory.objects.filter(
             booking__booking_reference=booking_reference
-        ).order_by('-created_at')
\ No newline at end of file
+        ).order_by('-created_at')
+
+class AvailableSlotsView(views.APIView):
+    """
+    Free booking slots for one or more providers
+    GET /api/bookings/slots/?providers=1,2&start_date=YYYY-MM-DD
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = SlotSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        slots = find_available_slots(
+            params['providers'],
+            params['start_date'],
+            params['end_date'],
+            duration_minutes=params['duration'],
+            step_minutes=params['step']
+        )
+        
+        return Response({
+            'start_date': params['start_date'],
+            'end_date': params['end_date'],
+            'duration': params['duration'],
+            'results': [
+                {'provider': provider_id, 'slots': provider_slots}
+                for provider_id, provider_slots in slots.items()
+            ]
+        })
@@ -1,3 +1,22 @@
+"""
+Django Admin configuration for Notification models
+"""
 from django.contrib import admin
+from notifications.models import Notification, OutboxMessage
 
-# Register your models here.
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'recipient', 'kind', 'state', 'attempts', 'available_at', 'sent_at']
+    list_filter = ['kind', 'state']
+    search_fields = ['recipient__email', 'idempotency_key']
+    raw_id_fields = ['recipient']
+    readonly_fields = ['claim', 'claimed_until', 'created_at', 'sent_at']
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'recipient', 'kind', 'is_read', 'created_at']
+    list_filter = ['kind', 'is_read']
+    search_fields = ['recipient__email']
+    raw_id_fields = ['recipient']
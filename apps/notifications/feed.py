@@ -0,0 +1,58 @@
+"""
+In-app notification feed
+Fans events out to per-user inbox rows and keeps unread counters in step
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from core.counters import apply_deltas
+from notifications.models import Notification, UnreadCounter
+
+
+def change_unread(deltas):
+    """
+    Apply {user id: delta} to unread counters, one UPDATE per distinct delta
+    """
+    apply_deltas(UnreadCounter, 'count', deltas, key='user_id')
+
+
+def publish(events):
+    """
+    Add events to their recipients' feeds; call inside the transaction
+    making the change
+    """
+    events = list(events)
+    if not events:
+        return 0
+    Notification.objects.bulk_create([
+        Notification(recipient_id=event.recipient_id, kind=event.kind, payload=event.payload)
+        for event in events
+    ])
+    recipients = Counter(event.recipient_id for event in events)
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id) for user_id in recipients],
+        ignore_conflicts=True
+    )
+    change_unread(recipients)
+    return len(events)
+
+
+def mark_read(user, ids=None):
+    """
+    Mark the given notifications (or all) read; returns how many changed
+    """
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    with transaction.atomic():
+        marked = unread.update(is_read=True)
+        # A delta, not count=0: notifications created since the UPDATE
+        # are still unread
+        if marked:
+            change_unread({user.pk: -marked})
+    return marked
+
+
+def unread_count(user):
+    return UnreadCounter.objects.filter(user=user).values_list('count', flat=True).first() or 0
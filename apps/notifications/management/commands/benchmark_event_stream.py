@@ -0,0 +1,76 @@
+"""
+Management command to load test the event stream
+Opens many idle streams against the ASGI app in-process, measures the
+memory each one holds and how long one event takes to reach all of them
+Usage: python manage.py benchmark_event_stream [--connections N] [--backplane]
+"""
+import asyncio
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notifications.push import PushEvent, hub, publish
+from notifications.stream_client import StreamConnection
+
+
+def token_for(user_id):
+    # Streams trust the signed claim, so no user rows are needed
+    token = AccessToken()
+    token[api_settings.USER_ID_CLAIM] = user_id
+    return str(token)
+
+
+class Command(BaseCommand):
+    help = 'Measure memory per idle event stream and event fan-out latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=0, help='Distinct users (default: one per connection)')
+        parser.add_argument('--backplane', action='store_true', help='Fan out through PUSH_REDIS_URL')
+
+    def handle(self, *args, **options):
+        if options['backplane']:
+            asyncio.run(self.run(options))
+            return
+        with override_settings(PUSH_REDIS_URL=None):
+            asyncio.run(self.run(options))
+
+    async def run(self, options):
+        count = options['connections']
+        users = options['users'] or count
+        tokens = [token_for(index + 1) for index in range(users)]
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        streams = [StreamConnection(token=tokens[index % users]) for index in range(count)]
+        await asyncio.gather(*(stream.open() for stream in streams))
+        opened = time.perf_counter() - began
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"open: {hub.stream_count()} streams for {len(hub.listeners)} users in {opened:.3f}s, "
+            f"{held / count / 1024:.1f} KiB per idle stream "
+            f"(~{2 ** 30 // max(held // count, 1)} streams per GiB)"
+        )
+
+        began = time.perf_counter()
+        publish([PushEvent(range(1, users + 1), 'booking.status', {'to_status': 'CONFIRMED'}, 1)])
+        await asyncio.gather(*(stream.wait_for_events(1, timeout=60) for stream in streams))
+        fanned_out = time.perf_counter() - began
+        received = sum(len(stream.events()) for stream in streams)
+        self.stdout.write(
+            f"fan-out: 1 event to {received} streams in {fanned_out * 1000:.1f}ms, "
+            f"{received / fanned_out:.0f} deliveries/s"
+        )
+
+        began = time.perf_counter()
+        await asyncio.gather(*(stream.close() for stream in streams))
+        self.stdout.write(
+            f"close: {time.perf_counter() - began:.3f}s, {hub.stream_count()} streams left"
+        )
@@ -0,0 +1,94 @@
+"""
+Management command to benchmark the notification outbox
+Queues status events for a set of recipients and drains them through the
+pooled SMTP backend into a local fake SMTP server
+Usage: python manage.py benchmark_outbox [--events N] [--recipients N] [--chunk-size N]
+"""
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.fake_smtp import FakeSMTPServer
+from core.mail import close_pools
+from notifications.models import OutboxMessage
+from notifications.outbox import Event, dispatch, enqueue
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Measure outbox enqueue and dispatch throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=5000)
+        parser.add_argument('--recipients', type=int, default=500)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        digits = str(int(suffix, 16))[-8:]
+        users = [
+            User.objects.create_user(
+                email=f'bench-outbox-{suffix}-{index}@example.com',
+                password=None,
+                first_name='Bench',
+                last_name='Recipient',
+                phone=f'+7{index:04d}{digits}'[:16],
+                role=User.UserRole.CUSTOMER
+            )
+            for index in range(options['recipients'])
+        ]
+        try:
+            self.run(users, suffix, options)
+        finally:
+            OutboxMessage.objects.filter(recipient__in=users).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, users, suffix, options):
+        events = [
+            Event(
+                users[index % len(users)].pk,
+                OutboxMessage.Kind.BOOKING_STATUS,
+                {
+                    'booking_reference': f'BK{index:012d}',
+                    'service_title': 'Benchmark',
+                    'scheduled_date': '2030-01-01',
+                    'scheduled_time': '10:00:00',
+                    'from_status': 'PENDING',
+                    'status': 'CONFIRMED',
+                },
+                f'bench:{suffix}:{index}'
+            )
+            for index in range(options['events'])
+        ]
+
+        began = timezone.now()
+        enqueue(events)
+        enqueue_elapsed = (timezone.now() - began).total_seconds()
+        OutboxMessage.objects.filter(recipient__in=users).update(available_at=timezone.now())
+
+        with FakeSMTPServer() as server:
+            with override_settings(
+                EMAIL_BACKEND='core.mail.PooledEmailBackend',
+                EMAIL_HOST=server.host,
+                EMAIL_PORT=server.port,
+                EMAIL_USE_TLS=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD=''
+            ):
+                try:
+                    report = dispatch(chunk_size=options['chunk_size'])
+                finally:
+                    close_pools()
+
+        self.stdout.write(
+            f"Enqueue: {len(events)} events in {enqueue_elapsed:.3f}s "
+            f"({len(events) / enqueue_elapsed:.0f} events/s)"
+        )
+        self.stdout.write(
+            f"Dispatch: {report['messages']} messages as {report['emails']} emails "
+            f"({report['failed']} failed) in {report['chunks']} chunks, {report['elapsed']:.3f}s, "
+            f"{report['messages'] / report['elapsed']:.0f} messages/s, "
+            f"{report['emails_per_second']} emails/s, {server.connections} SMTP connection(s)"
+        )
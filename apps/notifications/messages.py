@@ -0,0 +1,111 @@
+"""
+Notification templates
+Each kind renders one payload as a single email and several as a digest,
+plus a one-line summary for the in-app feed
+"""
+from notifications.models import OutboxMessage
+
+Kind = OutboxMessage.Kind
+
+
+def booking_line(payload):
+    return (
+        f"        {payload['booking_reference']}: {payload['service_title']} "
+        f"on {payload['scheduled_date']} at {payload['scheduled_time']}"
+    )
+
+
+def render_booking_created(payloads):
+    if len(payloads) > 1:
+        lines = '\n'.join(booking_line(payload) for payload in payloads)
+        return f'{len(payloads)} New Bookings', f"""
+        You have {len(payloads)} new bookings.
+
+{lines}
+
+        Please log in to review them.
+        """
+
+    payload = payloads[0]
+    if payload['role'] == 'provider':
+        return f"New Booking: {payload['service_title']}", f"""
+        You have a new booking!
+
+        Booking Reference: {payload['booking_reference']}
+        Customer: {payload['customer_name']}
+        Service: {payload['service_title']}
+        Date: {payload['scheduled_date']}
+        Time: {payload['scheduled_time']}
+
+        Please log in to confirm or decline this booking.
+        """
+    return 'Booking Confirmation', f"""
+        Thank you for your booking!
+
+        Booking Reference: {payload['booking_reference']}
+        Service: {payload['service_title']}
+        Provider: {payload['provider_name']}
+        Date: {payload['scheduled_date']}
+        Time: {payload['scheduled_time']}
+
+        We will notify you once the provider confirms your booking.
+        """
+
+
+def render_booking_status(payloads):
+    # Only the latest change per booking matters to the reader
+    latest = {payload['booking_reference']: payload for payload in payloads}
+    if len(latest) > 1:
+        lines = '\n'.join(
+            f"{booking_line(payload)}: {payload['status']}" for payload in latest.values()
+        )
+        return f'Booking Status Update: {len(latest)} bookings', f"""
+        The status of {len(latest)} of your bookings has been updated.
+
+{lines}
+
+        Please log in to view more details.
+        """
+
+    payload = payloads[-1]
+    return f"Booking Status Update: {payload['booking_reference']}", f"""
+        Your booking status has been updated.
+
+        Booking Reference: {payload['booking_reference']}
+        Service: {payload['service_title']}
+        Status: {payload['status']}
+
+        Please log in to view more details.
+        """
+
+
+RENDERERS = {
+    Kind.BOOKING_CREATED: render_booking_created,
+    Kind.BOOKING_STATUS: render_booking_status,
+}
+
+
+def render(kind, payloads):
+    """
+    (subject, body) for one or more payloads of the same kind
+    """
+    return RENDERERS[kind](payloads)
+
+
+SUMMARIES = {
+    Kind.BOOKING_CREATED: lambda payload: (
+        f"New booking {payload['booking_reference']} from {payload['customer_name']}"
+        if payload['role'] == 'provider'
+        else f"Booking {payload['booking_reference']} received"
+    ),
+    Kind.BOOKING_STATUS: lambda payload: (
+        f"Booking {payload['booking_reference']} is now {payload['status']}"
+    ),
+}
+
+
+def summary(kind, payload):
+    """
+    One-line text for a feed entry
+    """
+    return SUMMARIES[kind](payload)
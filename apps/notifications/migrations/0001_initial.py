@@ -0,0 +1,42 @@
+# Generated by Django 4.2.9 on 2026-10-17 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('BOOKING_CREATED', 'Booking Created'), ('BOOKING_STATUS', 'Booking Status Changed')], max_length=30)),
+                ('payload', models.JSONField(default=dict)),
+                ('digest_key', models.CharField(max_length=100)),
+                ('idempotency_key', models.CharField(max_length=200, unique=True)),
+                ('state', models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claim', models.UUIDField(blank=True, null=True)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notification_outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['state', 'available_at'], name='notificatio_state_8ee022_idx'), models.Index(fields=['recipient', 'digest_key', 'state'], name='notificatio_recipie_59b35d_idx'), models.Index(fields=['claim'], name='notificatio_claim_7e86a7_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,114 @@
+"""
+Notification Models
+Durable email outbox and in-app feed, both written alongside the changes
+that cause them
+"""
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from users.models import User
 
-# Create your models here.
+
+class OutboxMessage(models.Model):
+    """
+    One pending notification for one recipient
+    Rows are inserted in the same transaction as the event and delivered
+    later by the outbox dispatcher, so nothing is sent for rolled-back
+    changes and failed deliveries are retried
+    """
+    
+    class Kind(models.TextChoices):
+        BOOKING_CREATED = 'BOOKING_CREATED', _('Booking Created')
+        BOOKING_STATUS = 'BOOKING_STATUS', _('Booking Status Changed')
+    
+    class State(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        SENDING = 'SENDING', _('Sending')
+        SENT = 'SENT', _('Sent')
+        FAILED = 'FAILED', _('Failed')
+    
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages'
+    )
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    payload = models.JSONField(default=dict)
+    
+    # Messages sharing a digest key and recipient are delivered as one email
+    digest_key = models.CharField(max_length=100)
+    # Enqueuing the same event twice is a no-op
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    
+    state = models.CharField(
+        max_length=10,
+        choices=State.choices,
+        default=State.PENDING
+    )
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['state', 'available_at']),
+            models.Index(fields=['recipient', 'digest_key', 'state']),
+            models.Index(fields=['claim']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} for {self.recipient_id} ({self.state})"
+
+
+class Notification(models.Model):
+    """
+    In-app feed entry, fanned out to each recipient on write
+    Only the event kind and its payload are stored; text is rendered on read
+    """
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    kind = models.CharField(max_length=30, choices=OutboxMessage.Kind.choices)
+    payload = models.JSONField(default=dict)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'notifications'
+        ordering = ['-created_at', 'id']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', 'id']),
+            models.Index(fields=['recipient', 'is_read']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} for {self.recipient_id}"
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread notifications per user, maintained incrementally so polling it
+    is a primary key lookup
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'notification_unread_counters'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
@@ -0,0 +1,217 @@
+"""
+Notification outbox
+Enqueue notifications inside the caller's transaction and deliver them in
+batches, merging bursts for the same recipient into one digest email
+"""
+import logging
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from email.utils import parseaddr
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications.messages import render
+from notifications.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+Kind = OutboxMessage.Kind
+State = OutboxMessage.State
+
+# Messages are held until the end of the current window so bursts merge
+DIGEST_WINDOWS = {
+    Kind.BOOKING_CREATED: timedelta(0),
+    Kind.BOOKING_STATUS: timedelta(minutes=1),
+}
+
+DISPATCH_CHUNK_SIZE = 500
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_DELAY = timedelta(minutes=1)
+MAX_ATTEMPTS = 5
+
+# digest_key defaults to the kind
+Event = namedtuple(
+    'Event',
+    ['recipient_id', 'kind', 'payload', 'idempotency_key', 'digest_key'],
+    defaults=(None,)
+)
+
+
+def digest_due(kind, now):
+    """
+    When a message of this kind opened at `now` is delivered
+
+    Due times are aligned to the end of the kind's window, so a burst of
+    events inside one window shares a due time and is claimed and merged
+    together, without reading the outbox on the write path.
+    """
+    window = DIGEST_WINDOWS.get(kind, timedelta(0)).total_seconds()
+    if not window:
+        return now
+    timestamp = now.timestamp()
+    return now + timedelta(seconds=window - timestamp % window)
+
+
+def enqueue(events):
+    """
+    Write events to the outbox; call inside the transaction making the change
+
+    Events whose idempotency key is already queued are ignored.
+    """
+    now = timezone.now()
+    messages = [
+        OutboxMessage(
+            recipient_id=event.recipient_id,
+            kind=event.kind,
+            payload=event.payload,
+            digest_key=event.digest_key or event.kind,
+            idempotency_key=event.idempotency_key,
+            available_at=digest_due(event.kind, now)
+        )
+        for event in events
+    ]
+    OutboxMessage.objects.bulk_create(messages, ignore_conflicts=True)
+    return len(messages)
+
+
+def claim_due(chunk_size, now):
+    """
+    Claim up to chunk_size due messages for this dispatcher
+
+    The claim is one conditional UPDATE stamping a fresh token, so
+    concurrent dispatchers never deliver the same row; claims expire after
+    CLAIM_LEASE in case a dispatcher dies mid-chunk.
+    """
+    due = Q(state=State.PENDING, available_at__lte=now) | Q(state=State.SENDING, claimed_until__lt=now)
+    # A digest's rows share a due time, so this keeps them in one chunk
+    ids = list(OutboxMessage.objects.filter(due).order_by(
+        'available_at', 'recipient_id', 'digest_key', 'id'
+    ).values_list('id', flat=True)[:chunk_size])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    OutboxMessage.objects.filter(due, pk__in=ids).update(
+        state=State.SENDING, claim=token, claimed_until=now + CLAIM_LEASE
+    )
+    return list(OutboxMessage.objects.filter(claim=token).select_related('recipient').order_by('id'))
+
+
+def digest_groups(messages):
+    """
+    Messages grouped by (recipient, digest key), oldest first
+    """
+    groups = defaultdict(list)
+    for message in messages:
+        groups[(message.recipient_id, message.digest_key)].append(message)
+    return list(groups.values())
+
+
+def build_email(group):
+    """
+    One EmailMessage for a digest group
+    """
+    recipient = group[0].recipient
+    subject, body = render(group[0].kind, [message.payload for message in group])
+    ids = [message.pk for message in group]
+    domain = parseaddr(settings.DEFAULT_FROM_EMAIL)[1].rpartition('@')[2] or 'localhost'
+    return EmailMessage(
+        subject,
+        body,
+        settings.EMAIL_HOST_USER,
+        [recipient.email],
+        # Stable across retries so receivers can drop duplicate deliveries
+        headers={'Message-ID': f'<outbox-{ids[0]}-{ids[-1]}-{len(ids)}@{domain}>'}
+    )
+
+
+def record_results(sent, failed, now):
+    """
+    Mark delivered rows sent and schedule failed ones for retry
+    """
+    if sent:
+        OutboxMessage.objects.filter(pk__in=sent).update(
+            state=State.SENT, sent_at=now, claim=None, claimed_until=None
+        )
+    by_error = defaultdict(list)
+    for pk, error in failed.items():
+        by_error[error].append(pk)
+    for error, ids in by_error.items():
+        OutboxMessage.objects.filter(pk__in=ids).update(
+            state=State.PENDING,
+            attempts=F('attempts') + 1,
+            available_at=now + RETRY_DELAY,
+            claim=None,
+            claimed_until=None,
+            last_error=error
+        )
+    if failed:
+        OutboxMessage.objects.filter(
+            pk__in=list(failed), attempts__gte=MAX_ATTEMPTS
+        ).update(state=State.FAILED)
+
+
+def deliver(messages, now):
+    """
+    Send claimed messages as one email per digest group over one
+    connection; returns (emails sent, messages failed)
+    """
+    groups = digest_groups(messages)
+    sent, failed = [], {}
+    emails = 0
+    try:
+        with get_connection() as connection:
+            for group in groups:
+                ids = [message.pk for message in group]
+                try:
+                    delivered = connection.send_messages([build_email(group)])
+                except Exception as exc:
+                    logger.warning('Outbox delivery to %s failed: %s', group[0].recipient_id, exc)
+                    failed.update(dict.fromkeys(ids, repr(exc)))
+                    continue
+                if delivered:
+                    emails += 1
+                    sent.extend(ids)
+                else:
+                    failed.update(dict.fromkeys(ids, 'Not sent'))
+    except Exception as exc:
+        logger.warning('Outbox connection failed: %s', exc)
+        for message in messages:
+            if message.pk not in sent:
+                failed.setdefault(message.pk, repr(exc))
+    finally:
+        record_results(sent, failed, now)
+    return emails, len(failed)
+
+
+def dispatch(chunk_size=DISPATCH_CHUNK_SIZE, max_chunks=None):
+    """
+    Drain due outbox messages chunk by chunk; returns a throughput report
+    """
+    started = time.perf_counter()
+    report = {'chunks': 0, 'messages': 0, 'emails': 0, 'failed': 0}
+    while max_chunks is None or report['chunks'] < max_chunks:
+        now = timezone.now()
+        messages = claim_due(chunk_size, now)
+        if not messages:
+            break
+        emails, failed = deliver(messages, now)
+        report['chunks'] += 1
+        report['messages'] += len(messages)
+        report['emails'] += emails
+        report['failed'] += failed
+
+    elapsed = time.perf_counter() - started
+    report['elapsed'] = round(elapsed, 3)
+    report['emails_per_second'] = round(report['emails'] / elapsed, 1) if elapsed else 0
+    if report['messages']:
+        logger.info(
+            'Outbox: %s messages as %s emails (%s failed) in %s chunks: %.3fs, %.1f emails/s',
+            report['messages'], report['emails'], report['failed'], report['chunks'],
+            elapsed, report['emails_per_second']
+        )
+    return report
@@ -0,0 +1,199 @@
+"""
+Real-time push
+Per-process hub of open event streams, fed through a Redis pub/sub
+backplane so an event published by any process reaches every stream
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'push:user:'
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+# Queued in place of events a slow stream could not keep up with
+OVERFLOW = object()
+
+# id becomes the SSE event id clients send back as Last-Event-ID
+PushEvent = namedtuple('PushEvent', ['user_ids', 'event', 'data', 'id'], defaults=(None,))
+
+
+def user_channel(user_id):
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+def encode_event(event):
+    return json.dumps({'event': event.event, 'id': event.id, 'data': event.data}, default=str)
+
+
+_publisher = None
+
+
+def get_publisher():
+    """
+    Sync Redis client for publishing, or None without a backplane
+    """
+    global _publisher
+    if not settings.PUSH_REDIS_URL:
+        return None
+    if _publisher is None:
+        import redis
+        _publisher = redis.Redis.from_url(settings.PUSH_REDIS_URL)
+    return _publisher
+
+
+def publish(events):
+    """
+    Send events to every open stream of their users, in one round trip
+
+    Call after commit. Delivery is best effort: streams that miss events
+    catch up from the database when they reconnect with Last-Event-ID.
+    """
+    deliveries = [
+        (user_id, encode_event(event))
+        for event in events
+        for user_id in set(event.user_ids)
+    ]
+    if not deliveries:
+        return
+    publisher = get_publisher()
+    if publisher is None:
+        hub.deliver_threadsafe(deliveries)
+        return
+    try:
+        with publisher.pipeline(transaction=False) as pipeline:
+            for user_id, message in deliveries:
+                pipeline.publish(user_channel(user_id), message)
+            pipeline.execute()
+    except Exception:
+        logger.warning('Could not publish %s push events', len(deliveries))
+
+
+class PushHub:
+    """
+    Open streams in this process, keyed by user
+
+    With a backplane, one Redis connection carries a channel per user with
+    a local stream, subscribed while the first stream is open and dropped
+    with the last. Each stream has a bounded queue; a stream that falls
+    behind is closed and catches up when it reconnects.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size
+        self.listeners = defaultdict(set)
+        self.loop = None
+        self.redis = None
+        self.pubsub = None
+        self.reader = None
+        self.active = None
+
+    @property
+    def redis_url(self):
+        return settings.PUSH_REDIS_URL
+
+    async def subscribe(self, user_id):
+        self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size or settings.PUSH_QUEUE_SIZE)
+        first = not self.listeners[user_id]
+        self.listeners[user_id].add(queue)
+        if first and self.redis_url:
+            await self.ensure_backplane()
+            self.active.set()
+            try:
+                await self.pubsub.subscribe(user_channel(user_id))
+            except Exception:
+                # The reader subscribes every local user when it reconnects
+                logger.warning('Could not subscribe push channel for user %s', user_id)
+        return queue
+
+    async def unsubscribe(self, user_id, queue):
+        streams = self.listeners.get(user_id)
+        if streams is None:
+            return
+        streams.discard(queue)
+        if streams:
+            return
+        del self.listeners[user_id]
+        if self.pubsub is not None:
+            if not self.listeners:
+                self.active.clear()
+            try:
+                await self.pubsub.unsubscribe(user_channel(user_id))
+            except Exception:
+                logger.warning('Could not unsubscribe push channel for user %s', user_id)
+
+    async def ensure_backplane(self):
+        if self.reader is not None and not self.reader.done():
+            return
+        import redis.asyncio
+        self.redis = redis.asyncio.Redis.from_url(self.redis_url)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.active = asyncio.Event()
+        self.reader = asyncio.ensure_future(self.read())
+
+    async def read(self):
+        """
+        Deliver backplane messages to local streams; reconnects forever
+        """
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                # listen() returns as soon as nothing is subscribed
+                await self.active.wait()
+                await self.pubsub.subscribe(*[user_channel(user_id) for user_id in self.listeners])
+                delay = RECONNECT_DELAY
+                async for message in self.pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    channel = message['channel'].decode()
+                    user_id = int(channel[len(CHANNEL_PREFIX):])
+                    self.deliver([(user_id, message['data'].decode())])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning('Push backplane disconnected; retrying in %ss', delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+
+    def deliver(self, deliveries):
+        """
+        Queue (user id, message) pairs for the users' local streams
+        """
+        for user_id, message in deliveries:
+            for queue in list(self.listeners.get(user_id, ())):
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Drop the backlog for the marker that closes the stream
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(OVERFLOW)
+
+    def deliver_threadsafe(self, deliveries):
+        """
+        Deliver from any thread without a backplane (single process only)
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.deliver(deliveries)
+        else:
+            loop.call_soon_threadsafe(self.deliver, deliveries)
+
+    def stream_count(self):
+        return sum(len(streams) for streams in self.listeners.values())
+
+
+hub = PushHub()
@@ -0,0 +1,29 @@
+"""
+Notification Serializers
+"""
+from rest_framework import serializers
+from notifications.messages import summary
+from notifications.models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """Serializer for feed entries"""
+    text = serializers.SerializerMethodField()
+    data = serializers.JSONField(source='payload', read_only=True)
+    
+    class Meta:
+        model = Notification
+        fields = ['id', 'kind', 'text', 'data', 'is_read', 'created_at']
+    
+    def get_text(self, obj):
+        return summary(obj.kind, obj.payload)
+
+
+class NotificationReadSerializer(serializers.Serializer):
+    """Notifications to mark read; all of them when ids is omitted"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=500
+    )
@@ -0,0 +1,97 @@
+"""
+In-process event stream client
+Drives the ASGI event stream directly, without a server, for tests and
+the connection benchmark
+"""
+import asyncio
+import json
+
+from notifications.streaming import STREAM_PATH, event_stream
+
+
+class StreamConnection:
+    """
+    One open stream; received events are parsed from the SSE body
+    """
+
+    def __init__(self, token=None, last_event_id=None, method='GET', app=event_stream):
+        self.app = app
+        self.token = token
+        self.last_event_id = last_event_id
+        self.method = method
+        self.status = None
+        self.body = b''
+        self.task = None
+        self.requested = False
+        self.disconnect = asyncio.Event()
+        self.changed = asyncio.Event()
+
+    def scope(self):
+        headers = []
+        if self.token:
+            headers.append((b'authorization', f'Bearer {self.token}'.encode()))
+        if self.last_event_id is not None:
+            headers.append((b'last-event-id', str(self.last_event_id).encode()))
+        return {
+            'type': 'http',
+            'method': self.method,
+            'path': STREAM_PATH,
+            'query_string': b'',
+            'headers': headers,
+        }
+
+    async def open(self):
+        self.task = asyncio.ensure_future(self.app(self.scope(), self.receive, self.send))
+        await self.wait(lambda: self.status is not None)
+        return self
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        else:
+            self.body += message.get('body', b'')
+        self.changed.set()
+
+    async def wait(self, condition, timeout=2):
+        async def until():
+            while not condition():
+                self.changed.clear()
+                if self.task.done():
+                    self.task.result()
+                    return
+                await self.changed.wait()
+        await asyncio.wait_for(until(), timeout)
+
+    async def wait_for_events(self, count, timeout=2):
+        await self.wait(lambda: len(self.events()) >= count or self.task.done(), timeout)
+        return self.events()
+
+    def events(self):
+        """
+        [{'event', 'id', 'data'}] received so far
+        """
+        events = []
+        for block in self.body.decode().split('\n\n'):
+            fields = {}
+            for line in block.split('\n'):
+                name, _, value = line.partition(': ')
+                fields[name] = value
+            if 'event' in fields:
+                events.append({
+                    'event': fields['event'],
+                    'id': int(fields['id']) if 'id' in fields else None,
+                    'data': json.loads(fields.get('data', 'null')),
+                })
+        return events
+
+    async def close(self):
+        self.disconnect.set()
+        self.changed.set()
+        await asyncio.wait_for(self.task, 2)
@@ -0,0 +1,189 @@
+"""
+Event stream
+A plain ASGI app serving Server-Sent Events, so an idle connection costs a
+queue and a coroutine rather than a worker thread
+GET /api/notifications/stream/
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bookings.events import latest_status_history_id, status_history_since
+from notifications.push import OVERFLOW, hub
+
+STREAM_PATH = '/api/notifications/stream/'
+RETRY_MILLISECONDS = 3000
+
+
+def header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def authenticate(scope, query):
+    """
+    (user id, token expiry as epoch seconds) from a Bearer token or
+    ?token= (EventSource cannot set headers), or None
+
+    The signed claims are trusted as-is, so opening a stream never touches
+    the database; the stream ends when the token expires instead.
+    """
+    authorization = header(scope, b'authorization') or ''
+    scheme, _, raw = authorization.partition(' ')
+    if scheme not in api_settings.AUTH_HEADER_TYPES:
+        raw = query.get('token', [''])[0]
+    if not raw:
+        return None
+    try:
+        token = AccessToken(raw)
+    except TokenError:
+        return None
+    return token.get(api_settings.USER_ID_CLAIM), token['exp']
+
+
+def last_event_id(scope, query):
+    value = header(scope, b'last-event-id') or query.get('last_event_id', [''])[0]
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def respond(send, status, detail):
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def replay(send, user_id, after):
+    """
+    Send events missed since after; returns the last id sent
+
+    More than PUSH_REPLAY_LIMIT missed events sends `reset` instead, telling
+    the client to reload over the REST API. It carries the newest event id,
+    so a reconnect after the reload resumes from there.
+    """
+    limit = settings.PUSH_REPLAY_LIMIT
+    events = await sync_to_async(status_history_since)(user_id, after, limit + 1)
+    if len(events) > limit:
+        latest = await sync_to_async(latest_status_history_id)(user_id)
+        await send({'type': 'http.response.body', 'body': format_event('reset', {}, latest), 'more_body': True})
+        return latest
+    for event in events:
+        await send({
+            'type': 'http.response.body',
+            'body': format_event(event.event, event.data, event.id),
+            'more_body': True,
+        })
+    return events[-1].id if events else after
+
+
+async def event_stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        await respond(send, 405, 'Method not allowed.')
+        return
+    query = parse_qs(scope.get('query_string', b'').decode())
+    credentials = authenticate(scope, query)
+    if credentials is None:
+        await respond(send, 401, 'Authentication credentials were not provided or are invalid.')
+        return
+    user_id, expires = credentials
+
+    # Subscribe before replaying so nothing falls between the two
+    queue = await hub.subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    pending = None
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f'retry: {RETRY_MILLISECONDS}\n\n'.encode(), 'more_body': True})
+
+        after = last_event_id(scope, query)
+        if after is not None:
+            after = await replay(send, user_id, after)
+
+        while True:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                # The client reconnects and needs a fresh token to do so
+                break
+            if pending is None:
+                pending = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {pending, disconnected},
+                timeout=min(settings.PUSH_HEARTBEAT, remaining),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                break
+            if not done:
+                if time.time() < expires:
+                    await send({'type': 'http.response.body', 'body': b': heartbeat\n\n', 'more_body': True})
+                continue
+
+            message, pending = pending.result(), None
+            if message is OVERFLOW:
+                # The client reconnects with Last-Event-ID and replays
+                break
+            event = json.loads(message)
+            if after is not None and event['id'] is not None and event['id'] <= after:
+                continue
+            await send({
+                'type': 'http.response.body',
+                'body': format_event(event['event'], event['data'], event['id']),
+                'more_body': True,
+            })
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        for task in (pending, disconnected):
+            if task is not None:
+                task.cancel()
+        await hub.unsubscribe(user_id, queue)
+
+
+def route(django_application):
+    """
+    ASGI application serving the event stream and Django for the rest
+    """
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+            await event_stream(scope, receive, send)
+        else:
+            await django_application(scope, receive, send)
+    return application
@@ -0,0 +1,14 @@
+"""
+Celery tasks for notifications
+"""
+from celery import shared_task
+
+
+@shared_task
+def dispatch_outbox():
+    """
+    Deliver due outbox messages in batches
+    """
+    from notifications.outbox import dispatch
+    
+    return dispatch()
@@ -1,3 +1,288 @@
-from django.test import TestCase
+"""
+Tests for notifications app
+"""
+import asyncio
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from django.utils import timezone
+
+from users.models import User
+from notifications import feed
+from notifications.feed import publish
+from notifications.models import Notification, OutboxMessage, UnreadCounter
+from notifications.outbox import Event, MAX_ATTEMPTS, claim_due, digest_due, dispatch, enqueue
+from notifications.push import PushEvent, hub, publish as push
+from notifications.stream_client import StreamConnection
+
+Kind = OutboxMessage.Kind
+State = OutboxMessage.State
+
+
+class NotificationTestMixin:
+    """Shared fixtures for notification tests"""
+
+    def create_users(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'user{index}@example.com',
+                password='testpass123',
+                first_name='Test',
+                last_name='User',
+                phone=f'+100000090{index}',
+                role=User.UserRole.CUSTOMER
+            )
+            for index in range(2)
+        ]
+
+    def status_event(self, user, reference, status='CONFIRMED'):
+        payload = {
+            'booking_reference': reference,
+            'service_title': 'Deep clean',
+            'scheduled_date': '2030-01-01',
+            'scheduled_time': '10:00:00',
+            'from_status': 'PENDING',
+            'status': status,
+        }
+        return Event(user.pk, Kind.BOOKING_STATUS, payload, f'{reference}:{status}:{user.pk}')
+
+
+class OutboxTestCase(NotificationTestMixin, TestCase):
+    """Test enqueueing, digests and batched delivery"""
+
+    def setUp(self):
+        self.create_users()
+
+    def make_due(self):
+        OutboxMessage.objects.update(available_at=timezone.now())
+
+    def test_enqueue_is_idempotent(self):
+        event = self.status_event(self.users[0], 'BK1')
+        enqueue([event])
+        enqueue([event])
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_burst_is_held_until_the_window_ends(self):
+        now = timezone.now()
+        due = digest_due(Kind.BOOKING_STATUS, now)
+        self.assertGreater(due, now)
+        self.assertLessEqual(due - now, timedelta(minutes=1))
+        self.assertEqual(digest_due(Kind.BOOKING_STATUS, now + (due - now) / 2), due)
+        self.assertEqual(digest_due(Kind.BOOKING_CREATED, now), now)
+
+        enqueue([self.status_event(self.users[0], 'BK1')])
+        self.assertEqual(dispatch()['messages'], 0)
+
+    def test_burst_is_merged_per_recipient(self):
+        enqueue([
+            self.status_event(self.users[0], f'BK{index}') for index in range(5)
+        ] + [
+            self.status_event(self.users[1], 'BK9'),
+            self.status_event(self.users[0], 'BK1', status='IN_PROGRESS'),
+        ])
+        self.make_due()
+
+        report = dispatch()
+        self.assertEqual((report['messages'], report['emails'], report['failed']), (7, 2, 0))
+        digest = next(message for message in mail.outbox if message.to == ['user0@example.com'])
+        self.assertEqual(digest.subject, 'Booking Status Update: 5 bookings')
+        self.assertIn('BK1: Deep clean on 2030-01-01 at 10:00:00: IN_PROGRESS', digest.body)
+        self.assertFalse(OutboxMessage.objects.exclude(state=State.SENT).exists())
+
+        # Delivered rows are never sent again
+        self.make_due()
+        self.assertEqual(dispatch()['messages'], 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_message_id_is_stable_across_retries(self):
+        enqueue([self.status_event(self.users[0], 'BK1')])
+        self.make_due()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            dispatch()
+        self.make_due()
+        dispatch()
+        pk = OutboxMessage.objects.get().pk
+        self.assertEqual(mail.outbox[0].extra_headers['Message-ID'], f'<outbox-{pk}-{pk}-1@marketplace.com>')
+
+    def test_failures_are_retried_then_given_up(self):
+        enqueue([self.status_event(self.users[0], 'BK1')])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            for _ in range(MAX_ATTEMPTS):
+                self.make_due()
+                self.assertEqual(dispatch()['failed'], 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.state, message.attempts), (State.FAILED, MAX_ATTEMPTS))
+        self.assertIn('down', message.last_error)
+        self.make_due()
+        self.assertEqual(dispatch()['messages'], 0)
+
+    def test_concurrent_claims_do_not_overlap(self):
+        enqueue([self.status_event(self.users[0], f'BK{index}') for index in range(4)])
+        self.make_due()
+        now = timezone.now()
+        first = claim_due(3, now)
+        second = claim_due(3, now)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({message.pk for message in first} & {message.pk for message in second})
+
+        # An expired claim is picked up again
+        OutboxMessage.objects.filter(pk=second[0].pk).update(claimed_until=now - timedelta(seconds=1))
+        self.assertEqual([message.pk for message in claim_due(3, now)], [second[0].pk])
+
+
+class NotificationFeedTestCase(NotificationTestMixin, APITestCase):
+    """Test the in-app feed and unread counters"""
+
+    def setUp(self):
+        self.create_users()
+        self.client.force_authenticate(self.users[0])
+
+    def unread(self):
+        return UnreadCounter.objects.get(user=self.users[0]).count
+
+    def test_publish_fans_out_and_counts(self):
+        publish([self.status_event(self.users[0], f'BK{index}') for index in range(3)] + [
+            self.status_event(self.users[1], 'BK9')
+        ])
+        self.assertEqual(self.unread(), 3)
+        self.assertEqual(UnreadCounter.objects.get(user=self.users[1]).count, 1)
+
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['text'], 'Booking BK2 is now CONFIRMED')
+
+    def test_feed_is_cursor_paginated(self):
+        publish([self.status_event(self.users[0], f'BK{index}') for index in range(5)])
+        Notification.objects.update(created_at=timezone.now())
+
+        seen = []
+        url = '/api/notifications/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(Notification.objects.values_list('id', flat=True)))
+
+    def test_mark_read(self):
+        publish([self.status_event(self.users[0], f'BK{index}') for index in range(3)])
+        first = Notification.objects.filter(recipient=self.users[0]).first()
+
+        response = self.client.post('/api/notifications/read/', {'ids': [first.pk, first.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 2})
+        # Already read: the counter does not move again
+        response = self.client.post('/api/notifications/read/', {'ids': [first.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 0, 'unread': 2})
+
+        unread = self.client.get('/api/notifications/?unread=true')
+        self.assertNotIn(first.pk, [item['id'] for item in unread.data['results']])
+
+        response = self.client.post('/api/notifications/read/', {}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 0})
+
+    def test_mark_all_read_keeps_later_notifications_unread(self):
+        publish([self.status_event(self.users[0], f'BK{index}') for index in range(2)])
+        change_unread = feed.change_unread
+        late = [self.status_event(self.users[0], 'BK9')]
+
+        def publish_then_change(deltas):
+            # A notification lands between the read UPDATE and the counter write
+            if late:
+                publish([late.pop()])
+            change_unread(deltas)
+
+        with mock.patch.object(feed, 'change_unread', side_effect=publish_then_change):
+            response = self.client.post('/api/notifications/read/', {}, format='json')
+        self.assertEqual(response.data['marked'], 2)
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(self.unread(), Notification.objects.filter(recipient=self.users[0], is_read=False).count())
+
+    def test_other_users_notifications_cannot_be_read(self):
+        publish([self.status_event(self.users[1], 'BK9')])
+        other = Notification.objects.get()
+        response = self.client.post('/api/notifications/read/', {'ids': [other.pk]}, format='json')
+        self.assertEqual(response.data['marked'], 0)
+        self.assertEqual(self.client.get('/api/notifications/').data['results'], [])
+
+    def test_unread_count_is_cheap_and_revalidates(self):
+        publish([self.status_event(self.users[0], 'BK1')])
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.data, {'unread': 1})
+
+        etag = response['ETag']
+        response = self.client.get('/api/notifications/unread-count/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        publish([self.status_event(self.users[0], 'BK2')])
+        response = self.client.get('/api/notifications/unread-count/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data, {'unread': 2})
+
+    def test_unread_count_without_notifications(self):
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data, {'unread': 0})
+
+
+class EventStreamTestCase(NotificationTestMixin, TestCase):
+    """Test the ASGI event stream and push hub"""
+
+    def setUp(self):
+        self.create_users()
+        self.tokens = [str(AccessToken.for_user(user)) for user in self.users]
+
+    async def test_stream_requires_a_valid_token(self):
+        for token in (None, 'not-a-token'):
+            stream = await StreamConnection(token=token).open()
+            await stream.task
+            self.assertEqual(stream.status, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(hub.stream_count(), 0)
+
+    async def test_stream_ends_when_the_token_expires(self):
+        token = AccessToken.for_user(self.users[0])
+        token.set_exp(lifetime=timedelta(seconds=1))
+        stream = await StreamConnection(token=str(token)).open()
+        self.assertEqual(stream.status, status.HTTP_200_OK)
+        await asyncio.wait_for(stream.task, 3)
+        self.assertEqual(hub.stream_count(), 0)
+
+    async def test_events_reach_only_their_users(self):
+        first = await StreamConnection(token=self.tokens[0]).open()
+        second = await StreamConnection(token=self.tokens[1]).open()
+        self.assertEqual(first.status, status.HTTP_200_OK)
+        self.assertIn(b'retry: ', first.body)
+
+        push([PushEvent((self.users[0].pk,), 'booking.status', {'to_status': 'CONFIRMED'}, 7)])
+        events = await first.wait_for_events(1)
+        self.assertEqual(events, [{'event': 'booking.status', 'id': 7, 'data': {'to_status': 'CONFIRMED'}}])
+        self.assertEqual(second.events(), [])
+
+        await first.close()
+        await second.close()
+
+    async def test_disconnect_releases_the_stream(self):
+        streams = [await StreamConnection(token=self.tokens[0]).open() for _ in range(3)]
+        self.assertEqual(hub.stream_count(), 3)
+        for stream in streams:
+            await stream.close()
+        self.assertEqual(hub.stream_count(), 0)
+        self.assertEqual(dict(hub.listeners), {})
+
+    @override_settings(PUSH_HEARTBEAT=0.01)
+    async def test_idle_stream_gets_heartbeats(self):
+        stream = await StreamConnection(token=self.tokens[0]).open()
+        await stream.wait(lambda: b': heartbeat' in stream.body)
+        await stream.close()
+
+    @override_settings(PUSH_QUEUE_SIZE=2)
+    async def test_slow_stream_is_closed(self):
+        stream = await StreamConnection(token=self.tokens[0]).open()
+        push([PushEvent((self.users[0].pk,), 'booking.status', {}, index) for index in range(5)])
+        await asyncio.wait_for(stream.task, 2)
+        # The backlog is dropped; the client reconnects and replays it
+        self.assertEqual(stream.events(), [])
+        self.assertEqual(hub.stream_count(), 0)
@@ -0,0 +1,13 @@
+"""
+Notification URLs
+"""
+from django.urls import path
+from notifications import views
+
+app_name = 'notifications'
+
+urlpatterns = [
+    path('', views.NotificationListView.as_view(), name='notification_list'),
+    path('unread-count/', views.UnreadCountView.as_view(), name='unread_count'),
+    path('read/', views.MarkReadView.as_view(), name='mark_read'),
+]
@@ -1,3 +1,65 @@
-from django.shortcuts import render
+"""
+Notification Views
+"""
+from rest_framework import generics, status, views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from notifications.feed import mark_read, unread_count
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer, NotificationReadSerializer
+from core.cache import etag_matches
+from core.pagination import KeysetPagination
+
+
+class NotificationListView(generics.ListAPIView):
+    """
+    The current user's notification feed, newest first
+    GET /api/notifications/?unread=true
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ['-created_at', 'id']
+    
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient=self.request.user)
+        if self.request.query_params.get('unread') == 'true':
+            queryset = queryset.filter(is_read=False)
+        return queryset.order_by('-created_at', 'id')
+
+
+class UnreadCountView(views.APIView):
+    """
+    Unread notification count; cheap enough to poll
+    GET /api/notifications/unread-count/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        count = unread_count(request.user)
+        etag = f'"unread-{request.user.pk}-{count}"'
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'unread': count})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class MarkReadView(views.APIView):
+    """
+    Mark notifications read
+    POST /api/notifications/read/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = NotificationReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked = mark_read(request.user, serializer.validated_data.get('ids'))
+        return Response({
+            'marked': marked,
+            'unread': unread_count(request.user)
+        })
@@ -0,0 +1,41 @@
+"""
+Management command to verify and repair rating aggregates in-process
+Usage: python manage.py reconcile_ratings [--dry-run] [--shard-size N]
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from reviews.ratings import SCOPES, key_bounds, reconcile
+from reviews.tasks import RECONCILE_SHARD_SIZE, finalize_rating_reconciliation
+from services.tasks import shard_ranges
+
+
+class Command(BaseCommand):
+    help = 'Compare provider/service rating aggregates with the reviews and repair drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted aggregates without writing'
+        )
+        parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=RECONCILE_SHARD_SIZE,
+            help=f'Keys per range (default: {RECONCILE_SHARD_SIZE})'
+        )
+    
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        
+        reports = []
+        for scope in SCOPES.values():
+            bounds = key_bounds(scope)
+            if bounds is None:
+                continue
+            for low, high in shard_ranges(*bounds, options['shard_size']):
+                reports.append(reconcile(scope, low, high, dry_run=dry_run))
+        
+        report = finalize_rating_reconciliation(reports, dry_run=dry_run)
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.9 on 2026-10-17 05:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    from reviews.ratings import PROVIDER, SERVICE, expected_totals
+    
+    Review = apps.get_model('reviews', 'Review')
+    for scope, model_name in ((PROVIDER, 'ProviderRating'), (SERVICE, 'ServiceRating')):
+        Aggregate = apps.get_model('reviews', model_name)
+        totals = expected_totals(scope, reviews=Review.objects)
+        Aggregate.objects.bulk_create(
+            [Aggregate(pk=key, **values) for key, values in totals.items()],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_is_verified'),
+        ('services', '0005_category_path'),
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderRating',
+            fields=[
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('quality_sum', models.PositiveIntegerField(default=0)),
+                ('quality_count', models.PositiveIntegerField(default=0)),
+                ('punctuality_sum', models.PositiveIntegerField(default=0)),
+                ('punctuality_count', models.PositiveIntegerField(default=0)),
+                ('professionalism_sum', models.PositiveIntegerField(default=0)),
+                ('professionalism_count', models.PositiveIntegerField(default=0)),
+                ('value_sum', models.PositiveIntegerField(default=0)),
+                ('value_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_aggregate', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'provider_ratings',
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceRating',
+            fields=[
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('quality_sum', models.PositiveIntegerField(default=0)),
+                ('quality_count', models.PositiveIntegerField(default=0)),
+                ('punctuality_sum', models.PositiveIntegerField(default=0)),
+                ('punctuality_count', models.PositiveIntegerField(default=0)),
+                ('professionalism_sum', models.PositiveIntegerField(default=0)),
+                ('professionalism_count', models.PositiveIntegerField(default=0)),
+                ('value_sum', models.PositiveIntegerField(default=0)),
+                ('value_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_aggregate', serialize=False, to='services.service')),
+            ],
+            options={
+                'db_table': 'service_ratings',
+            },
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -7,12 +7,18 @@ from django.utils.translation import gettext_lazy as _
 from users.models import User
 from services.models import Service
 from bookings.models import Booking
+from core.tracker import FieldTrackerMixin
 
 
-class Review(models.Model):
+class Review(FieldTrackerMixin, models.Model):
     """
     Customer reviews for service providers
     """
+    tracked_fields = (
+        'rating', 'quality_rating', 'punctuality_rating',
+        'professionalism_rating', 'value_rating', 'is_active'
+    )
+    
     # Relationships
     booking = models.OneToOneField(
         Booking,
@@ -185,4 +191,72 @@ class ReviewHelpful(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.user.full_name} found review #{self.review.id} helpful"
\ No newline at end of file
+        return f"{self.user.full_name} found review #{self.review.id} helpful"
+
+
+class RatingAggregate(models.Model):
+    """
+    Running totals over the active reviews of one provider or service
+    Updated by deltas as reviews change (reviews.ratings), so averages and
+    the star histogram never need a scan of the reviews table
+    """
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    
+    # Star histogram
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    
+    # Sub-ratings are optional, so each keeps its own count
+    quality_sum = models.PositiveIntegerField(default=0)
+    quality_count = models.PositiveIntegerField(default=0)
+    punctuality_sum = models.PositiveIntegerField(default=0)
+    punctuality_count = models.PositiveIntegerField(default=0)
+    professionalism_sum = models.PositiveIntegerField(default=0)
+    professionalism_count = models.PositiveIntegerField(default=0)
+    value_sum = models.PositiveIntegerField(default=0)
+    value_count = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+
+
+class ProviderRating(RatingAggregate):
+    """
+    Rating totals for a provider
+    """
+    provider = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_aggregate'
+    )
+    
+    class Meta:
+        db_table = 'provider_ratings'
+    
+    def __str__(self):
+        return f"Ratings for provider #{self.provider_id}"
+
+
+class ServiceRating(RatingAggregate):
+    """
+    Rating totals for a service
+    """
+    service = models.OneToOneField(
+        Service,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_aggregate'
+    )
+    
+    class Meta:
+        db_table = 'service_ratings'
+    
+    def __str__(self):
+        return f"Ratings for service #{self.service_id}"
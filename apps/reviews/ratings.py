@@ -0,0 +1,312 @@
+"""
+Rating aggregates
+Keep per-provider and per-service rating totals current with O(1) deltas
+as reviews change, and reconcile them against the reviews table
+"""
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.cache import invalidate_tags
+from reviews.models import ProviderRating, Review, ServiceRating
+from services.models import Service
+from users.models import ServiceProviderProfile
+
+SUB_RATINGS = ('quality', 'punctuality', 'professionalism', 'value')
+STARS = range(1, 6)
+AGGREGATE_FIELDS = (
+    ['review_count', 'rating_sum']
+    + [f'stars_{star}' for star in STARS]
+    + [f'{name}_{part}' for name in SUB_RATINGS for part in ('sum', 'count')]
+)
+ZERO = dict.fromkeys(AGGREGATE_FIELDS, 0)
+
+# What an aggregate row covers and where its average is denormalized
+Scope = namedtuple('Scope', ['name', 'aggregate', 'review_key', 'owner', 'owner_key', 'count_field'])
+
+PROVIDER = Scope('provider', ProviderRating, 'provider_id', ServiceProviderProfile, 'user_id', 'total_reviews')
+SERVICE = Scope('service', ServiceRating, 'service_id', Service, 'pk', 'review_count')
+SCOPES = {scope.name: scope for scope in (PROVIDER, SERVICE)}
+
+
+def rating_average(total, count):
+    """
+    Average rounded to the stored DecimalField precision
+    """
+    if not count:
+        return Decimal('0.00')
+    return (Decimal(total) / count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def averages(totals):
+    """
+    {'rating': ..., 'quality': ...} averages from aggregate totals; None
+    where nothing was rated
+    """
+    result = {'rating': totals['rating_sum'] / totals['review_count'] if totals['review_count'] else None}
+    for name in SUB_RATINGS:
+        count = totals[f'{name}_count']
+        result[name] = totals[f'{name}_sum'] / count if count else None
+    return result
+
+
+def contribution(values):
+    """
+    Aggregate fields one review adds, given its tracked field values
+    """
+    if not values['is_active']:
+        return {}
+    rating = values['rating']
+    fields = {'review_count': 1, 'rating_sum': rating, f'stars_{rating}': 1}
+    for name in SUB_RATINGS:
+        value = values[f'{name}_rating']
+        if value is not None:
+            fields[f'{name}_sum'] = value
+            fields[f'{name}_count'] = 1
+    return fields
+
+
+def difference(after, before):
+    return {
+        field: after.get(field, 0) - before.get(field, 0)
+        for field in set(after) | set(before)
+        if after.get(field, 0) != before.get(field, 0)
+    }
+
+
+def save_delta(review, created, update_fields=None):
+    """
+    Aggregate delta of a save, or None if the old value of a changed field
+    is unknown (it was deferred when the review was loaded)
+    """
+    current = {field: getattr(review, field) for field in Review.tracked_fields}
+    if created:
+        return contribution(current)
+
+    tracker = review.tracker
+    saved = set(Review.tracked_fields if update_fields is None else update_fields)
+    before, after = {}, {}
+    for field, value in current.items():
+        if not tracker.has_changed(field):
+            before[field] = after[field] = value
+        elif not tracker.known(field):
+            return None
+        else:
+            before[field] = tracker.previous(field)
+            after[field] = value if field in saved else before[field]
+    return difference(contribution(after), contribution(before))
+
+
+def delete_delta(review):
+    """
+    Aggregate delta of deleting a review, as last saved
+    """
+    values = {
+        field: review.tracker.previous(field) if review.tracker.known(field) else getattr(review, field)
+        for field in Review.tracked_fields
+    }
+    return difference({}, contribution(values))
+
+
+def sync_owner(scope, key, totals, now):
+    """
+    Copy the average and count onto the denormalized owner row
+    """
+    scope.owner.objects.filter(**{scope.owner_key: key}).update(**{
+        'average_rating': rating_average(totals['rating_sum'], totals['review_count']),
+        scope.count_field: totals['review_count'],
+        'updated_at': now,
+    })
+
+
+def apply_delta(provider_id, service_id, delta):
+    """
+    Add a review delta to the provider and service aggregates; call inside
+    the transaction changing the review
+
+    Each aggregate row takes one UPDATE of F() expressions, which holds its
+    row lock until commit, so concurrent reviews serialize on the row and
+    the average copied to the owner always reflects every committed delta.
+    A missing row is seeded from the reviews first.
+    """
+    if not delta:
+        return
+    now = timezone.now()
+    increments = {field: F(field) + value for field, value in delta.items()}
+    with transaction.atomic():
+        for scope, key in ((PROVIDER, provider_id), (SERVICE, service_id)):
+            rows = scope.aggregate.objects.filter(pk=key)
+            if not rows.update(updated_at=now, **increments):
+                seed(scope, key, delta)
+                rows.update(updated_at=now, **increments)
+            totals = rows.values('rating_sum', 'review_count').get()
+            sync_owner(scope, key, totals, now)
+    # UPDATE sends no post_save, so invalidate what the signal would
+    transaction.on_commit(partial(invalidate_tags, f'service:{service_id}', f'provider:{provider_id}'))
+
+
+def expected_totals(scope, reviews=None, **filters):
+    """
+    {key: totals} computed from active reviews, one grouped query
+
+    `reviews` is the Review manager to read, e.g. a migration's historical
+    model; defaults to Review.objects.
+    """
+    expressions = {
+        'review_count': Count('id'),
+        'rating_sum': Coalesce(Sum('rating'), 0),
+    }
+    for star in STARS:
+        expressions[f'stars_{star}'] = Count('id', filter=Q(rating=star))
+    for name in SUB_RATINGS:
+        expressions[f'{name}_sum'] = Coalesce(Sum(f'{name}_rating'), 0)
+        expressions[f'{name}_count'] = Count(f'{name}_rating')
+
+    reviews = Review.objects if reviews is None else reviews
+    rows = reviews.filter(is_active=True, **filters).order_by().values(
+        scope.review_key
+    ).annotate(**expressions)
+    return {row.pop(scope.review_key): row for row in rows}
+
+
+def seed(scope, key, delta):
+    """
+    Create a missing aggregate row holding the totals from before `delta`,
+    which the caller then applies
+
+    Concurrent first reviews of one key both get here; the insert that
+    loses is skipped (waiting for the winner to commit), so each review
+    still adds its own delta to the one row.
+    """
+    totals = expected_totals(scope, **{scope.review_key: key}).get(key, ZERO)
+    before = {field: totals[field] - delta.get(field, 0) for field in AGGREGATE_FIELDS}
+    scope.aggregate.objects.bulk_create([scope.aggregate(pk=key, **before)], ignore_conflicts=True)
+
+
+def rebuild(scope, key):
+    """
+    Recompute one aggregate row and its owner from the reviews
+    """
+    totals = expected_totals(scope, **{scope.review_key: key}).get(key, ZERO)
+    now = timezone.now()
+    rows = scope.aggregate.objects.filter(pk=key)
+    if not rows.update(updated_at=now, **totals) and totals['review_count']:
+        # Another writer may create the row first; then overwrite it
+        scope.aggregate.objects.bulk_create([scope.aggregate(pk=key, **totals)], ignore_conflicts=True)
+        rows.update(updated_at=now, **totals)
+    sync_owner(scope, key, totals, now)
+    return totals
+
+
+def totals_for(scope, key):
+    """
+    Stored totals for one provider or service (zeros if none)
+    """
+    row = scope.aggregate.objects.filter(pk=key).values(*AGGREGATE_FIELDS).first()
+    return row or dict(ZERO)
+
+
+def key_bounds(scope):
+    """
+    (lowest, highest) key with reviews, an aggregate row or an owner row,
+    or None if there are none
+    """
+    bounds = [
+        Review.objects.aggregate(low=Min(scope.review_key), high=Max(scope.review_key)),
+        scope.aggregate.objects.aggregate(low=Min('pk'), high=Max('pk')),
+        scope.owner.objects.aggregate(low=Min(scope.owner_key), high=Max(scope.owner_key)),
+    ]
+    lows = [bound['low'] for bound in bounds if bound['low'] is not None]
+    highs = [bound['high'] for bound in bounds if bound['high'] is not None]
+    return (min(lows), max(highs)) if lows else None
+
+
+def compare(scope, low, high, aggregates, sample_size):
+    """
+    Diff the aggregate rows in `aggregates` and the owner rows for keys in
+    [low, high) against the reviews; returns the report and the rows to
+    create, update and sync
+    """
+    stored = {
+        row.pop('pk'): row
+        for row in aggregates.filter(pk__gte=low, pk__lt=high).values('pk', *AGGREGATE_FIELDS)
+    }
+    expected = expected_totals(scope, **{
+        f'{scope.review_key}__gte': low, f'{scope.review_key}__lt': high
+    })
+    owners = {
+        row.pop(scope.owner_key): row
+        for row in scope.owner.objects.filter(**{
+            f'{scope.owner_key}__gte': low, f'{scope.owner_key}__lt': high
+        }).values(scope.owner_key, 'average_rating', scope.count_field)
+    }
+
+    drift = []
+    missing, changed, owners_changed = [], [], []
+    for key in sorted(set(expected) | set(stored) | set(owners)):
+        totals = expected.get(key, ZERO)
+        diff = {
+            field: [stored[key][field], value]
+            for field, value in totals.items()
+            if key in stored and stored[key][field] != value
+        }
+        if key not in stored and totals['review_count']:
+            diff = {'row': ['missing', totals['review_count']]}
+            missing.append(scope.aggregate(pk=key, **totals))
+        elif diff:
+            changed.append(scope.aggregate(pk=key, **totals))
+
+        owner = owners.get(key)
+        average = rating_average(totals['rating_sum'], totals['review_count'])
+        if owner is not None and (owner['average_rating'], owner[scope.count_field]) != (average, totals['review_count']):
+            diff['owner'] = [
+                [str(owner['average_rating']), owner[scope.count_field]],
+                [str(average), totals['review_count']],
+            ]
+            owners_changed.append((key, totals))
+
+        if diff and len(drift) < sample_size:
+            drift.append({'id': key, 'diff': diff})
+
+    report = {
+        'scope': scope.name,
+        'range': [low, high],
+        'scanned': len(set(expected) | set(stored) | set(owners)),
+        'drifted': len({row.pk for row in missing + changed} | {key for key, _ in owners_changed}),
+        'sample': drift,
+    }
+    return report, missing, changed, owners_changed
+
+
+def reconcile(scope, low, high, dry_run=False, sample_size=50):
+    """
+    Compare aggregate rows and owner averages for keys in [low, high)
+    against the reviews and repair any drift; returns a drift report
+
+    A repair locks the stored rows before reading the reviews, so a
+    concurrent apply_delta has either committed and is counted, or waits
+    and adds its delta on top of the repaired totals.
+    """
+    if dry_run:
+        return compare(scope, low, high, scope.aggregate.objects.all(), sample_size)[0]
+
+    now = timezone.now()
+    with transaction.atomic():
+        report, missing, changed, owners_changed = compare(
+            scope, low, high, scope.aggregate.objects.select_for_update(), sample_size
+        )
+        scope.aggregate.objects.bulk_create(missing, ignore_conflicts=True)
+        for row in changed:
+            row.updated_at = now
+        scope.aggregate.objects.bulk_update(changed, AGGREGATE_FIELDS + ['updated_at'], batch_size=1000)
+        for key, totals in owners_changed:
+            sync_owner(scope, key, totals, now)
+    tags = [f'{scope.name}:{key}' for key, _ in owners_changed]
+    if tags:
+        transaction.on_commit(partial(invalidate_tags, *tags))
+    return report
@@ -4,6 +4,11 @@ Review Serializers
 from rest_framework import serializers
 from reviews.models import Review, ReviewResponse, ReviewImage, ReviewHelpful
 from bookings.models import Booking
+from services.serializers import ServiceListSerializer
+from users.serializers import PublicUserSerializer
+from core.serializers import (
+    FragmentCacheMixin, FragmentCachedListSerializer, SparseFieldsetMixin
+)
 
 
 class ReviewImageSerializer(serializers.ModelSerializer):
@@ -27,7 +32,7 @@ class ReviewResponseSerializer(serializers.ModelSerializer):
         read_only_fields = ['provider']
 
 
-class ReviewListSerializer(serializers.ModelSerializer):
+class ReviewListSerializer(FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for review listings"""
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
     provider_name = serializers.CharField(source='provider.full_name', read_only=True)
@@ -42,12 +47,23 @@ class ReviewListSerializer(serializers.ModelSerializer):
             'rating', 'title', 'comment', 'is_verified',
             'helpful_count', 'has_response', 'created_at'
         ]
+        eager_loading = {'has_response': ['response']}
+        expandable_fields = {
+            'customer': PublicUserSerializer,
+            'provider': PublicUserSerializer,
+            'service': ServiceListSerializer,
+        }
+        list_serializer_class = FragmentCachedListSerializer
+        fragment_version = [
+            'updated_at', 'customer.updated_at', 'provider.updated_at',
+            'service.updated_at', 'response.pk'
+        ]
     
     def get_has_response(self, obj):
         return hasattr(obj, 'response')
 
 
-class ReviewDetailSerializer(serializers.ModelSerializer):
+class ReviewDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Detailed serializer for review detail view"""
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
     customer_avatar = serializers.ImageField(
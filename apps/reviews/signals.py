@@ -4,23 +4,30 @@ Review signals for automatic rating updates
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from reviews.models import Review
+from reviews.ratings import PROVIDER, SERVICE, apply_delta, delete_delta, rebuild, save_delta
 
 
 @receiver(post_save, sender=Review)
-def update_ratings_on_review_save(sender, instance, created, **kwargs):
+def update_ratings_on_review_save(sender, instance, created, update_fields=None, **kwargs):
     """
-    Update provider and service ratings when review is created/updated
+    Apply the rating delta of a created, edited, hidden or restored review
+    to the provider and service aggregates
     """
-    if created or instance.tracker.has_changed('rating'):
-        # Queue async task to update ratings
-        from reviews.tasks import update_ratings
-        update_ratings.delay(instance.provider.id, instance.service.id)
+    if update_fields is not None and not set(Review.tracked_fields).intersection(update_fields):
+        return
+    
+    delta = save_delta(instance, created, update_fields)
+    if delta is None:
+        # The old values were never loaded; recount these two from reviews
+        rebuild(PROVIDER, instance.provider_id)
+        rebuild(SERVICE, instance.service_id)
+    elif delta:
+        apply_delta(instance.provider_id, instance.service_id, delta)
 
 
 @receiver(post_delete, sender=Review)
 def update_ratings_on_review_delete(sender, instance, **kwargs):
     """
-    Update ratings when review is deleted
+    Take deleted reviews out of the aggregates
     """
-    from reviews.tasks import update_ratings
-    update_ratings.delay(instance.provider.id, instance.service.id)
\ No newline at end of file
+    apply_delta(instance.provider_id, instance.service_id, delete_delta(instance))
@@ -1,39 +1,81 @@
 """
 Celery tasks for reviews
 """
-from celery import shared_task
-from django.db.models import Avg, Count
+import logging
+
+from celery import shared_task, chord
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_SHARD_SIZE = 5000
 
 
 @shared_task
 def update_ratings(provider_id, service_id):
     """
-    Update provider and service ratings after review changes
+    Recount provider and service ratings from their reviews
+    Review changes apply deltas as they happen; this repairs one pair
+    """
+    from reviews.ratings import PROVIDER, SERVICE, rebuild
+    
+    rebuild(PROVIDER, provider_id)
+    rebuild(SERVICE, service_id)
+
+
+@shared_task
+def reconcile_ratings(shard_size=RECONCILE_SHARD_SIZE, dry_run=False):
     """
-    from users.models import ServiceProviderProfile
-    from services.models import Service
-    from reviews.models import Review
+    Verify provider and service rating aggregates against the reviews
     
-    # Update provider profile ratings
-    try:
-        provider_profile = ServiceProviderProfile.objects.get(user_id=provider_id)
-        provider_profile.update_rating_stats()
-    except ServiceProviderProfile.DoesNotExist:
-        pass
+    Keys are split into ranges per scope; each shard runs one grouped
+    query and repairs drifted aggregate rows and denormalized averages,
+    and the chord callback merges and logs the drift reports. With
+    dry_run=True nothing is written.
+    """
+    from reviews.ratings import SCOPES, key_bounds
+    from services.tasks import shard_ranges
     
-    # Update service ratings
-    try:
-        service = Service.objects.get(id=service_id)
-        review_stats = Review.objects.filter(
-            service=service,
-            is_active=True
-        ).aggregate(
-            avg_rating=Avg('rating'),
-            count=Count('id')
+    shards = []
+    for name, scope in SCOPES.items():
+        bounds = key_bounds(scope)
+        if bounds is None:
+            continue
+        shards.extend(
+            reconcile_ratings_shard.s(name, low, high, dry_run=dry_run)
+            for low, high in shard_ranges(*bounds, shard_size)
         )
-        
-        service.average_rating = review_stats['avg_rating'] or 0.00
-        service.review_count = review_stats['count']
-        service.save(update_fields=['average_rating', 'review_count'])
-    except Service.DoesNotExist:
-        pass
\ No newline at end of file
+    if not shards:
+        return finalize_rating_reconciliation.delay([], dry_run=dry_run).id
+    result = chord(shards)(finalize_rating_reconciliation.s(dry_run=dry_run))
+    return result.id
+
+
+@shared_task
+def reconcile_ratings_shard(scope_name, low, high, dry_run=False):
+    """
+    Reconcile one key range of one scope
+    """
+    from reviews.ratings import SCOPES, reconcile
+    
+    return reconcile(SCOPES[scope_name], low, high, dry_run=dry_run)
+
+
+@shared_task
+def finalize_rating_reconciliation(shard_reports, dry_run=False):
+    """
+    Chord callback: merge shard reports and log drift
+    """
+    report = {'dry_run': dry_run, 'shards': len(shard_reports)}
+    for scope in ('provider', 'service'):
+        reports = [shard for shard in shard_reports if shard['scope'] == scope]
+        report[scope] = {
+            'scanned': sum(shard['scanned'] for shard in reports),
+            'drifted': sum(shard['drifted'] for shard in reports),
+            'sample': [item for shard in reports for item in shard['sample']][:50],
+        }
+        if report[scope]['drifted']:
+            logger.warning(
+                'Rating aggregates: %s %s rows drifted%s',
+                report[scope]['drifted'], scope, ' (dry run)' if dry_run else ', repaired'
+            )
+    return report
@@ -1,3 +1,297 @@
-from django.test import TestCase
+"""
+Tests for reviews app
+"""
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from users.models import User, UserProfile, ServiceProviderProfile
+from services.models import ServiceCategory, Service
+from bookings.models import Booking
+from reviews.models import ProviderRating, Review, ServiceRating
+from reviews import ratings
+from reviews.ratings import PROVIDER, SERVICE, key_bounds, reconcile, seed
+from reviews.tasks import reconcile_ratings
+
+
+class ReviewTestMixin:
+    """Shared fixtures for review tests"""
+
+    def create_user(self, email, phone, role):
+        return User.objects.create_user(
+            email=email,
+            password='testpass123',
+            first_name='Test',
+            last_name=role.title(),
+            phone=phone,
+            role=role
+        )
+
+    def create_fixtures(self):
+        self.customer = self.create_user('customer@example.com', '+1000000201', User.UserRole.CUSTOMER)
+        self.provider = self.create_user('provider@example.com', '+1000000202', User.UserRole.SERVICE_PROVIDER)
+        self.profile = ServiceProviderProfile.objects.create(
+            user=self.provider,
+            business_name='Sparkle',
+            business_description='Cleaning'
+        )
+        category = ServiceCategory.objects.create(name='Cleaning', slug='cleaning')
+        self.service = Service.objects.create(
+            title='Deep clean',
+            slug='deep-clean',
+            description='Whole home',
+            short_description='Whole home',
+            provider=self.provider,
+            category=category,
+            base_price=100
+        )
+
+    def create_booking(self):
+        return Booking.objects.create(
+            customer=self.customer,
+            provider=self.provider,
+            service=self.service,
+            status=Booking.BookingStatus.COMPLETED,
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(10, 0),
+            estimated_duration_minutes=60,
+            service_address='1 Main St',
+            service_city='Springfield',
+            service_state='IL',
+            service_postal_code='62701',
+            base_price=100
+        )
+
+    def create_review(self, rating=5, **kwargs):
+        return Review.objects.create(
+            booking=self.create_booking(),
+            customer=self.customer,
+            provider=self.provider,
+            service=self.service,
+            rating=rating,
+            title='Great',
+            comment='Spotless',
+            **kwargs
+        )
+
+
+class ReviewRatingSignalTestCase(ReviewTestMixin, APITestCase):
+    """Test rating updates driven by the review tracker"""
+
+    def setUp(self):
+        self.create_fixtures()
+        self.client.force_authenticate(self.customer)
+
+    def assertRatings(self, average, count):
+        self.service.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual((self.service.average_rating, self.service.review_count), (Decimal(average), count))
+        self.assertEqual((self.profile.average_rating, self.profile.total_reviews), (Decimal(average), count))
+
+    def test_create_edit_and_delete_update_ratings(self):
+        response = self.client.post('/api/reviews/create/', {
+            'booking': self.create_booking().pk, 'rating': 4, 'title': 'Good', 'comment': 'Tidy'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.create_review(rating=2)
+        self.assertRatings('3.00', 2)
+
+        review_id = response.data['id']
+        response = self.client.patch(f'/api/reviews/{review_id}/update/', {'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRatings('3.50', 2)
+
+        response = self.client.delete(f'/api/reviews/{review_id}/delete/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertRatings('2.00', 1)
+
+    def test_unrelated_saves_apply_no_delta(self):
+        review = Review.objects.get(pk=self.create_review().pk)
+        with mock.patch('reviews.signals.apply_delta') as apply_delta:
+            review.title = 'Still great'
+            review.save()
+            review.rating = 1
+            review.save(update_fields=['title'])
+            self.assertFalse(apply_delta.called)
+            
+            review.rating = 3
+            review.save()
+            apply_delta.assert_called_once_with(
+                self.provider.pk, self.service.pk, {'rating_sum': -2, 'stars_5': -1, 'stars_3': 1}
+            )
+            # Saved values move with each save
+            self.assertFalse(review.tracker.has_changed('rating'))
+            self.assertEqual(review.tracker.previous('rating'), 3)
+
+    def test_helpful_votes_are_atomic(self):
+        review = self.create_review()
+        voter = self.create_user('voter@example.com', '+1000000203', User.UserRole.CUSTOMER)
+
+        response = self.client.post(f'/api/reviews/{review.pk}/helpful/', {'helpful': True})
+        self.assertEqual(response.data['helpful_count'], 1)
+        self.client.force_authenticate(voter)
+        response = self.client.post(f'/api/reviews/{review.pk}/helpful/', {'helpful': True})
+        self.assertEqual(response.data['helpful_count'], 2)
+
+        # A stale instance saving other fields does not roll the count back
+        review.title = 'Edited'
+        review.save(update_fields=['title'])
+        response = self.client.post(f'/api/reviews/{review.pk}/helpful/', {'helpful': False})
+        self.assertEqual(response.data['helpful_count'], 1)
+
+    def test_expanded_users_are_public_cards(self):
+        UserProfile.objects.create(
+            user=self.customer, address_line1='1 Main St', date_of_birth=date(1990, 1, 1),
+            latitude=Decimal('40.000000'), longitude=Decimal('-89.000000')
+        )
+        self.create_review()
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/reviews/?expand=customer,provider')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        review = response.data['results'][0]
+        self.assertEqual(review['customer']['full_name'], self.customer.full_name)
+        self.assertEqual(review['provider']['average_rating'], '5.00')
+        private = {'email', 'phone', 'profile', 'address_line1', 'latitude', 'longitude', 'date_of_birth'}
+        self.assertFalse(private & set(review['customer']))
+        self.assertFalse(private & set(review['provider']))
+
+
+class RatingAggregateTestCase(ReviewTestMixin, APITestCase):
+    """Test incremental rating aggregates and their reconciliation"""
+
+    def setUp(self):
+        self.create_fixtures()
+
+    def totals(self):
+        return ServiceRating.objects.get(pk=self.service.pk)
+
+    def test_histogram_and_sub_ratings_follow_every_change(self):
+        first = self.create_review(rating=5, quality_rating=4)
+        second = self.create_review(rating=2, quality_rating=2, value_rating=3)
+        self.create_review(rating=2)
+        totals = self.totals()
+        self.assertEqual(
+            [totals.stars_1, totals.stars_2, totals.stars_3, totals.stars_4, totals.stars_5], [0, 2, 0, 0, 1]
+        )
+        self.assertEqual((totals.rating_sum, totals.review_count), (9, 3))
+        self.assertEqual((totals.quality_sum, totals.quality_count, totals.value_count), (6, 2, 1))
+
+        # Edit, soft delete, restore and hard delete
+        second.rating = 4
+        second.quality_rating = None
+        second.save()
+        first.is_active = False
+        first.save()
+        totals = self.totals()
+        self.assertEqual((totals.rating_sum, totals.review_count, totals.stars_5, totals.stars_4), (6, 2, 0, 1))
+        self.assertEqual((totals.quality_sum, totals.quality_count), (0, 0))
+
+        first.is_active = True
+        first.save()
+        second.delete()
+        totals = self.totals()
+        self.assertEqual((totals.rating_sum, totals.review_count, totals.value_count), (7, 2, 0))
+        self.service.refresh_from_db()
+        self.assertEqual((self.service.average_rating, self.service.review_count), (Decimal('3.50'), 2))
+        # Provider and service totals match a recount
+        for scope, key in ((PROVIDER, self.provider.pk), (SERVICE, self.service.pk)):
+            self.assertEqual(reconcile(scope, key, key + 1, dry_run=True)['drifted'], 0)
+
+    def test_review_changes_do_not_scan_reviews(self):
+        reviews = [self.create_review(rating=4) for _ in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            reviews[0].rating = 1
+            reviews[0].save()
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([sql for sql in statements if 'COUNT(' in sql or 'SUM(' in sql])
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.average_rating, Decimal('3.40'))
+
+    def test_deferred_rating_falls_back_to_a_recount(self):
+        review = Review.objects.only('id', 'booking', 'provider', 'service').get(pk=self.create_review(rating=5).pk)
+        review.rating = 1
+        review.save(update_fields=['rating'])
+        self.assertEqual((self.totals().rating_sum, self.totals().stars_1), (1, 1))
+
+    def test_missing_rows_are_seeded_from_reviews(self):
+        self.create_review(rating=4)
+        ServiceRating.objects.all().delete()
+        ProviderRating.objects.all().delete()
+
+        # A concurrent first review created the service row; seeding it again is skipped
+        seed(SERVICE, self.service.pk, {})
+        seed(SERVICE, self.service.pk, {'rating_sum': 3, 'review_count': 1})
+        self.create_review(rating=2, quality_rating=5)
+        for rating in (self.totals(), ProviderRating.objects.get(pk=self.provider.pk)):
+            self.assertEqual((rating.rating_sum, rating.review_count, rating.stars_4, rating.quality_count), (6, 2, 1, 1))
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.average_rating, Decimal('3.00'))
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        self.create_review(rating=4)
+        self.create_review(rating=2)
+        ServiceRating.objects.filter(pk=self.service.pk).update(rating_sum=100, stars_4=0)
+        ProviderRating.objects.all().delete()
+        ServiceProviderProfile.objects.filter(pk=self.profile.pk).update(total_reviews=9)
+
+        low, high = key_bounds(SERVICE)
+        report = reconcile(SERVICE, low, high + 1, dry_run=True)
+        self.assertEqual(report['drifted'], 1)
+        self.assertEqual(report['sample'][0]['diff']['rating_sum'], [100, 6])
+        self.assertEqual(self.totals().rating_sum, 100)
+
+        with self.assertLogs('reviews.tasks', 'WARNING'):
+            reconcile_ratings.delay(shard_size=1)
+        self.assertEqual((self.totals().rating_sum, self.totals().stars_4), (6, 1))
+        provider_totals = ProviderRating.objects.get(pk=self.provider.pk)
+        self.assertEqual((provider_totals.rating_sum, provider_totals.review_count), (6, 2))
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.average_rating, self.profile.total_reviews), (Decimal('3.00'), 2))
+
+        for scope in (PROVIDER, SERVICE):
+            low, high = key_bounds(scope)
+            self.assertEqual(reconcile(scope, low, high + 1, dry_run=True)['drifted'], 0)
+
+    def test_reconcile_locks_rows_before_reading_reviews(self):
+        self.create_review(rating=4)
+        ServiceRating.objects.filter(pk=self.service.pk).update(rating_sum=100)
+        calls = []
+        select_for_update = QuerySet.select_for_update
+        expected_totals = ratings.expected_totals
+
+        def lock(queryset, *args, **kwargs):
+            calls.append('lock')
+            return select_for_update(queryset, *args, **kwargs)
+
+        def read(*args, **kwargs):
+            calls.append('read')
+            return expected_totals(*args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lock), \
+                mock.patch.object(ratings, 'expected_totals', side_effect=read):
+            reconcile(SERVICE, self.service.pk, self.service.pk + 1, dry_run=True)
+            self.assertEqual(calls, ['read'])
+            reconcile(SERVICE, self.service.pk, self.service.pk + 1)
+        self.assertEqual(calls, ['read', 'lock', 'read'])
+        self.assertEqual(self.totals().rating_sum, 4)
+
+    def test_stats_are_read_from_totals(self):
+        self.create_review(rating=5, quality_rating=4)
+        self.create_review(rating=2)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/reviews/stats/?service={self.service.pk}')
+        self.assertEqual(response.data['total_reviews'], 2)
+        self.assertEqual(response.data['average_rating'], 3.5)
+        self.assertEqual(response.data['average_quality'], 4.0)
+        self.assertIsNone(response.data['average_value'])
+        self.assertEqual(response.data['rating_distribution']['2_star'], 1)
+
+        response = self.client.get(f'/api/reviews/stats/?provider={self.provider.pk}&service={self.service.pk}')
+        self.assertEqual(response.data['rating_distribution']['5_star'], 1)
+        self.assertEqual(self.client.get('/api/reviews/stats/?service=x').status_code, status.HTTP_400_BAD_REQUEST)
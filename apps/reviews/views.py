@@ -4,15 +4,20 @@ Review Views
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Avg
+from django.utils import timezone
 
 from reviews.models import Review, ReviewResponse, ReviewHelpful
+from reviews.ratings import PROVIDER, SERVICE, STARS, ZERO, averages, expected_totals, totals_for
 from reviews.serializers import (
     ReviewListSerializer, ReviewDetailSerializer,
     ReviewCreateSerializer, ReviewUpdateSerializer,
     ReviewResponseCreateSerializer, ReviewHelpfulSerializer
 )
 from users.permissions import IsCustomer, IsServiceProvider, IsOwnerOrAdmin
+from core.cache import invalidate_tags
+from core.counters import apply_deltas
+from core.pagination import KeysetPagination
+from core.mixins import CachedResponseMixin, EagerLoadingMixin
 
 
 class ReviewCreateView(generics.CreateAPIView):
@@ -26,25 +31,26 @@ class ReviewCreateView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        # Ratings are updated by the review post_save signal
         review = serializer.save()
         
-        # Update provider and service ratings
-        from reviews.tasks import update_ratings
-        update_ratings.delay(review.provider.id, review.service.id)
-        
         return Response(
             ReviewDetailSerializer(review).data,
             status=status.HTTP_201_CREATED
         )
 
 
-class ReviewListView(generics.ListAPIView):
+class ReviewListView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
     """
     List reviews with filtering
     GET /api/reviews/
     """
     permission_classes = [AllowAny]
+    cache_timeout = 120
+    cache_tags = ['review:*']
     serializer_class = ReviewListSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ['-created_at', 'id']
     
     def get_queryset(self):
         queryset = Review.objects.filter(is_active=True)
@@ -80,7 +86,7 @@ class ReviewListView(generics.ListAPIView):
         )
 
 
-class ReviewDetailView(generics.RetrieveAPIView):
+class ReviewDetailView(EagerLoadingMixin, generics.RetrieveAPIView):
     """
     Get review details
     GET /api/reviews/{id}/
@@ -113,16 +119,12 @@ class ReviewDeleteView(generics.DestroyAPIView):
         return Review.objects.filter(customer=self.request.user)
     
     def perform_destroy(self, instance):
-        # Soft delete
+        # Soft delete; the post_save signal updates ratings
         instance.is_active = False
         instance.save()
-        
-        # Update ratings
-        from reviews.tasks import update_ratings
-        update_ratings.delay(instance.provider.id, instance.service.id)
 
 
-class MyReviewsView(generics.ListAPIView):
+class MyReviewsView(EagerLoadingMixin, generics.ListAPIView):
     """
     Get customer's own reviews
     GET /api/reviews/my-reviews/
@@ -138,13 +140,17 @@ class MyReviewsView(generics.ListAPIView):
         ).order_by('-created_at')
 
 
-class ProviderReviewsView(generics.ListAPIView):
+class ProviderReviewsView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
     """
     Get reviews for a provider
     GET /api/reviews/provider/{provider_id}/
     """
     permission_classes = [AllowAny]
     serializer_class = ReviewListSerializer
+    cache_timeout = 120
+    
+    def get_cache_tags(self):
+        return [f"provider:{self.kwargs['provider_id']}"]
     
     def get_queryset(self):
         provider_id = self.kwargs['provider_id']
@@ -156,13 +162,17 @@ class ProviderReviewsView(generics.ListAPIView):
         ).order_by('-created_at')
 
 
-class ServiceReviewsView(generics.ListAPIView):
+class ServiceReviewsView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
     """
     Get reviews for a service
     GET /api/reviews/service/{service_id}/
     """
     permission_classes = [AllowAny]
     serializer_class = ReviewListSerializer
+    cache_timeout = 120
+    
+    def get_cache_tags(self):
+        return [f"service:{self.kwargs['service_id']}"]
     
     def get_queryset(self):
         service_id = self.kwargs['service_id']
@@ -203,6 +213,17 @@ class ReviewResponseCreateView(views.APIView):
         )
 
 
+def change_helpful_count(review, delta):
+    """
+    Apply a helpful vote atomically; concurrent votes would overwrite each
+    other through save()
+    """
+    apply_deltas(Review, 'helpful_count', {review.pk: delta}, updated_at=timezone.now())
+    review.refresh_from_db(fields=['helpful_count', 'updated_at'])
+    # UPDATE sends no post_save, so invalidate what the signal would
+    invalidate_tags(f'service:{review.service_id}', f'provider:{review.provider_id}', 'review:*')
+
+
 class ReviewHelpfulView(views.APIView):
     """
     Mark review as helpful/unhelpful
@@ -231,8 +252,7 @@ class ReviewHelpfulView(views.APIView):
                 user=request.user
             )
             if created:
-                review.helpful_count += 1
-                review.save(update_fields=['helpful_count'])
+                change_helpful_count(review, 1)
                 message = 'Marked as helpful'
             else:
                 message = 'Already marked as helpful'
@@ -244,8 +264,7 @@ class ReviewHelpfulView(views.APIView):
             ).delete()[0]
             
             if deleted:
-                review.helpful_count = max(0, review.helpful_count - 1)
-                review.save(update_fields=['helpful_count'])
+                change_helpful_count(review, -1)
                 message = 'Removed helpful mark'
             else:
                 message = 'Not marked as helpful'
@@ -273,30 +292,34 @@ class ReviewStatsView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = Review.objects.filter(is_active=True)
-        
-        if provider_id:
-            queryset = queryset.filter(provider_id=provider_id)
-        if service_id:
-            queryset = queryset.filter(service_id=service_id)
-        
-        # Calculate statistics
-        stats = queryset.aggregate(
-            total_reviews=Count('id'),
-            average_rating=Avg('rating'),
-            average_quality=Avg('quality_rating'),
-            average_punctuality=Avg('punctuality_rating'),
-            average_professionalism=Avg('professionalism_rating'),
-            average_value=Avg('value_rating')
-        )
+        try:
+            provider_id = int(provider_id) if provider_id else None
+            service_id = int(service_id) if service_id else None
+        except ValueError:
+            return Response(
+                {'error': 'Provider and service IDs must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Rating distribution
-        from django.db.models import Count
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = queryset.filter(rating=i).count()
-            rating_distribution[f'{i}_star'] = count
+        if provider_id and service_id:
+            # No running totals per pair, so count this pair's reviews
+            totals = expected_totals(PROVIDER, provider_id=provider_id, service_id=service_id).get(
+                provider_id, ZERO
+            )
+        elif provider_id:
+            totals = totals_for(PROVIDER, provider_id)
+        else:
+            totals = totals_for(SERVICE, service_id)
         
-        stats['rating_distribution'] = rating_distribution
+        average = averages(totals)
+        stats = {
+            'total_reviews': totals['review_count'],
+            'average_rating': average['rating'],
+            'average_quality': average['quality'],
+            'average_punctuality': average['punctuality'],
+            'average_professionalism': average['professionalism'],
+            'average_value': average['value'],
+            'rating_distribution': {f'{star}_star': totals[f'stars_{star}'] for star in STARS},
+        }
         
         return Response(stats)
\ No newline at end of file
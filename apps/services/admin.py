@@ -4,7 +4,7 @@ Django Admin configuration for Service models
 from django.contrib import admin
 from services.models import (
     ServiceCategory, Service, ServiceImage, 
-    ServiceAvailability, ServiceArea
+    ServiceAvailability, ServiceArea, ProviderLocation
 )
 
 
@@ -66,4 +66,12 @@ class ServiceAvailabilityAdmin(admin.ModelAdmin):
 class ServiceAreaAdmin(admin.ModelAdmin):
     list_display = ['provider', 'city', 'state', 'service_radius_km', 'is_active']
     list_filter = ['city', 'state', 'is_active']
-    search_fields = ['provider__email', 'city', 'state']
\ No newline at end of file
+    search_fields = ['provider__email', 'city', 'state']
+
+
+@admin.register(ProviderLocation)
+class ProviderLocationAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'geohash', 'latitude', 'longitude', 'service_radius_km', 'is_active', 'updated_at']
+    list_filter = ['is_active']
+    search_fields = ['provider__email', 'geohash']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,41 @@
+"""
+Buffered counters for service statistics
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField
+
+from core.counters import BufferedCounter
+
+FLUSH_BATCH_SIZE = 500
+
+
+def apply_view_counts(deltas):
+    """
+    Add buffered view deltas with one UPDATE per batch of services
+
+    All batches commit together: a failed flush restores every delta, so
+    a partly applied one would count views twice on the retry.
+    """
+    from services.models import Service
+    
+    items = [(int(key), delta) for key, delta in deltas.items()]
+    with transaction.atomic():
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = items[start:start + FLUSH_BATCH_SIZE]
+            increment = Case(
+                *[When(id=service_id, then=Value(delta)) for service_id, delta in batch],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+            Service.objects.filter(
+                id__in=[service_id for service_id, _ in batch]
+            ).update(view_count=F('view_count') + increment)
+
+
+service_view_counter = BufferedCounter(
+    'service_views',
+    apply_view_counts,
+    max_keys=settings.VIEW_COUNT_BUFFER_MAX_KEYS,
+    flush_interval=settings.VIEW_COUNT_FLUSH_INTERVAL
+)
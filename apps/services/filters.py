@@ -2,7 +2,11 @@
 Django filters for Service queries
 """
 import django_filters
-from services.models import Service
+from django.db.models import Case, When, Value, FloatField
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+from services.models import Service, ServiceCategory
+from services.search import ServiceSearchIndex
 
 
 class ServiceFilter(django_filters.FilterSet):
@@ -10,6 +14,7 @@ class ServiceFilter(django_filters.FilterSet):
     Filter for service listings
     """
     category = django_filters.NumberFilter(field_name='category__id')
+    category_tree = django_filters.NumberFilter(method='filter_category_tree')
     min_price = django_filters.NumberFilter(field_name='base_price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='base_price', lookup_expr='lte')
     min_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
@@ -21,6 +26,43 @@ class ServiceFilter(django_filters.FilterSet):
     class Meta:
         model = Service
         fields = [
-            'category', 'min_price', 'max_price', 'min_rating',
+            'category', 'category_tree', 'min_price', 'max_price', 'min_rating',
             'city', 'state', 'pricing_type', 'is_featured'
-        ]
\ No newline at end of file
+        ]
+    
+    def filter_category_tree(self, queryset, name, value):
+        """Services in a category or any of its subcategories"""
+        return queryset.filter(**ServiceCategory.subtree_filter(value))
+
+
+class ServiceSearchFilter(BaseFilterBackend):
+    """
+    Full-text search backed by the service inverted index
+    Restricts to matching services and orders by BM25 relevance unless
+    the client asked for an explicit ordering. Place it after
+    OrderingFilter so relevance wins over the view's default ordering.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+    max_results = 500
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        
+        # Rank within the filtered services, so the cap never hides matches
+        ranked = ServiceSearchIndex.search(query, limit=self.max_results, services=queryset)
+        if not ranked:
+            return queryset.none()
+        
+        queryset = queryset.filter(id__in=[service_id for service_id, _ in ranked])
+        
+        if request.query_params.get(self.ordering_param):
+            return queryset
+        
+        relevance = Case(
+            *[When(id=service_id, then=Value(score)) for service_id, score in ranked],
+            output_field=FloatField()
+        )
+        return queryset.annotate(relevance=relevance).order_by('-relevance', 'id')
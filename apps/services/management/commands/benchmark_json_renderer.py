@@ -0,0 +1,114 @@
+"""
+Management command to compare the stock and fast JSON renderers
+Renders real list payloads with both and checks the bytes match
+Usage: python manage.py benchmark_json_renderer [--rows N] [--iterations N]
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer, orjson
+from bookings.models import Booking
+from bookings.serializers import BookingListSerializer
+from services.models import ServiceCategory, Service
+from services.serializers import ServiceListSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FastJSONRenderer against JSONRenderer on list payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Rows per payload')
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; FastJSONRenderer falls back to JSONRenderer'))
+
+        rows = options['rows']
+        payloads = {
+            'services': self.service_payload(rows),
+            'bookings': self.booking_payload(rows),
+            'native types': self.native_payload(rows),
+        }
+
+        stock = JSONRenderer()
+        fast = FastJSONRenderer()
+        for name, data in payloads.items():
+            if not data:
+                self.stdout.write(f'{name}: no rows, skipped')
+                continue
+
+            expected = stock.render(data)
+            identical = fast.render(data) == expected
+            stock_time = self.time_render(stock, data, options['iterations'])
+            fast_time = self.time_render(fast, data, options['iterations'])
+
+            line = (
+                f'{name}: {len(data)} rows, {len(expected) / 1024:.1f} KiB, '
+                f'stock {stock_time * 1000:.2f}ms, fast {fast_time * 1000:.2f}ms, '
+                f'speedup {stock_time / fast_time:.1f}x, identical bytes: {identical}'
+            )
+            self.stdout.write(self.style.SUCCESS(line) if identical else self.style.ERROR(line))
+
+    def time_render(self, renderer, data, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            renderer.render(data)
+        return (time.perf_counter() - started) / iterations
+
+    def service_payload(self, rows):
+        """
+        ServiceListSerializer output, padded with unsaved services if the
+        database has fewer rows than requested
+        """
+        services = list(
+            Service.objects.select_related('category', 'provider')[:rows]
+        )
+        category = ServiceCategory(id=1, name='Home Cleaning', slug='home-cleaning')
+        provider = User(id=1, first_name='Zoë', last_name='Müller')
+        now = timezone.now()
+        for index in range(len(services), rows):
+            services.append(Service(
+                id=index + 1,
+                slug=f'deep-clean-{index}',
+                title=f'Deep clean #{index}',
+                short_description='Kitchen, bathrooms and floors — eco products',
+                category=category,
+                provider=provider,
+                pricing_type=Service.PricingType.choices[0][0],
+                base_price=Decimal('89.99'),
+                currency='USD',
+                duration_minutes=120,
+                average_rating=Decimal('4.75'),
+                review_count=index % 50,
+                booking_count=index * 3,
+                created_at=now - timedelta(minutes=index),
+            ))
+        return ServiceListSerializer(services, many=True).data
+
+    def booking_payload(self, rows):
+        bookings = Booking.objects.select_related('customer', 'provider', 'service')[:rows]
+        return BookingListSerializer(bookings, many=True).data
+
+    def native_payload(self, rows):
+        """
+        Values the encoder sees directly (Decimal, datetime) rather than as
+        serializer-formatted strings
+        """
+        now = timezone.now()
+        return [
+            {
+                'provider': index,
+                'date': now.date(),
+                'updated_at': now - timedelta(seconds=index),
+                'price': Decimal('19.99') + index,
+                'slots': [{'start': '09:00', 'end': '10:00', 'remaining_capacity': 2}] * 4,
+            }
+            for index in range(rows)
+        ]
@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the provider location index
+Usage: python manage.py rebuild_location_index
+"""
+from django.core.management.base import BaseCommand
+from users.models import User
+from services.models import ProviderLocation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild geohash index rows for all service providers'
+    
+    def handle(self, *args, **options):
+        provider_ids = User.objects.filter(
+            role=User.UserRole.SERVICE_PROVIDER
+        ).values_list('id', flat=True).iterator()
+        
+        indexed = 0
+        for provider_id in provider_ids:
+            if ProviderLocation.objects.sync_provider(provider_id):
+                indexed += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} provider locations'))
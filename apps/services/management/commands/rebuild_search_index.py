@@ -0,0 +1,14 @@
+"""
+Management command to rebuild the service full-text index
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from services.search import ServiceSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the inverted search index for all active services'
+    
+    def handle(self, *args, **options):
+        indexed = ServiceSearchIndex.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} services'))
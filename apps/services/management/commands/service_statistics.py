@@ -0,0 +1,42 @@
+"""
+Management command to recompute service statistics in-process
+Usage: python manage.py service_statistics [--dry-run] [--shard-size N]
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Max
+from services.models import Service
+from services.tasks import (
+    STATISTICS_SHARD_SIZE, shard_ranges,
+    update_service_statistics_shard, finalize_service_statistics
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized service/category counters and report drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted counters without writing'
+        )
+        parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=STATISTICS_SHARD_SIZE,
+            help=f'Services per primary key range (default: {STATISTICS_SHARD_SIZE})'
+        )
+    
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        bounds = Service.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        
+        reports = []
+        if bounds['min_id'] is not None:
+            for low, high in shard_ranges(bounds['min_id'], bounds['max_id'], options['shard_size']):
+                reports.append(update_service_statistics_shard(low, high, dry_run=dry_run))
+        
+        report = finalize_service_statistics(reports, dry_run=dry_run)
+        self.stdout.write(json.dumps(report, indent=2))
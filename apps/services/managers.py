@@ -0,0 +1,88 @@
+"""
+Custom managers for service models
+"""
+from django.db import models
+from django.db.models import Max, Q
+
+from core.geo import (
+    geohash_encode, covering_cells, bounding_box, haversine_many
+)
+
+
+class ProviderLocationManager(models.Manager):
+    """
+    Maintains and queries the provider geohash index
+    """
+
+    def sync_provider(self, provider_id):
+        """
+        Rebuild the index row for one provider from profile and service areas
+        """
+        from users.models import UserProfile
+        from services.models import ServiceArea
+
+        profile = UserProfile.objects.filter(
+            user_id=provider_id,
+            user__role='SERVICE_PROVIDER'
+        ).values('latitude', 'longitude', 'user__is_active').first()
+
+        if not profile or profile['latitude'] is None or profile['longitude'] is None:
+            self.filter(provider_id=provider_id).delete()
+            return None
+
+        radius = ServiceArea.objects.filter(
+            provider_id=provider_id,
+            is_active=True
+        ).aggregate(radius=Max('service_radius_km'))['radius']
+
+        latitude = float(profile['latitude'])
+        longitude = float(profile['longitude'])
+        location, _ = self.update_or_create(
+            provider_id=provider_id,
+            defaults={
+                'latitude': latitude,
+                'longitude': longitude,
+                'geohash': geohash_encode(latitude, longitude),
+                'service_radius_km': radius,
+                'is_active': profile['user__is_active'],
+            }
+        )
+        return location
+
+    def nearby(self, latitude, longitude, radius_km):
+        """
+        Providers within radius_km, as a list of (provider_id, distance_km)
+        sorted by distance
+
+        The geohash prefixes give an indexed cell prefilter, the bounding box
+        trims the cell corners, and the exact distance runs in one batch.
+        Providers whose own service radius does not reach the point are dropped.
+        """
+        cells = covering_cells(latitude, longitude, radius_km)
+        cell_filter = Q()
+        for cell in cells:
+            cell_filter |= Q(geohash__startswith=cell)
+
+        min_lat, _, max_lat, _ = bounding_box(latitude, longitude, radius_km)
+        candidates = list(
+            self.filter(cell_filter, is_active=True).filter(
+                latitude__gte=min_lat,
+                latitude__lte=max_lat,
+            ).values_list('provider_id', 'latitude', 'longitude', 'service_radius_km')
+        )
+        # Longitude is not range-filtered in SQL since the box may wrap the antimeridian
+        distances = haversine_many(
+            latitude, longitude,
+            [(row[1], row[2]) for row in candidates]
+        )
+
+        results = []
+        for row, distance in zip(candidates, distances):
+            if distance > radius_km:
+                continue
+            if row[3] is not None and distance > row[3]:
+                continue
+            results.append((row[0], distance))
+
+        results.sort(key=lambda item: item[1])
+        return results
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-17 04:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('services', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('geohash', models.CharField(db_index=True, max_length=12)),
+                ('service_radius_km', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.OneToOneField(limit_choices_to={'role': 'SERVICE_PROVIDER'}, on_delete=django.db.models.deletion.CASCADE, related_name='location_index', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'provider_locations',
+                'indexes': [models.Index(fields=['geohash', 'is_active'], name='provider_lo_geohash_933943_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-17 04:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_providerlocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='services.service')),
+            ],
+            options={
+                'db_table': 'service_search_documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('frequency', models.FloatField()),
+                ('document_length', models.PositiveIntegerField()),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='services.service')),
+            ],
+            options={
+                'db_table': 'service_search_postings',
+                'unique_together': {('term', 'service')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.9 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    ServiceCategory = apps.get_model('services', 'ServiceCategory')
+    parents = dict(ServiceCategory.objects.values_list('id', 'parent_id'))
+    paths = {}
+    
+    def path_for(category_id):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            prefix = path_for(parent_id) if parent_id else ''
+            paths[category_id] = f"{prefix}{category_id}/"
+        return paths[category_id]
+    
+    for category_id in parents:
+        path = path_for(category_id)
+        ServiceCategory.objects.filter(pk=category_id).update(
+            path=path, depth=path.count('/') - 1
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicecategory',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
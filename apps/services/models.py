@@ -2,16 +2,24 @@
 Service and Category Models
 Optimized with proper indexing and caching strategies
 """
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
+from services.managers import ProviderLocationManager
+from core.tracker import FieldTrackerMixin
 
 
 class ServiceCategory(models.Model):
     """
     Service categories (e.g., Plumbing, Electrical, Cooking, Cleaning)
     """
+    # Cached serialized tree, dropped whenever any category changes
+    TREE_CACHE_KEY = 'service_category_tree'
+    
     name = models.CharField(max_length=100, unique=True, db_index=True)
     slug = models.SlugField(max_length=100, unique=True, db_index=True)
     description = models.TextField(blank=True)
@@ -26,6 +34,10 @@ class ServiceCategory(models.Model):
         related_name='subcategories'
     )
     
+    # Materialized path of ancestor ids including self, e.g. "1/5/12/"
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     # Display order
     order = models.PositiveIntegerField(default=0, db_index=True)
     is_active = models.BooleanField(default=True, db_index=True)
@@ -49,17 +61,111 @@ class ServiceCategory(models.Model):
     def __str__(self):
         return self.name
     
+    def validate_parent(self):
+        """Reject a parent inside this node's own subtree, which would make a cycle"""
+        if not self.pk or not self.parent_id:
+            return
+        parent_path = ServiceCategory.objects.filter(
+            pk=self.parent_id
+        ).values_list('path', flat=True).first() or ''
+        # The parent's path lists it and its ancestors; this node must not be one
+        if self.parent_id == self.pk or str(self.pk) in parent_path.split('/'):
+            raise ValidationError({
+                'parent': _('A category cannot be moved under itself or one of its subcategories.')
+            })
+    
+    def clean(self):
+        super().clean()
+        self.validate_parent()
+    
+    def save(self, *args, **kwargs):
+        """Keep the materialized path of this node and its subtree current"""
+        # The row, its path and the subtree's paths change together
+        with transaction.atomic():
+            old_path = self.path
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or 'parent' in update_fields:
+                self.validate_parent()
+            super().save(*args, **kwargs)
+            
+            if old_path and update_fields is not None and 'parent' not in update_fields:
+                return
+            
+            parent_path = ''
+            if self.parent_id:
+                parent_path = ServiceCategory.objects.filter(
+                    pk=self.parent_id
+                ).values_list('path', flat=True).first() or ''
+            new_path = f"{parent_path}{self.pk}/"
+            
+            if new_path == old_path:
+                return
+            
+            new_depth = new_path.count('/') - 1
+            ServiceCategory.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            
+            if old_path:
+                # Re-root descendants in a single UPDATE
+                ServiceCategory.objects.filter(
+                    path__startswith=old_path
+                ).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (new_depth - self.depth)
+                )
+            
+            self.path = new_path
+            self.depth = new_depth
+    
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to (excluding) this node"""
+        return [int(part) for part in self.path.split('/') if part][:-1]
+    
+    def get_ancestors(self):
+        """Ancestors ordered root first, in one query"""
+        return ServiceCategory.objects.filter(id__in=self.ancestor_ids).order_by('depth')
+    
+    def get_descendants(self, include_self=False):
+        """All categories below this node, in one query"""
+        queryset = ServiceCategory.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+    
     def get_full_path(self):
         """Get category hierarchy path"""
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        names = list(self.get_ancestors().values_list('name', flat=True))
+        return ' > '.join(names + [self.name])
+    
+    @staticmethod
+    def subtree_filter(category_id, prefix='category__'):
+        """
+        Filter kwargs matching rows in the subtree of category_id,
+        resolved inside the same query
+        """
+        return {
+            f'{prefix}path__startswith': models.Subquery(
+                ServiceCategory.objects.filter(pk=category_id).values('path')[:1]
+            )
+        }
+    
+    @classmethod
+    def build_tree(cls, categories):
+        """
+        Group a flat iterable of categories into {parent_id: [children]},
+        preserving iteration order
+        """
+        children = {}
+        for category in categories:
+            children.setdefault(category.parent_id, []).append(category)
+        return children
 
 
-class Service(models.Model):
+class Service(FieldTrackerMixin, models.Model):
     """
     Services offered by providers
     """
+    tracked_fields = ('slug',)
     
     class PricingType(models.TextChoices):
         FIXED = 'FIXED', _('Fixed Price')
@@ -249,4 +355,79 @@ class ServiceArea(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.city}, {self.state} - {self.provider.full_name}"
\ No newline at end of file
+        return f"{self.city}, {self.state} - {self.provider.full_name}"
+
+class ProviderLocation(models.Model):
+    """
+    Spatial index row for a provider, keyed by geohash cell
+    Maintained from UserProfile and ServiceArea saves (see services.signals)
+    """
+    provider = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='location_index',
+        limit_choices_to={'role': User.UserRole.SERVICE_PROVIDER}
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, db_index=True)
+    
+    # Largest active service area radius; null means no declared limit
+    service_radius_km = models.PositiveIntegerField(null=True, blank=True)
+    
+    is_active = models.BooleanField(default=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ProviderLocationManager()
+    
+    class Meta:
+        db_table = 'provider_locations'
+        indexes = [
+            models.Index(fields=['geohash', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider.full_name} @ {self.geohash}"
+
+
+class ServiceSearchDocument(models.Model):
+    """
+    Per-service statistics for the full-text index (token count for BM25)
+    """
+    service = models.OneToOneField(
+        Service,
+        on_delete=models.CASCADE,
+        related_name='search_document'
+    )
+    length = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'service_search_documents'
+    
+    def __str__(self):
+        return f"Search document for {self.service_id}"
+
+
+class ServiceSearchPosting(models.Model):
+    """
+    Inverted index posting: one row per (term, service)
+    Document length is denormalized so scoring needs no join
+    """
+    term = models.CharField(max_length=64, db_index=True)
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        related_name='search_postings'
+    )
+    frequency = models.FloatField()
+    document_length = models.PositiveIntegerField()
+    
+    class Meta:
+        db_table = 'service_search_postings'
+        unique_together = [['term', 'service']]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.service_id}"
@@ -0,0 +1,217 @@
+"""
+Full-text search over services
+Tokenized inverted index in the database with BM25 ranking and prefix matching
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from services.models import Service, ServiceSearchDocument, ServiceSearchPosting
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'to', 'was', 'with',
+])
+
+# Term frequency multiplier per indexed field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'provider_name': 2.0,
+    'short_description': 1.5,
+    'description': 1.0,
+}
+
+# Fields whose change requires re-indexing a service
+INDEXED_FIELDS = frozenset([
+    'title', 'description', 'short_description', 'provider', 'is_active',
+])
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TERM_LENGTH = 64
+MAX_PREFIX_EXPANSIONS = 20
+STATS_CACHE_KEY = 'service_search_stats'
+STATS_CACHE_TIMEOUT = 60
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens with stop words and single characters removed
+    """
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+class ServiceSearchIndex:
+    """
+    Maintains and queries the service inverted index
+    """
+
+    @staticmethod
+    def build_postings(service):
+        """
+        Weighted term frequencies and document length for one service
+        """
+        fields = {
+            'title': service.title,
+            'provider_name': service.provider.full_name,
+            'short_description': service.short_description,
+            'description': service.description,
+        }
+
+        frequencies = Counter()
+        length = 0
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            length += len(tokens)
+            weight = FIELD_WEIGHTS[field]
+            for token in tokens:
+                frequencies[token] += weight
+
+        return frequencies, length
+
+    @classmethod
+    def index_service(cls, service):
+        """
+        Replace the postings for a single service
+        Inactive services are removed from the index
+        """
+        if not service.is_active:
+            cls.remove_service(service.pk)
+            return
+
+        frequencies, length = cls.build_postings(service)
+
+        with transaction.atomic():
+            ServiceSearchPosting.objects.filter(service_id=service.pk).delete()
+            ServiceSearchPosting.objects.bulk_create([
+                ServiceSearchPosting(
+                    term=term,
+                    service_id=service.pk,
+                    frequency=frequency,
+                    document_length=length
+                )
+                for term, frequency in frequencies.items()
+            ])
+            ServiceSearchDocument.objects.update_or_create(
+                service_id=service.pk,
+                defaults={'length': length}
+            )
+
+    @staticmethod
+    def remove_service(service_id):
+        """
+        Drop a service from the index
+        """
+        with transaction.atomic():
+            ServiceSearchPosting.objects.filter(service_id=service_id).delete()
+            ServiceSearchDocument.objects.filter(service_id=service_id).delete()
+
+    @classmethod
+    def rebuild(cls, batch_size=500):
+        """
+        Re-index every active service
+        """
+        ServiceSearchPosting.objects.all().delete()
+        ServiceSearchDocument.objects.all().delete()
+
+        indexed = 0
+        services = Service.objects.filter(
+            is_active=True
+        ).select_related('provider').iterator(chunk_size=batch_size)
+        for service in services:
+            cls.index_service(service)
+            indexed += 1
+
+        cache.delete(STATS_CACHE_KEY)
+        return indexed
+
+    @staticmethod
+    def get_stats():
+        """
+        Corpus size and average document length (briefly cached)
+        """
+        stats = cache.get(STATS_CACHE_KEY)
+        if stats is None:
+            stats = ServiceSearchDocument.objects.aggregate(
+                count=Count('id'),
+                avg_length=Avg('length')
+            )
+            cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+        return stats
+
+    @classmethod
+    def expand_terms(cls, query, prefix=True):
+        """
+        Query tokens, with the final token expanded to indexed terms it prefixes
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        terms = list(dict.fromkeys(tokens))
+        if prefix:
+            last = tokens[-1]
+            # Most widely used completions first, so the cut is stable
+            expansions = ServiceSearchPosting.objects.filter(
+                term__startswith=last
+            ).values('term').annotate(
+                document_frequency=Count('id')
+            ).order_by('-document_frequency', 'term').values_list('term', flat=True)[:MAX_PREFIX_EXPANSIONS]
+            for term in expansions:
+                if term not in terms:
+                    terms.append(term)
+        return terms
+
+    @classmethod
+    def search(cls, query, limit=500, prefix=True, services=None):
+        """
+        Rank services for a query with BM25
+        Returns a list of (service_id, score) sorted by descending score
+
+        `services` (a queryset of services) restricts ranking to those, so
+        the limit applies after filtering; term statistics stay global.
+        """
+        terms = cls.expand_terms(query, prefix=prefix)
+        if not terms:
+            return []
+
+        stats = cls.get_stats()
+        total = stats['count'] or 0
+        if not total:
+            return []
+        avg_length = stats['avg_length'] or 1.0
+
+        document_frequencies = dict(
+            ServiceSearchPosting.objects.filter(
+                term__in=terms
+            ).values('term').annotate(df=Count('id')).values_list('term', 'df')
+        )
+
+        idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequencies.items()
+        }
+
+        scores = defaultdict(float)
+        postings = ServiceSearchPosting.objects.filter(term__in=list(idf))
+        if services is not None:
+            postings = postings.filter(service_id__in=services.order_by().values('id'))
+        postings = postings.values_list('service_id', 'term', 'frequency', 'document_length')
+        for service_id, term, frequency, length in postings.iterator():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            scores[service_id] += idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
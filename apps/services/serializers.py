@@ -6,7 +6,10 @@ from services.models import (
     ServiceCategory, Service, ServiceImage, 
     ServiceAvailability, ServiceArea
 )
-from users.serializers import UserSerializer
+from users.serializers import PublicUserSerializer, UserSerializer
+from core.serializers import (
+    FragmentCacheMixin, FragmentCachedListSerializer, SparseFieldsetMixin
+)
 
 
 class ServiceCategorySerializer(serializers.ModelSerializer):
@@ -23,12 +26,19 @@ class ServiceCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['service_count', 'provider_count']
     
     def get_subcategories(self, obj):
-        if obj.subcategories.exists():
-            return ServiceCategorySerializer(
-                obj.subcategories.filter(is_active=True),
-                many=True
-            ).data
-        return []
+        children = self.context.get('category_children')
+        if children is None:
+            # Load the whole active subtree in one query
+            children = ServiceCategory.build_tree(
+                obj.get_descendants().filter(is_active=True).order_by('depth', 'order', 'name')
+            )
+            self.context['category_children'] = children
+        
+        return ServiceCategorySerializer(
+            children.get(obj.pk, []),
+            many=True,
+            context=self.context
+        ).data
 
 
 class ServiceImageSerializer(serializers.ModelSerializer):
@@ -39,7 +49,7 @@ class ServiceImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image', 'caption', 'order', 'created_at']
 
 
-class ServiceListSerializer(serializers.ModelSerializer):
+class ServiceListSerializer(FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for service listings"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     provider_name = serializers.CharField(source='provider.full_name', read_only=True)
@@ -57,9 +67,40 @@ class ServiceListSerializer(serializers.ModelSerializer):
             'duration_minutes', 'is_featured', 'average_rating',
             'review_count', 'booking_count', 'created_at'
         ]
+        expandable_fields = {'provider': PublicUserSerializer}
+        list_serializer_class = FragmentCachedListSerializer
+        fragment_version = ['updated_at', 'category.updated_at', 'provider.updated_at']
+
+
+class NearbyServiceSerializer(ServiceListSerializer):
+    """Service listing annotated with distance from the search point"""
+    distance_km = serializers.SerializerMethodField()
+    
+    class Meta(ServiceListSerializer.Meta):
+        fields = ServiceListSerializer.Meta.fields + ['distance_km']
+        # Set by the view, not read from the database
+        eager_loading = {'distance_km': []}
+        # Distance differs per request, so rows are not fragment cached
+        fragment_version = []
+    
+    def get_distance_km(self, obj):
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 2) if distance is not None else None
+
+
+class NearbySearchSerializer(serializers.Serializer):
+    """Query parameters for proximity search"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(
+        min_value=0.1,
+        max_value=100,
+        required=False,
+        default=10
+    )
 
 
-class ServiceDetailSerializer(serializers.ModelSerializer):
+class ServiceDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Detailed serializer for service detail view"""
     category = ServiceCategorySerializer(read_only=True)
     provider = UserSerializer(read_only=True)
@@ -0,0 +1,130 @@
+"""
+Service signals for keeping the location and search indexes and cached
+data current
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import User, UserProfile
+from services.models import Service, ServiceArea, ServiceCategory, ProviderLocation
+from services.search import ServiceSearchIndex, INDEXED_FIELDS
+from core.cache import invalidate_tags
+
+
+@receiver(post_save, sender=UserProfile)
+def index_provider_location(sender, instance, **kwargs):
+    """
+    Re-index provider location when profile coordinates change
+    """
+    if instance.user.role == 'SERVICE_PROVIDER':
+        ProviderLocation.objects.sync_provider(instance.user_id)
+
+
+@receiver(post_save, sender=ServiceArea)
+@receiver(post_delete, sender=ServiceArea)
+def index_service_area(sender, instance, **kwargs):
+    """
+    Refresh the indexed service radius when service areas change
+    """
+    ProviderLocation.objects.sync_provider(instance.provider_id)
+
+
+
+@receiver(post_save, sender=Service)
+def index_service_text(sender, instance, update_fields=None, **kwargs):
+    """
+    Incrementally update the search index when searchable fields change
+    """
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    ServiceSearchIndex.index_service(instance)
+
+
+@receiver(post_delete, sender=Service)
+def unindex_service_text(sender, instance, **kwargs):
+    """
+    Remove deleted services from the search index
+    """
+    ServiceSearchIndex.remove_service(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_provider_services(sender, instance, update_fields=None, **kwargs):
+    """
+    Provider names are indexed, so re-index their services on rename
+    """
+    if instance.role != User.UserRole.SERVICE_PROVIDER:
+        return
+    if update_fields is not None and not {'first_name', 'last_name'}.intersection(update_fields):
+        return
+    for service in instance.services.filter(is_active=True):
+        service.provider = instance
+        ServiceSearchIndex.index_service(service)
+
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """
+    Drop cached category data, including the tree, on any category change
+    """
+    invalidate_tags(f'category:{instance.pk}', 'category:*')
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_cache(sender, instance, **kwargs):
+    """
+    Drop cached data derived from a service
+    """
+    tags = [
+        f'service:{instance.pk}',
+        f'service-slug:{instance.slug}',
+        f'provider:{instance.provider_id}',
+        f'category:{instance.category_id}',
+        'service:*'
+    ]
+    tracker = instance.tracker
+    if tracker.known('slug') and tracker.has_changed('slug'):
+        # A rename leaves the detail response cached under the old slug
+        tags.append(f"service-slug:{tracker.previous('slug')}")
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender='bookings.Booking')
+@receiver(post_delete, sender='bookings.Booking')
+def invalidate_booking_service_cache(sender, instance, **kwargs):
+    """
+    Bookings feed service and provider listings
+    """
+    invalidate_tags(
+        f'service:{instance.service_id}',
+        f'provider:{instance.provider_id}'
+    )
+
+
+@receiver(post_save, sender='reviews.Review')
+@receiver(post_delete, sender='reviews.Review')
+def invalidate_review_cache(sender, instance, **kwargs):
+    """
+    Reviews feed review listings plus service and provider listings
+    """
+    invalidate_tags(
+        f'service:{instance.service_id}',
+        f'provider:{instance.provider_id}',
+        'review:*'
+    )
+
+
+@receiver(post_save, sender='reviews.ReviewResponse')
+@receiver(post_delete, sender='reviews.ReviewResponse')
+def invalidate_review_response_cache(sender, instance, **kwargs):
+    """
+    Provider responses change has_response in review listings
+    """
+    review = instance.review
+    invalidate_tags(
+        f'service:{review.service_id}',
+        f'provider:{review.provider_id}',
+        'review:*'
+    )
@@ -1,67 +1,200 @@
 """
 Celery tasks for services
 """
-from celery import shared_task
-from django.db.models import Count, Avg
+import logging
+
+from celery import shared_task, chord
+from django.db.models import Count, Min, Max
+from django.utils import timezone
+
+from core.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_service_view_counts():
+    """
+    Flush buffered view counts in one batched UPDATE
+    """
+    from services.counters import service_view_counter
+    
+    flushed = service_view_counter.flush()
+    stats = service_view_counter.stats()
+    if stats.get('dropped') or stats.get('dropped_shared') or stats.get('lost'):
+        logger.warning('Service view counter losses: %s', stats)
+    return flushed
+
+
+STATISTICS_SHARD_SIZE = 5000
+DRIFT_SAMPLE_SIZE = 50
+
+
+def shard_ranges(min_id, max_id, shard_size):
+    """Split [min_id, max_id] into half-open primary key ranges"""
+    return [
+        (low, min(low + shard_size, max_id + 1))
+        for low in range(min_id, max_id + 1, shard_size)
+    ]
 
 
 @shared_task
-def increment_service_views(service_id):
+def update_service_statistics(shard_size=STATISTICS_SHARD_SIZE, dry_run=False):
     """
-    Increment service view count asynchronously
+    Recompute denormalized service and category statistics
+    
+    Services are split into primary key ranges; each shard runs grouped
+    aggregates and a bulk update, and the chord callback then refreshes
+    category counters and merges the drift reports. With dry_run=True
+    nothing is written and the report lists the counters that drifted.
     """
     from services.models import Service
-    from django.db.models import F
     
-    Service.objects.filter(id=service_id).update(
-        view_count=F('view_count') + 1
-    )
+    bounds = Service.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if bounds['min_id'] is None:
+        return finalize_service_statistics.delay([], dry_run=dry_run).id
+    
+    shards = [
+        update_service_statistics_shard.s(low, high, dry_run=dry_run)
+        for low, high in shard_ranges(bounds['min_id'], bounds['max_id'], shard_size)
+    ]
+    result = chord(shards)(finalize_service_statistics.s(dry_run=dry_run))
+    return result.id
 
 
 @shared_task
-def update_service_statistics():
+def update_service_statistics_shard(low_id, high_id, dry_run=False):
     """
-    Update denormalized service statistics
+    Recompute rating, review and booking counters for services with
+    low_id <= id < high_id using one grouped query per source table
+
+    Ratings come from the running totals in reviews.ServiceRating, which
+    the reconcile_ratings job checks against the reviews themselves.
     """
-    from services.models import Service, ServiceCategory
-    from reviews.models import Review
+    from services.models import Service
+    from reviews.models import ServiceRating
+    from reviews.ratings import rating_average
     from bookings.models import Booking
     
-    # Update service ratings and counts
-    services = Service.objects.all()
+    id_range = {'service_id__gte': low_id, 'service_id__lt': high_id}
     
-    for service in services:
-        # Update review stats
-        review_stats = Review.objects.filter(
-            service=service,
-            is_active=True
-        ).aggregate(
-            avg_rating=Avg('rating'),
+    review_stats = {
+        row['service_id']: row
+        for row in ServiceRating.objects.filter(**id_range).values('service_id', 'rating_sum', 'review_count')
+    }
+    booking_counts = dict(
+        Booking.objects.filter(**id_range).values('service_id').annotate(
             count=Count('id')
-        )
-        
-        service.average_rating = review_stats['avg_rating'] or 0.00
-        service.review_count = review_stats['count']
-        
-        # Update booking count
-        service.booking_count = Booking.objects.filter(
-            service=service
-        ).count()
-        
-        service.save(update_fields=['average_rating', 'review_count', 'booking_count'])
+        ).values_list('service_id', 'count')
+    )
     
-    # Update category counts
-    categories = ServiceCategory.objects.all()
+    services = Service.objects.filter(
+        id__gte=low_id, id__lt=high_id
+    ).only('id', 'average_rating', 'review_count', 'booking_count')
     
-    for category in categories:
-        category.service_count = Service.objects.filter(
-            category=category,
-            is_active=True
-        ).count()
+    scanned = 0
+    changed = []
+    drift = []
+    now = timezone.now()
+    for service in services.iterator():
+        scanned += 1
+        stats = review_stats.get(service.id, {})
+        expected = {
+            'average_rating': rating_average(stats.get('rating_sum', 0), stats.get('review_count', 0)),
+            'review_count': stats.get('review_count', 0),
+            'booking_count': booking_counts.get(service.id, 0),
+        }
+        diff = {
+            field: [str(getattr(service, field)), str(value)]
+            for field, value in expected.items()
+            if getattr(service, field) != value
+        }
+        if not diff:
+            continue
         
-        category.provider_count = Service.objects.filter(
-            category=category,
-            is_active=True
-        ).values('provider').distinct().count()
+        if len(drift) < DRIFT_SAMPLE_SIZE:
+            drift.append({'id': service.id, 'diff': diff})
+        for field, value in expected.items():
+            setattr(service, field, value)
+        # bulk_update skips auto_now; cached list fragments are keyed on it
+        service.updated_at = now
+        changed.append(service)
+    
+    if changed and not dry_run:
+        Service.objects.bulk_update(
+            changed,
+            ['average_rating', 'review_count', 'booking_count', 'updated_at'],
+            batch_size=1000
+        )
+        # bulk_update sends no signals, so invalidate cached services here
+        invalidate_tags('service:*', *[f'service:{service.id}' for service in changed])
+    
+    return {
+        'range': [low_id, high_id],
+        'scanned': scanned,
+        'drifted': len(changed),
+        'sample': drift,
+    }
+
+
+@shared_task
+def finalize_service_statistics(shard_reports, dry_run=False):
+    """
+    Chord callback: refresh category counters and merge shard reports
+    """
+    from services.models import Service, ServiceCategory
+    
+    category_stats = {
+        row['category_id']: row
+        for row in Service.objects.filter(is_active=True).values('category_id').annotate(
+            service_count=Count('id'),
+            provider_count=Count('provider', distinct=True)
+        )
+    }
+    
+    changed = []
+    category_drift = []
+    for category in ServiceCategory.objects.only('id', 'service_count', 'provider_count'):
+        stats = category_stats.get(category.id, {})
+        expected = {
+            'service_count': stats.get('service_count', 0),
+            'provider_count': stats.get('provider_count', 0),
+        }
+        diff = {
+            field: [getattr(category, field), value]
+            for field, value in expected.items()
+            if getattr(category, field) != value
+        }
+        if not diff:
+            continue
         
-        category.save(update_fields=['service_count', 'provider_count'])
\ No newline at end of file
+        category_drift.append({'id': category.id, 'diff': diff})
+        for field, value in expected.items():
+            setattr(category, field, value)
+        changed.append(category)
+    
+    if changed and not dry_run:
+        ServiceCategory.objects.bulk_update(
+            changed, ['service_count', 'provider_count'], batch_size=1000
+        )
+        # bulk_update sends no signals, so drop the cached tree here
+        invalidate_tags('category:*', *[f'category:{category.id}' for category in changed])
+    
+    report = {
+        'dry_run': dry_run,
+        'shards': len(shard_reports),
+        'services_scanned': sum(shard['scanned'] for shard in shard_reports),
+        'services_drifted': sum(shard['drifted'] for shard in shard_reports),
+        'service_sample': [
+            item for shard in shard_reports for item in shard['sample']
+        ][:DRIFT_SAMPLE_SIZE],
+        'categories_drifted': len(changed),
+        'category_sample': category_drift[:DRIFT_SAMPLE_SIZE],
+    }
+    logger.info(
+        'Service statistics %s: %s/%s services and %s categories drifted',
+        'dry run' if dry_run else 'updated',
+        report['services_drifted'], report['services_scanned'],
+        report['categories_drifted']
+    )
+    return report
@@ -1,3 +1,945 @@
-from django.test import TestCase
+"""
+Tests for services app
+"""
+import time
 
-# Create your tests here.
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from core.fake_smtp import FakeSMTPServer
+from core.mail import RateLimiter, SharedRateLimiter, close_pools
+from core.geo import geohash_encode, geohash_neighbors, covering_cells, haversine_many
+from users.models import User, UserProfile
+from services.models import ServiceCategory, Service, ServiceArea, ProviderLocation
+
+
+def create_provider(email, phone, latitude=None, longitude=None):
+    provider = User.objects.create_user(
+        email=email,
+        password='testpass123',
+        first_name='Pro',
+        last_name='Vider',
+        phone=phone,
+        role=User.UserRole.SERVICE_PROVIDER
+    )
+    UserProfile.objects.create(user=provider, latitude=latitude, longitude=longitude)
+    return provider
+
+
+class GeoHelpersTestCase(TestCase):
+    """Test geohash and distance helpers"""
+    
+    def test_geohash_encode(self):
+        """Known reference point encodes correctly"""
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+    
+    def test_neighbors_include_cell(self):
+        """A cell and its eight neighbors are returned"""
+        cells = geohash_neighbors('u4pru')
+        self.assertIn('u4pru', cells)
+        self.assertEqual(len(cells), 9)
+    
+    def test_covering_cells_contain_nearby_point(self):
+        """A point inside the radius falls under one of the covering prefixes"""
+        cells = covering_cells(40.7128, -74.0060, 5)
+        point = geohash_encode(40.74, -73.99)
+        self.assertTrue(any(point.startswith(cell) for cell in cells))
+    
+    def test_haversine_many(self):
+        """Batched distance matches the known NYC-London distance"""
+        distances = haversine_many(40.7128, -74.0060, [(51.5074, -0.1278), (40.7128, -74.0060)])
+        self.assertAlmostEqual(distances[0], 5570, delta=15)
+        self.assertAlmostEqual(distances[1], 0, places=6)
+
+
+class NearbyServicesTestCase(APITestCase):
+    """Test proximity index and nearby endpoint"""
+    
+    def setUp(self):
+        self.url = '/api/services/nearby/'
+        self.category = ServiceCategory.objects.create(name='Plumbing', slug='plumbing')
+        self.near = create_provider('near@example.com', '+1000000001', 40.7130, -74.0050)
+        self.close = create_provider('close@example.com', '+1000000002', 40.7500, -74.0000)
+        self.far = create_provider('far@example.com', '+1000000003', 41.5000, -73.0000)
+        for index, provider in enumerate([self.near, self.close, self.far]):
+            Service.objects.create(
+                title=f'Service {index}',
+                slug=f'service-{index}',
+                description='Fix things',
+                short_description='Fix things',
+                provider=provider,
+                category=self.category,
+                base_price=50
+            )
+    
+    def test_index_maintained_on_save(self):
+        """Profile saves create index rows with geohash cells"""
+        location = ProviderLocation.objects.get(provider=self.near)
+        self.assertEqual(location.geohash, geohash_encode(40.7130, -74.0050))
+    
+    def test_nearby_sorted_by_distance(self):
+        """Services inside the radius are returned nearest first"""
+        response = self.client.get(self.url, {'lat': 40.7128, 'lng': -74.0060, 'radius': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        slugs = [item['slug'] for item in response.data['results']]
+        self.assertEqual(slugs, ['service-0', 'service-1'])
+        self.assertLess(response.data['results'][0]['distance_km'], 1)
+    
+    def test_service_area_radius_limits_results(self):
+        """Providers whose service radius does not reach the point are excluded"""
+        ServiceArea.objects.create(
+            provider=self.close, city='New York', state='NY', service_radius_km=1
+        )
+        response = self.client.get(self.url, {'lat': 40.7128, 'lng': -74.0060, 'radius': 10})
+        slugs = [item['slug'] for item in response.data['results']]
+        self.assertEqual(slugs, ['service-0'])
+    
+    def test_nearby_combines_with_service_filter(self):
+        """ServiceFilter params still apply"""
+        response = self.client.get(
+            self.url, {'lat': 40.7128, 'lng': -74.0060, 'radius': 10, 'max_price': 10}
+        )
+        self.assertEqual(response.data['results'], [])
+    
+    def test_nearby_requires_coordinates(self):
+        """Missing coordinates are rejected"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ServiceSearchTestCase(APITestCase):
+    """Test inverted index search"""
+    
+    def setUp(self):
+        self.url = '/api/services/'
+        self.category = ServiceCategory.objects.create(name='Home', slug='home')
+        self.provider = create_provider('search@example.com', '+1000000010')
+        self.pipe = self.create_service('pipe-repair', 'Pipe repair', 'Leaking pipes fixed fast', 80)
+        self.drain = self.create_service('drain-cleaning', 'Drain cleaning', 'We unclog pipe drains', 40)
+        self.paint = self.create_service('house-painting', 'House painting', 'Interior walls', 200)
+    
+    def create_service(self, slug, title, description, price):
+        return Service.objects.create(
+            title=title,
+            slug=slug,
+            description=description,
+            short_description=description,
+            provider=self.provider,
+            category=self.category,
+            base_price=price
+        )
+    
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['slug'] for item in response.data['results']]
+    
+    def test_tokenize(self):
+        """Stop words and punctuation are dropped"""
+        from services.search import tokenize
+        self.assertEqual(tokenize('The Pipe-Repair, for a home!'), ['pipe', 'repair', 'home'])
+    
+    def test_title_match_ranks_first(self):
+        """Title hits outrank description hits"""
+        self.assertEqual(self.search('pipe'), ['pipe-repair', 'drain-cleaning'])
+    
+    def test_prefix_matching(self):
+        """The last query token matches as a prefix"""
+        self.assertEqual(self.search('paint'), ['house-painting'])
+    
+    def test_prefix_expansion_prefers_common_terms(self):
+        """Expansions are capped by document frequency, then alphabetically"""
+        from unittest import mock
+        from services.search import ServiceSearchIndex
+        
+        for index in range(3):
+            self.create_service(f'plumbing-{index}', f'Plumbing {index}', 'Pipework', 60)
+        with mock.patch('services.search.MAX_PREFIX_EXPANSIONS', 2):
+            self.assertEqual(ServiceSearchIndex.expand_terms('pi'), ['pi', 'pipework', 'pipe'])
+    
+    def test_search_composes_with_filters(self):
+        """ServiceFilter params still apply to search results"""
+        self.assertEqual(self.search('pipe', max_price=50), ['drain-cleaning'])
+    
+    def test_filters_apply_before_result_cap(self):
+        """Filtered matches ranked below the global cap are still found"""
+        from unittest import mock
+        
+        with mock.patch('services.filters.ServiceSearchFilter.max_results', 1):
+            self.assertEqual(self.search('pipe'), ['pipe-repair'])
+            self.assertEqual(self.search('pipe', max_price=50), ['drain-cleaning'])
+    
+    def test_index_updates_on_save(self):
+        """Edits and deactivation are reflected immediately"""
+        self.paint.title = 'Fence staining'
+        self.paint.save()
+        self.assertEqual(self.search('staining'), ['house-painting'])
+        
+        self.paint.is_active = False
+        self.paint.save()
+        self.assertEqual(self.search('staining'), [])
+
+
+class ServiceStatisticsTaskTestCase(TestCase):
+    """Test set-based statistics recompute"""
+    
+    def setUp(self):
+        self.category = ServiceCategory.objects.create(name='Garden', slug='garden')
+        self.provider = create_provider('stats@example.com', '+1000000020')
+        self.services = [
+            Service.objects.create(
+                title=f'Mowing {index}',
+                slug=f'mowing-{index}',
+                description='Lawn',
+                short_description='Lawn',
+                provider=self.provider,
+                category=self.category,
+                base_price=30,
+                booking_count=index + 5
+            )
+            for index in range(3)
+        ]
+    
+    def test_dry_run_reports_without_writing(self):
+        """Dry run lists drifted counters and leaves rows untouched"""
+        from services.tasks import update_service_statistics_shard, finalize_service_statistics
+        
+        shard = update_service_statistics_shard(0, 10 ** 9, dry_run=True)
+        report = finalize_service_statistics([shard], dry_run=True)
+        
+        self.assertEqual(report['services_scanned'], 3)
+        self.assertEqual(report['services_drifted'], 3)
+        self.assertEqual(report['service_sample'][0]['diff']['booking_count'][1], '0')
+        self.assertEqual(report['categories_drifted'], 1)
+        self.assertEqual(Service.objects.get(pk=self.services[0].pk).booking_count, 5)
+    
+    def test_sharded_update_repairs_counters(self):
+        """The chord fans out over shards and bulk-updates drifted rows"""
+        from services.tasks import update_service_statistics
+        
+        update_service_statistics.delay(shard_size=1)
+        
+        self.assertEqual(
+            list(Service.objects.values_list('booking_count', flat=True)), [0, 0, 0]
+        )
+        category = ServiceCategory.objects.get(pk=self.category.pk)
+        self.assertEqual((category.service_count, category.provider_count), (3, 1))
+
+
+class BufferedViewCounterTestCase(APITestCase):
+    """Test write-behind view counting"""
+    
+    def setUp(self):
+        from services.counters import service_view_counter
+        self.counter = service_view_counter
+        self.counter.drain()
+        category = ServiceCategory.objects.create(name='Moving', slug='moving')
+        provider = create_provider('views@example.com', '+1000000030')
+        self.service = Service.objects.create(
+            title='Van hire',
+            slug='van-hire',
+            description='Van',
+            short_description='Van',
+            provider=provider,
+            category=category,
+            base_price=90
+        )
+    
+    def test_views_flushed_in_batch(self):
+        """Detail views are buffered and applied on flush"""
+        from services.tasks import flush_service_view_counts
+        
+        for _ in range(3):
+            self.client.get('/api/services/van-hire/')
+        self.assertEqual(Service.objects.get(pk=self.service.pk).view_count, 0)
+        
+        self.assertEqual(flush_service_view_counts(), 1)
+        self.assertEqual(Service.objects.get(pk=self.service.pk).view_count, 3)
+    
+    def test_failed_batch_rolls_back_whole_flush(self):
+        """A flush is all-or-nothing, so restored deltas are not applied twice"""
+        from unittest import mock
+        from django.db.models import QuerySet
+        from services.counters import apply_view_counts
+        
+        other = Service.objects.create(
+            title='Van hire XL', slug='van-hire-xl', description='Van', short_description='Van',
+            provider=self.service.provider, category=self.service.category, base_price=120
+        )
+        deltas = {str(self.service.pk): 2, str(other.pk): 3}
+        update = QuerySet.update
+        calls = []
+        
+        def failing_second_update(queryset, **kwargs):
+            calls.append(None)
+            if len(calls) == 2:
+                raise RuntimeError('database unavailable')
+            return update(queryset, **kwargs)
+        
+        with mock.patch('services.counters.FLUSH_BATCH_SIZE', 1), \
+                mock.patch.object(QuerySet, 'update', failing_second_update):
+            with self.assertRaises(RuntimeError):
+                apply_view_counts(deltas)
+        self.assertEqual(list(Service.objects.values_list('view_count', flat=True)), [0, 0])
+        
+        apply_view_counts(deltas)
+        self.assertEqual(Service.objects.get(pk=other.pk).view_count, 3)
+    
+    def test_bounded_buffer_accounts_losses(self):
+        """New keys beyond max_keys are dropped and counted"""
+        from core.counters import BufferedCounter
+        
+        counter = BufferedCounter('test', apply=lambda deltas: None, max_keys=1, flush_interval=3600)
+        counter.record(1)
+        counter.record(1)
+        counter.record(2)
+        self.assertEqual(counter.drain(), {'1': 2})
+        self.assertEqual(counter.stats()['dropped'], 1)
+    
+    def test_failed_flush_restores_deltas(self):
+        """Deltas survive a failed apply and are retried"""
+        from core.counters import BufferedCounter
+        
+        applied = []
+        
+        def flaky_apply(deltas):
+            if not applied:
+                applied.append(None)
+                raise RuntimeError('database unavailable')
+            applied.append(deltas)
+        
+        counter = BufferedCounter('test', apply=flaky_apply, flush_interval=3600)
+        counter.record(7, 4)
+        self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(applied[-1], {'7': 4})
+        self.assertEqual(counter.stats()['failed_flushes'], 1)
+    
+    def test_failed_flush_restores_to_shared_buffer(self):
+        """With Redis, restored deltas go back to the shared hash"""
+        from unittest import mock
+        from core.counters import BufferedCounter
+        
+        counter = BufferedCounter('test', apply=mock.Mock(side_effect=RuntimeError), flush_interval=3600)
+        redis = mock.Mock()
+        redis.eval.return_value = [b'7', b'4', b'8', b'1']
+        with mock.patch.object(counter, 'get_redis', return_value=redis):
+            self.assertEqual(counter.flush(), 0)
+        pipeline = redis.pipeline.return_value
+        pipeline.hincrby.assert_has_calls([
+            mock.call(counter.pending_key, '7', 4), mock.call(counter.pending_key, '8', 1)
+        ])
+        pipeline.execute.assert_called_once_with()
+        self.assertEqual(counter.stats()['pending_local'], 0)
+
+
+class CategoryTreeTestCase(APITestCase):
+    """Test materialized category paths"""
+    
+    def setUp(self):
+        self.cleaning = ServiceCategory.objects.create(name='Cleaning', slug='cleaning')
+        self.home = ServiceCategory.objects.create(name='Home', slug='home-cleaning', parent=self.cleaning)
+        self.carpet = ServiceCategory.objects.create(name='Carpet', slug='carpet', parent=self.home)
+        self.repairs = ServiceCategory.objects.create(name='Repairs', slug='repairs')
+    
+    def test_paths_and_ancestors(self):
+        """Paths encode the hierarchy and resolve ancestors in one query"""
+        self.assertEqual(self.carpet.path, f'{self.cleaning.pk}/{self.home.pk}/{self.carpet.pk}/')
+        self.assertEqual(self.carpet.depth, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.carpet.get_full_path(), 'Cleaning > Home > Carpet')
+    
+    def test_move_subtree(self):
+        """Re-parenting rewrites descendant paths"""
+        self.home.parent = self.repairs
+        self.home.save()
+        carpet = ServiceCategory.objects.get(pk=self.carpet.pk)
+        self.assertEqual(carpet.path, f'{self.repairs.pk}/{self.home.pk}/{self.carpet.pk}/')
+        self.assertEqual(list(self.cleaning.get_descendants()), [])
+    
+    def test_failed_move_rolls_back(self):
+        """A move whose subtree update fails leaves the whole tree as it was"""
+        from unittest import mock
+        from django.db import DatabaseError
+        from django.db.models import QuerySet
+        
+        update = QuerySet.update
+        
+        def fail_on_subtree(queryset, **kwargs):
+            if 'path' in kwargs and not isinstance(kwargs['path'], str):
+                raise DatabaseError('subtree update failed')
+            return update(queryset, **kwargs)
+        
+        self.home.parent = self.repairs
+        with mock.patch.object(QuerySet, 'update', fail_on_subtree):
+            with self.assertRaises(DatabaseError):
+                self.home.save()
+        home = ServiceCategory.objects.get(pk=self.home.pk)
+        self.assertEqual((home.parent_id, home.path), (self.cleaning.pk, f'{self.cleaning.pk}/{self.home.pk}/'))
+    
+    def test_move_under_own_subtree_is_rejected(self):
+        """A category cannot become its own ancestor"""
+        from django.core.exceptions import ValidationError
+        
+        for parent in (self.carpet, self.home):
+            self.home.parent = parent
+            with self.assertRaises(ValidationError):
+                self.home.save()
+            with self.assertRaises(ValidationError):
+                self.home.full_clean()
+        carpet = ServiceCategory.objects.get(pk=self.carpet.pk)
+        self.assertEqual(carpet.path, f'{self.cleaning.pk}/{self.home.pk}/{self.carpet.pk}/')
+        
+        # Moving a subtree elsewhere is still allowed
+        self.carpet.parent = self.cleaning
+        self.carpet.full_clean()
+        self.carpet.save()
+    
+    def test_tree_endpoint_single_query(self):
+        """The whole tree is read with one query"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/services/categories/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        roots = response.data['results']
+        self.assertEqual([root['name'] for root in roots], ['Cleaning', 'Repairs'])
+        self.assertEqual(roots[0]['subcategories'][0]['subcategories'][0]['name'], 'Carpet')
+    
+    def test_services_under_category_tree(self):
+        """category_tree filter returns services in the whole subtree"""
+        provider = create_provider('tree@example.com', '+1000000040')
+        for slug, category in [('rug', self.carpet), ('sink', self.repairs)]:
+            Service.objects.create(
+                title=slug, slug=slug, description=slug, short_description=slug,
+                provider=provider, category=category, base_price=10
+            )
+        response = self.client.get('/api/services/', {'category_tree': self.cleaning.pk})
+        self.assertEqual([item['slug'] for item in response.data['results']], ['rug'])
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheManagerTestCase(TestCase):
+    """Test single-flight and stale-while-revalidate caching"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        self.cache = cache
+        self.cache.clear()
+        self.calls = []
+    
+    def compute(self):
+        self.calls.append(None)
+        return len(self.calls)
+    
+    def test_fresh_value_is_reused(self):
+        from core.cache import CacheManager
+        
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60), 1)
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60), 1)
+        self.assertEqual(len(self.calls), 1)
+    
+    def test_stale_value_served_while_locked(self):
+        """Only the lock holder recomputes; others get the stale value"""
+        from core.cache import CacheManager, CacheEntry
+        
+        self.cache.set('swr', CacheEntry('stale', time.time() - 1, 0), 60)
+        token = CacheManager.acquire_lock('swr')
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60), 'stale')
+        self.assertEqual(self.calls, [])
+        
+        CacheManager.release_lock('swr', token)
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60), 1)
+    
+    def test_cold_miss_waits_for_lock_holder(self):
+        from core.cache import CacheManager
+        
+        CacheManager.acquire_lock('swr', lock_timeout=1)
+        started = time.monotonic()
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60, lock_timeout=0.2), 1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+    
+    def test_early_expiration(self):
+        """Slow-to-compute values are refreshed before their soft expiry"""
+        from core.cache import CacheManager, CacheEntry
+        
+        self.cache.set('swr', CacheEntry('old', time.time() + 5, 10 ** 6), 60)
+        self.assertEqual(CacheManager.get_or_set('swr', self.compute, 60), 1)
+    
+    def test_failed_refresh_serves_stale(self):
+        from core.cache import CacheManager, CacheEntry
+        
+        def broken():
+            raise RuntimeError('database unavailable')
+        
+        self.cache.set('swr', CacheEntry('stale', time.time() - 1, 0), 60)
+        self.assertEqual(CacheManager.get_or_set('swr', broken, 60), 'stale')
+    
+    def test_tag_invalidation(self):
+        """Bumping any registered tag discards the entry"""
+        from core.cache import CacheManager, invalidate_tags
+        
+        CacheManager.get_or_set('tagged', self.compute, 60, tags=['service:1', 'service:*'])
+        invalidate_tags('service:2')
+        self.assertEqual(CacheManager.get_or_set('tagged', self.compute, 60, tags=['service:1']), 1)
+        
+        invalidate_tags('service:*')
+        self.assertEqual(CacheManager.get_or_set('tagged', self.compute, 60, tags=['service:1']), 2)
+    
+    def test_evicted_tag_does_not_revive_entries(self):
+        from core.cache import CacheManager, tag_key
+        
+        CacheManager.get_or_set('tagged', self.compute, 60, tags=['provider:9'])
+        self.cache.delete(tag_key('provider:9'))
+        self.assertEqual(CacheManager.get_or_set('tagged', self.compute, 60, tags=['provider:9']), 2)
+    
+    def test_model_changes_invalidate_views(self):
+        """Service, booking and review signals bump the matching tags"""
+        from core.cache import tag_versions
+        from bookings.models import Booking
+        
+        category = ServiceCategory.objects.create(name='Garden', slug='garden')
+        provider = create_provider('tags@example.com', '+1000000050')
+        self.assertEqual(self.client_get_featured(), [])
+        
+        service = Service.objects.create(
+            title='Lawn', slug='lawn', description='Lawn', short_description='Lawn',
+            provider=provider, category=category, base_price=30, is_featured=True
+        )
+        self.assertEqual(self.client_get_featured(), ['lawn'])
+        
+        before = tag_versions([f'service:{service.pk}', f'provider:{provider.pk}'])
+        customer = User.objects.create_user(
+            email='tagcustomer@example.com', password='testpass123', first_name='T',
+            last_name='C', phone='+1000000051', role=User.UserRole.CUSTOMER
+        )
+        Booking.objects.create(
+            customer=customer, provider=provider, service=service,
+            scheduled_date='2030-01-01', scheduled_time='10:00',
+            estimated_duration_minutes=60, service_address='1 Main St',
+            service_city='Springfield', service_state='IL',
+            service_postal_code='62701', base_price=30
+        )
+        after = tag_versions([f'service:{service.pk}', f'provider:{provider.pk}'])
+        self.assertTrue(all(after[tag] != before[tag] for tag in before))
+    
+    def client_get_featured(self):
+        from rest_framework.test import APIClient
+        response = APIClient().get('/api/services/featured/')
+        return [item['slug'] for item in response.data['results']]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TieredCacheTestCase(TestCase):
+    """Test the in-process L1 cache in front of the shared cache"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from core.tiered_cache import LocalLRUCache, TieredCache
+        cache.clear()
+        self.remote = cache
+        self.tiered = TieredCache(LocalLRUCache(max_bytes=4096, timeout=60), remote=cache)
+    
+    def test_lru_is_bounded_by_bytes(self):
+        from core.tiered_cache import LocalLRUCache
+        
+        local = LocalLRUCache(max_bytes=1000, timeout=60)
+        for index in range(10):
+            local.set(f'key{index}', 'x' * 200)
+        self.assertLessEqual(local.stats()['bytes'], 1000)
+        self.assertIsNone(local.get('key0'))
+        self.assertEqual(local.get('key9'), 'x' * 200)
+        self.assertGreater(local.stats()['evictions'], 0)
+        self.assertFalse(local.set('huge', 'x' * 2000))
+    
+    def test_lru_ttl(self):
+        from core.tiered_cache import LocalLRUCache
+        
+        local = LocalLRUCache(timeout=60)
+        local.set('short', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(local.get('short'))
+    
+    def test_hits_and_misses_per_tier(self):
+        self.assertIsNone(self.tiered.get('missing'))
+        self.remote.set('shared', {'a': 1})
+        self.assertEqual(self.tiered.get('shared'), {'a': 1})
+        self.assertEqual(self.tiered.get('shared'), {'a': 1})
+        
+        stats = self.tiered.stats()
+        self.assertEqual(
+            (stats['l1_hits'], stats['l1_misses'], stats['l2_hits'], stats['l2_misses']),
+            (1, 2, 1, 1)
+        )
+    
+    def test_values_are_copies(self):
+        self.tiered.set('mutable', [1])
+        self.tiered.get('mutable').append(2)
+        self.assertEqual(self.tiered.get('mutable'), [1])
+    
+    def test_remote_invalidation(self):
+        """Keys published by another process are dropped from L1"""
+        from core.tiered_cache import LocalLRUCache, TieredCache
+        
+        other = TieredCache(LocalLRUCache(timeout=60), remote=self.remote)
+        self.tiered.set('shared', 'old')
+        self.assertEqual(other.get('shared'), 'old')
+        
+        self.tiered.set('shared', 'new')
+        self.assertEqual(other.get('shared'), 'old')
+        other.apply_invalidation({'origin': 'another-process', 'keys': ['shared']})
+        self.assertEqual(other.get('shared'), 'new')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ResponseCacheTestCase(APITestCase):
+    """Test byte-level response caching with ETags"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from services.counters import service_view_counter
+        cache.clear()
+        self.counter = service_view_counter
+        self.counter.drain()
+        category = ServiceCategory.objects.create(name='Pets', slug='pets')
+        provider = create_provider('etag@example.com', '+1000000060')
+        self.service = Service.objects.create(
+            title='Dog walking', slug='dog-walking', description='Walks',
+            short_description='Walks', provider=provider, category=category,
+            base_price=20
+        )
+    
+    def test_list_hit_and_not_modified(self):
+        first = self.client.get('/api/services/?min_price=1&ordering=base_price')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        etag = first['ETag']
+        
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/services/?ordering=base_price&min_price=1&utm_source=mail')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(second.content, first.content)
+        
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(
+                '/api/services/?min_price=1&ordering=base_price',
+                HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated.content, b'')
+    
+    def test_model_change_invalidates(self):
+        self.client.get('/api/services/')
+        self.service.title = 'Dog walking deluxe'
+        self.service.save()
+        response = self.client.get('/api/services/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Dog walking deluxe')
+    
+    def test_rename_invalidates_old_slug(self):
+        self.assertEqual(self.client.get('/api/services/dog-walking/').status_code, status.HTTP_200_OK)
+        service = Service.objects.get(pk=self.service.pk)
+        service.slug = 'dog-walks'
+        service.save()
+        self.assertEqual(self.client.get('/api/services/dog-walking/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/services/dog-walks/').status_code, status.HTTP_200_OK)
+    
+    def test_detail_hits_still_count_views(self):
+        self.client.get('/api/services/dog-walking/')
+        response = self.client.get('/api/services/dog-walking/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.counter.drain(), {str(self.service.id): 2})
+    
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/services/missing/').status_code, status.HTTP_404_NOT_FOUND)
+        Service.objects.filter(pk=self.service.pk).update(slug='missing')
+        self.assertEqual(self.client.get('/api/services/missing/').status_code, status.HTTP_200_OK)
+
+
+class FastJSONTestCase(TestCase):
+    """Test the orjson renderer/parser against the stock ones"""
+    
+    def test_renderer_matches_stock_output(self):
+        from datetime import date, datetime, timezone as dt_timezone
+        from decimal import Decimal
+        from uuid import UUID
+        from rest_framework.renderers import JSONRenderer
+        from core.renderers import FastJSONRenderer
+        
+        data = {
+            'text': 'Zoë   "quoted" \\ \n\t\x00',
+            'decimal': Decimal('12.50'),
+            'aware': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'naive': datetime(2025, 1, 2, 3, 4, 5),
+            'date': date(2025, 1, 2),
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'numbers': [1, -2, 2 ** 64, 0.1, 1.5, True, None],
+            'set': {1},
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+    
+    def test_parser(self):
+        import io
+        from rest_framework.exceptions import ParseError
+        from rest_framework.parsers import JSONParser
+        from core.parsers import FastJSONParser
+        
+        body = b'{"a": [1, 2.5, "\\u00e9"], "big": 123456789012345678901234567890}'
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body))
+        )
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+class SparseFieldsetTestCase(APITestCase):
+    """Test ?fields= and ?expand= on service endpoints"""
+    
+    def setUp(self):
+        category = ServiceCategory.objects.create(name='Garden', slug='garden')
+        self.provider = create_provider('sparse@example.com', '+1000000070')
+        self.service = Service.objects.create(
+            title='Lawn mowing', slug='lawn-mowing', description='Mowing',
+            short_description='Mowing', provider=self.provider, category=category,
+            base_price=30
+        )
+    
+    def get_with_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        selects = [q['sql'] for q in queries.captured_queries if 'FROM "services"' in q['sql']]
+        return response, selects
+    
+    def test_fields_prune_payload_and_query(self):
+        response, selects = self.get_with_queries('/api/services/?fields=id,title,base_price,average_rating')
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'title', 'base_price', 'average_rating'}
+        )
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('JOIN', selects[0])
+        self.assertNotIn('"description"', selects[0])
+    
+    def test_expand_with_nested_fields(self):
+        response, selects = self.get_with_queries('/api/services/?expand=provider&fields=id,provider.full_name')
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.service.id, 'provider': {'full_name': self.provider.full_name}}
+        )
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('user_profiles', selects[0])
+    
+    def test_expanded_provider_hides_contact_details(self):
+        response = self.client.get('/api/services/?expand=provider')
+        provider = response.data['results'][0]['provider']
+        self.assertEqual(provider['id'], self.provider.id)
+        self.assertFalse({'email', 'phone', 'profile', 'provider_profile'} & set(provider))
+        response = self.client.get('/api/services/?expand=provider&fields=id,provider.email')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_detail_drops_unused_joins(self):
+        response, selects = self.get_with_queries('/api/services/lawn-mowing/?fields=id,provider.full_name')
+        self.assertEqual(response.data, {'id': self.service.id, 'provider': {'full_name': self.provider.full_name}})
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('user_profiles', selects[0])
+        self.assertNotIn('service_images', selects[0])
+    
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/services/?fields=id,provider.nope')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/services/?expand=category_name')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_default_payload_unchanged(self):
+        response = self.client.get('/api/services/')
+        self.assertIn('provider_name', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['provider'], self.provider.id)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FragmentCacheTestCase(TestCase):
+    """Test per-row fragment caching of list serializers"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        category = ServiceCategory.objects.create(name='Repairs', slug='repairs')
+        self.provider = create_provider('fragment@example.com', '+1000000080')
+        self.services = [
+            Service.objects.create(
+                title=f'Fix {index}', slug=f'fix-{index}', description='Fixing',
+                short_description='Fixing', provider=self.provider, category=category,
+                base_price=40
+            )
+            for index in range(3)
+        ]
+    
+    def serialize(self):
+        from services.serializers import ServiceListSerializer
+        queryset = Service.objects.select_related('category', 'provider').order_by('id')
+        return ServiceListSerializer(queryset, many=True).data
+    
+    def test_rows_are_served_until_version_changes(self):
+        self.assertEqual(self.serialize()[0]['title'], 'Fix 0')
+        
+        # A write that skips updated_at is invisible to the cache
+        Service.objects.filter(pk=self.services[0].pk).update(title='Unseen')
+        self.assertEqual(self.serialize()[0]['title'], 'Fix 0')
+        
+        service = Service.objects.get(pk=self.services[0].pk)
+        service.save()
+        self.assertEqual(self.serialize()[0]['title'], 'Unseen')
+    
+    def test_related_changes_bump_the_version(self):
+        self.serialize()
+        self.provider.first_name = 'Renamed'
+        self.provider.save()
+        self.assertTrue(all(row['provider_name'].startswith('Renamed') for row in self.serialize()))
+    
+    def test_booking_counts_bump_the_version(self):
+        from datetime import date, time
+        from bookings.models import Booking
+        
+        self.assertEqual(self.serialize()[0]['booking_count'], 0)
+        customer = User.objects.create_user(
+            email='fragment-customer@example.com', password='testpass123', first_name='Test',
+            last_name='Customer', phone='+1000000081', role=User.UserRole.CUSTOMER
+        )
+        booking = Booking.objects.create(
+            customer=customer, provider=self.provider, service=self.services[0],
+            scheduled_date=date(2030, 1, 1), scheduled_time=time(10, 0),
+            estimated_duration_minutes=60, service_address='1 Main St', service_city='Springfield',
+            service_state='IL', service_postal_code='62701', base_price=40
+        )
+        self.assertEqual(self.serialize()[0]['booking_count'], 1)
+        booking.delete()
+        self.assertEqual(self.serialize()[0]['booking_count'], 0)
+    
+    @override_settings(ALLOWED_HOSTS=['internal', 'example.com'])
+    def test_rows_are_cached_per_origin(self):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from services.serializers import ServiceListSerializer
+        
+        Service.objects.filter(pk=self.services[0].pk).update(thumbnail='services/thumbnails/fix.png')
+        queryset = Service.objects.select_related('category', 'provider').order_by('id')
+        factory = APIRequestFactory()
+        thumbnails = []
+        for host, secure in (('internal', False), ('example.com', True), ('internal', False)):
+            request = Request(factory.get('/api/services/', HTTP_HOST=host, secure=secure))
+            rows = ServiceListSerializer(queryset, many=True, context={'request': request}).data
+            thumbnails.append(rows[0]['thumbnail'])
+        self.assertTrue(thumbnails[0].startswith('http://internal/'))
+        self.assertTrue(thumbnails[1].startswith('https://example.com/'))
+        self.assertEqual(thumbnails[2], thumbnails[0])
+    
+    def test_only_misses_are_serialized(self):
+        from unittest import mock
+        from services.serializers import ServiceListSerializer
+        
+        self.serialize()
+        self.services[1].save()
+        with mock.patch.object(
+            ServiceListSerializer, 'to_representation', autospec=True,
+            side_effect=ServiceListSerializer.to_representation
+        ) as to_representation:
+            rows = self.serialize()
+        self.assertEqual(to_representation.call_count, 1)
+        self.assertEqual([row['id'] for row in rows], [service.id for service in self.services])
+    
+    def test_sparse_fieldsets_bypass_cache(self):
+        from services.serializers import ServiceListSerializer
+        
+        self.serialize()
+        serializer = ServiceListSerializer(Service.objects.order_by('id'), many=True, fields='id')
+        self.assertEqual(serializer.data[0], {'id': self.services[0].id})
+
+
+class PooledEmailBackendTestCase(TestCase):
+    """Test the pooled SMTP backend against the fake SMTP server"""
+    
+    def setUp(self):
+        self.server = FakeSMTPServer().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(close_pools)
+    
+    def smtp_settings(self, backend='core.mail.PooledEmailBackend', **kwargs):
+        return override_settings(
+            EMAIL_BACKEND=backend,
+            EMAIL_HOST=self.server.host,
+            EMAIL_PORT=self.server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            **kwargs
+        )
+    
+    def send(self, count):
+        for index in range(count):
+            send_mail(f'Hello {index}', 'Body', 'noreply@example.com', [f'user{index}@example.com'])
+    
+    def test_separate_sends_share_a_connection(self):
+        with self.smtp_settings():
+            self.send(5)
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.messages[4].recipients, ['<user4@example.com>'])
+    
+    def test_stock_backend_connects_per_message(self):
+        with self.smtp_settings(backend='django.core.mail.backends.smtp.EmailBackend'):
+            self.send(3)
+        self.assertEqual(self.server.connections, 3)
+    
+    def test_connections_are_replaced_after_message_limit(self):
+        with self.smtp_settings(EMAIL_MAX_MESSAGES_PER_CONNECTION=2):
+            self.send(3)
+            with get_connection() as batch:
+                sent = batch.send_messages([
+                    EmailMessage('Batch', 'Body', 'noreply@example.com', ['batch@example.com'])
+                    for _ in range(4)
+                ])
+        self.assertEqual(sent, 4)
+        self.assertEqual(len(self.server.messages), 7)
+        # Sends: 2 + 1 on two connections; the batch finishes the second
+        # connection with 1 message and needs two more for the other 3
+        self.assertEqual(self.server.connections, 4)
+    
+    def test_rate_limiter_paces_sends(self):
+        clock = [0.0]
+        sleeps = []
+        
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+        
+        limiter = RateLimiter(10, burst=2, clock=lambda: clock[0], sleep=sleep)
+        for _ in range(4):
+            limiter.acquire()
+        # Two from the burst, then one every 0.1s
+        self.assertEqual([round(s, 3) for s in sleeps], [0.1, 0.1])
+    
+    def test_shared_rate_limiter_reserves_slots_in_redis(self):
+        from unittest import mock
+        
+        redis = mock.Mock()
+        redis.eval.side_effect = [0, 250000, ConnectionError('down')]
+        sleeps = []
+        limiter = SharedRateLimiter('mail:rate', 4, client=redis, sleep=sleeps.append)
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(redis.eval.call_args[0][1:], (1, 'mail:rate', 250000, 4))
+        # The failed call fell back to this process's own bucket
+        self.assertEqual(sleeps, [0.25])
+        self.assertEqual(limiter.fallback.tokens, 3)
@@ -16,6 +16,7 @@ urlpatterns = [
     path('my-services/', views.MyServicesView.as_view(), name='my_services'),
     path('featured/', views.FeaturedServicesView.as_view(), name='featured_services'),
     path('popular/', views.PopularServicesView.as_view(), name='popular_services'),
+    path('nearby/', views.NearbyServiceListView.as_view(), name='nearby_services'),
     path('<slug:slug>/', views.ServiceDetailView.as_view(), name='service_detail'),
     path('<slug:slug>/update/', views.ServiceUpdateView.as_view(), name='service_update'),
     path('<slug:slug>/delete/', views.ServiceDeleteView.as_view(), name='service_delete'),
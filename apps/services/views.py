@@ -6,19 +6,24 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
 from django.db.models import Q, Count, Avg
 
 from services.models import (
-    ServiceCategory, Service, ServiceAvailability, ServiceArea
+    ServiceCategory, Service, ServiceAvailability, ServiceArea,
+    ProviderLocation
 )
 from services.serializers import (
     ServiceCategorySerializer, ServiceListSerializer,
     ServiceDetailSerializer, ServiceCreateUpdateSerializer,
-    ServiceAvailabilitySerializer, ServiceAreaSerializer
+    ServiceAvailabilitySerializer, ServiceAreaSerializer,
+    NearbyServiceSerializer, NearbySearchSerializer
 )
-from services.filters import ServiceFilter
+from services.filters import ServiceFilter, ServiceSearchFilter
+from services.counters import service_view_counter
 from users.permissions import IsServiceProvider, IsOwnerOrAdmin
+from core.pagination import KeysetPagination
+from core.cache import CacheManager
+from core.mixins import CachedResponseMixin, EagerLoadingMixin
 
 
 class ServiceCategoryListView(generics.ListAPIView):
@@ -30,33 +35,51 @@ class ServiceCategoryListView(generics.ListAPIView):
     serializer_class = ServiceCategorySerializer
     queryset = ServiceCategory.objects.filter(is_active=True)
     
-    def get_queryset(self):
-        # Cache categories
-        cache_key = 'service_categories_all'
-        categories = cache.get(cache_key)
-        
-        if not categories:
-            categories = list(
-                ServiceCategory.objects.filter(
-                    is_active=True,
-                    parent__isnull=True
-                ).prefetch_related('subcategories')
-            )
-            cache.set(cache_key, categories, 3600)  # Cache for 1 hour
-        
-        return categories
+    def build_tree_data(self):
+        """
+        Serialized category tree built from a single query
+        """
+        children = ServiceCategory.build_tree(
+            ServiceCategory.objects.filter(is_active=True).order_by('depth', 'order', 'name')
+        )
+        serializer = self.get_serializer(
+            children.get(None, []),
+            many=True,
+            context={**self.get_serializer_context(), 'category_children': children}
+        )
+        return serializer.data
+    
+    def get_tree_data(self):
+        """
+        Cached until any category changes (see services.signals)
+        """
+        return CacheManager.get_or_set(
+            ServiceCategory.TREE_CACHE_KEY,
+            self.build_tree_data,
+            3600,  # Cache for 1 hour
+            tags=['category:*']
+        )
+    
+    def list(self, request, *args, **kwargs):
+        tree = self.get_tree_data()
+        page = self.paginate_queryset(tree)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(tree)
 
 
-class ServiceListView(generics.ListAPIView):
+class ServiceListView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
     """
     List all services with filtering
     GET /api/services/
     """
     permission_classes = [AllowAny]
+    cache_timeout = 60
+    cache_tags = ['service:*']
     serializer_class = ServiceListSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ServiceSearchFilter]
     filterset_class = ServiceFilter
-    search_fields = ['title', 'description', 'provider__first_name', 'provider__last_name']
     ordering_fields = ['created_at', 'average_rating', 'base_price', 'booking_count']
     ordering = ['-is_featured', '-average_rating']
     
@@ -79,7 +102,51 @@ class ServiceListView(generics.ListAPIView):
         return queryset
 
 
-class ServiceDetailView(generics.RetrieveAPIView):
+class NearbyServiceListView(EagerLoadingMixin, generics.ListAPIView):
+    """
+    List services from providers near a point, sorted by distance
+    GET /api/services/nearby/?lat=..&lng=..&radius=..
+    """
+    permission_classes = [AllowAny]
+    serializer_class = NearbyServiceSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ServiceFilter
+    
+    def get_queryset(self):
+        return Service.objects.filter(
+            is_active=True
+        ).select_related('category', 'provider')
+    
+    def list(self, request, *args, **kwargs):
+        params = NearbySearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        
+        nearby = ProviderLocation.objects.nearby(
+            params.validated_data['lat'],
+            params.validated_data['lng'],
+            params.validated_data['radius']
+        )
+        distances = dict(nearby)
+        
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            provider_id__in=list(distances)
+        )
+        
+        services = list(queryset)
+        for service in services:
+            service.distance_km = distances[service.provider_id]
+        services.sort(key=lambda service: (service.distance_km, -service.average_rating))
+        
+        page = self.paginate_queryset(services)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(services, many=True)
+        return Response(serializer.data)
+
+
+class ServiceDetailView(CachedResponseMixin, EagerLoadingMixin, generics.RetrieveAPIView):
     """
     Get service details
     GET /api/services/{slug}/
@@ -87,6 +154,14 @@ class ServiceDetailView(generics.RetrieveAPIView):
     permission_classes = [AllowAny]
     serializer_class = ServiceDetailSerializer
     lookup_field = 'slug'
+    cache_timeout = 300
+    
+    def get_cache_tags(self):
+        return [f"service-slug:{self.kwargs['slug']}"]
+    
+    def cached_response_hit(self, request, cached):
+        # Views served from cache still count
+        service_view_counter.record(cached.metadata['service_id'])
     
     def get_queryset(self):
         return Service.objects.filter(
@@ -98,12 +173,13 @@ class ServiceDetailView(generics.RetrieveAPIView):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        # Increment view count asynchronously
-        from services.tasks import increment_service_views
-        increment_service_views.delay(instance.id)
+        # Buffer the view; flushed in batches by flush_service_view_counts
+        service_view_counter.record(instance.id)
         
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response.cache_metadata = {'service_id': instance.id}
+        return response
 
 
 class ServiceCreateView(generics.CreateAPIView):
@@ -148,7 +224,7 @@ class ServiceDeleteView(generics.DestroyAPIView):
         instance.save()
 
 
-class MyServicesView(generics.ListAPIView):
+class MyServicesView(EagerLoadingMixin, generics.ListAPIView):
     """
     List provider's own services
     GET /api/services/my-services/
@@ -205,25 +281,25 @@ class FeaturedServicesView(generics.ListAPIView):
     serializer_class = ServiceListSerializer
     
     def get_queryset(self):
-        # Cache featured services
-        cache_key = 'featured_services'
-        services = cache.get(cache_key)
-        
-        if not services:
-            services = list(
-                Service.objects.filter(
-                    is_active=True,
-                    is_featured=True
-                ).select_related(
-                    'category', 'provider'
-                ).order_by('-average_rating')[:10]
-            )
-            cache.set(cache_key, services, 1800)  # Cache for 30 minutes
-        
-        return services
+        return CacheManager.get_or_set(
+            'featured_services',
+            self.get_featured_services,
+            1800,  # Cache for 30 minutes
+            tags=['service:*']
+        )
+    
+    def get_featured_services(self):
+        return list(
+            Service.objects.filter(
+                is_active=True,
+                is_featured=True
+            ).select_related(
+                'category', 'provider'
+            ).order_by('-average_rating')[:10]
+        )
 
 
-class PopularServicesView(generics.ListAPIView):
+class PopularServicesView(EagerLoadingMixin, generics.ListAPIView):
     """
     Get popular services (most bookings)
     GET /api/services/popular/
@@ -187,23 +187,14 @@ class ServiceProviderProfile(models.Model):
     
     def update_rating_stats(self):
         """
-        Update denormalized rating statistics
-        Called by signals when reviews are added/updated
+        Recount denormalized rating statistics from reviews
+        Review changes keep them current by deltas (reviews.ratings); this
+        is the repair path
         """
-        from apps.reviews.models import Review
-        from django.db.models import Avg, Count
+        from reviews.ratings import PROVIDER, rebuild
         
-        stats = Review.objects.filter(
-            provider=self.user,
-            is_active=True
-        ).aggregate(
-            avg_rating=Avg('rating'),
-            count=Count('id')
-        )
-        
-        self.average_rating = stats['avg_rating'] or 0.00
-        self.total_reviews = stats['count']
-        self.save(update_fields=['average_rating', 'total_reviews', 'updated_at'])
+        rebuild(PROVIDER, self.user_id)
+        self.refresh_from_db(fields=['average_rating', 'total_reviews', 'updated_at'])
 
 
 class EmailOTP(models.Model):
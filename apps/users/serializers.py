@@ -5,9 +5,10 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from users.models import User, UserProfile, ServiceProviderProfile
+from core.serializers import SparseFieldsetMixin
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for user profile"""
     
     class Meta:
@@ -19,7 +20,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class ServiceProviderProfileSerializer(serializers.ModelSerializer):
+class ServiceProviderProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for service provider profile"""
     verification_status_display = serializers.CharField(
         source='get_verification_status_display',
@@ -41,7 +42,7 @@ class ServiceProviderProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Base user serializer"""
     profile = UserProfileSerializer(read_only=True)
     provider_profile = ServiceProviderProfileSerializer(read_only=True)
@@ -61,6 +62,26 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
 
+class PublicUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Public user card for listings anyone can read; no contact details"""
+    avatar = serializers.ImageField(source='profile.avatar', read_only=True)
+    average_rating = serializers.DecimalField(
+        source='provider_profile.average_rating',
+        max_digits=3,
+        decimal_places=2,
+        read_only=True
+    )
+    total_reviews = serializers.IntegerField(source='provider_profile.total_reviews', read_only=True)
+    
+    class Meta:
+        model = User
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'role',
+            'avatar', 'average_rating', 'total_reviews'
+        ]
+        read_only_fields = fields
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(
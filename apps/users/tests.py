@@ -98,4 +98,42 @@ class UserAPITestCase(APITestCase):
             'password': 'wrongpass'
         }
         response = self.client.post(self.login_url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class AdminStatsAPITestCase(APITestCase):
+    """Test admin statistics endpoints"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com',
+            password='adminpass123',
+            first_name='Admin',
+            last_name='User',
+            phone='+1234567891',
+            role=User.UserRole.ADMIN
+        )
+        self.customer = User.objects.create_user(
+            email='customer@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Customer',
+            phone='+1234567892'
+        )
+    
+    def test_cache_stats(self):
+        """Admins get per-tier cache counters"""
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/users/stats/cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, dict)
+        
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/users/stats/cache/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_user_stats(self):
+        """Admins get user counts"""
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/users/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['total_users'], response.data['total_customers']), (2, 1))
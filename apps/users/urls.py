@@ -31,4 +31,5 @@ urlpatterns = [
     
     # Statistics
     path('stats/', views.UserStatsView.as_view(), name='user_stats'),
+    path('stats/cache/', views.CacheStatsView.as_view(), name='cache_stats'),
 ]
\ No newline at end of file
@@ -6,7 +6,6 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
-from django.core.cache import cache
 from datetime import timedelta
 import random
 # OTPVerifipacker andcation
@@ -20,6 +19,8 @@ from users.serializers import (
 )
     # OTPVerificationSerializer
 from users.permissions import IsSuperAdminOrAdmin, IsServiceProvider
+from core.cache import CacheManager
+from core.mixins import EagerLoadingMixin
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -237,7 +238,7 @@ class SendVerificationOTPView(views.APIView):
 #             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProviderListView(generics.ListAPIView):
+class ProviderListView(EagerLoadingMixin, generics.ListAPIView):
     """
     List all service providers (for customers)
     GET /api/users/providers/
@@ -315,53 +316,38 @@ class UserStatsView(views.APIView):
     permission_classes = [IsSuperAdminOrAdmin]
     
     def get(self, request):
-        # Use cache for stats
-        cache_key = 'user_stats'
-        stats = cache.get(cache_key)
-        
-        if not stats:
-            stats = {
-                'total_users': User.objects.count(),
-                'total_customers': User.objects.filter(role='CUSTOMER').count(),
-                'total_providers': User.objects.filter(role='SERVICE_PROVIDER').count(),
-                'verified_providers': User.objects.filter(
-                    role='SERVICE_PROVIDER',
-                    is_verified=True,
-                    provider_profile__verification_status='VERIFIED'
-                ).count(),
-                'pending_verifications': ServiceProviderProfile.objects.filter(
-                    verification_status='PENDING'
-                ).count(),
-            }
-            cache.set(cache_key, stats, 300)  # Cache for 5 minutes
-        
-        return Response(stats).validated_data['email']
-        
-        try:
-            user = User.objects.get(email=email)
-            
-            # Generate OTP
-            otp_code = str(random.randint(100000, 999999))
-            expires_at = timezone.now() + timedelta(minutes=10)
-            
-            OTPVerification.objects.create(
-                user=user,
-                otp_type=OTPVerification.OTPType.PASSWORD_RESET,
-                otp_code=otp_code,
-                expires_at=expires_at
-            )
-            
-            # TODO: Send OTP via email
-            # send_mail(...)
-            
-            return Response({
-                'message': 'Password reset OTP sent to your email'
-            })
-        except User.DoesNotExist:
-            # Don't reveal if email exists
-            return Response({
-                'message': 'If the email exists, an OTP has been sent'
-            })
+        stats = CacheManager.get_or_set(
+            'user_stats',
+            self.compute_stats,
+            300  # Cache for 5 minutes
+        )
+        return Response(stats)
+    
+    def compute_stats(self):
+        return {
+            'total_users': User.objects.count(),
+            'total_customers': User.objects.filter(role='CUSTOMER').count(),
+            'total_providers': User.objects.filter(role='SERVICE_PROVIDER').count(),
+            'verified_providers': User.objects.filter(
+                role='SERVICE_PROVIDER',
+                is_verified=True,
+                provider_profile__verification_status='VERIFIED'
+            ).count(),
+            'pending_verifications': ServiceProviderProfile.objects.filter(
+                verification_status='PENDING'
+            ).count(),
+        }
+
+
+class CacheStatsView(views.APIView):
+    """
+    Get cache hit/miss counters per tier for the serving process (Admin only)
+    GET /api/users/stats/cache/
+    """
+    permission_classes = [IsSuperAdminOrAdmin]
+    
+    def get(self, request):
+        return Response(CacheManager.stats())
 
 
 class PasswordResetConfirmView(views.APIView):
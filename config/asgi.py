@@ -25,4 +25,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 
-application = get_asgi_application()
\ No newline at end of file
+# Sets up Django before anything importing models
+django_application = get_asgi_application()
+
+from notifications.streaming import route  # noqa: E402
+
+application = route(django_application)
@@ -28,11 +28,31 @@ app.conf.beat_schedule = {
         'task': 'bookings.tasks.send_booking_reminders',
         'schedule': crontab(hour=8, minute=0),  # Every day at 8 AM
     },
+    # Deliver queued notifications
+    'dispatch-notification-outbox': {
+        'task': 'notifications.tasks.dispatch_outbox',
+        'schedule': 10.0,  # Every 10 seconds
+    },
+    # Complete bookings left in progress
+    'auto-complete-bookings': {
+        'task': 'bookings.tasks.auto_complete_bookings',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
+    # Verify rating aggregates before the statistics job reads them
+    'reconcile-ratings': {
+        'task': 'reviews.tasks.reconcile_ratings',
+        'schedule': crontab(hour=1, minute=30),  # Every day at 1:30 AM
+    },
     # Update service statistics
     'update-service-stats': {
         'task': 'services.tasks.update_service_statistics',
         'schedule': crontab(hour=2, minute=0),  # Every day at 2 AM
     },
+    # Flush buffered service view counts
+    'flush-service-view-counts': {
+        'task': 'services.tasks.flush_service_view_counts',
+        'schedule': 30.0,  # Every 30 seconds
+    },
 }
 
 @app.task(bind=True)
@@ -166,6 +166,19 @@ CACHES = {
     }
 }
 
+# In-process L1 cache in front of Redis for core.cache.CacheManager entries
+CACHE_L1_ENABLED = True
+CACHE_L1_MAX_BYTES = 32 * 1024 * 1024
+CACHE_L1_MAX_ENTRIES = 10000
+CACHE_L1_TIMEOUT = 30  # Upper bound on staleness if an invalidation is lost
+CACHE_INVALIDATION_CHANNEL = 'marketplace:cache:invalidate'
+
+# Real-time push (notifications.push); events cross processes over Redis pub/sub
+PUSH_REDIS_URL = config('PUSH_REDIS_URL', default=REDIS_URL)
+PUSH_HEARTBEAT = 15  # Seconds between keep-alive comments on idle streams
+PUSH_QUEUE_SIZE = 100  # Events buffered per stream before it is closed
+PUSH_REPLAY_LIMIT = 100  # Missed events replayed on reconnect before a reset
+
 # Session Configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -182,6 +195,10 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_WORKER_PREFETCH_MULTIPLIER = 4
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 
+# Write-behind view counter (see services.counters)
+VIEW_COUNT_BUFFER_MAX_KEYS = 10000
+VIEW_COUNT_FLUSH_INTERVAL = 30  # seconds
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -198,10 +215,10 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'core.parsers.FastJSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
@@ -304,6 +321,14 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Service Marketplace <noreply@marketplace.com>')
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
 
+# Pooled SMTP backend (core.mail.PooledEmailBackend)
+EMAIL_POOL_SIZE = config('EMAIL_POOL_SIZE', default=4, cast=int)
+EMAIL_POOL_MAX_IDLE = config('EMAIL_POOL_MAX_IDLE', default=30, cast=int)  # Seconds before a NOOP check
+EMAIL_MAX_MESSAGES_PER_CONNECTION = config('EMAIL_MAX_MESSAGES_PER_CONNECTION', default=100, cast=int)
+# Messages/second, 0 = unlimited. Shared by all workers through Redis when the
+# default cache is django-redis; otherwise each process gets the full rate
+EMAIL_RATE_LIMIT = config('EMAIL_RATE_LIMIT', default=0, cast=float)
+
 # Email rate limiting
 EMAIL_RATE_LIMIT_PER_HOUR = 3  # Max OTP emails per hour per user
 
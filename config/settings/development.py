@@ -52,6 +52,9 @@ CACHES = {
     }
 }
 
+# Push events stay in this process
+PUSH_REDIS_URL = None
+
 # CORS - Allow all origins in development
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -70,12 +70,13 @@ if USE_S3:
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/media/'
 
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'core.mail.PooledEmailBackend'
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
+EMAIL_RATE_LIMIT = config('EMAIL_RATE_LIMIT', default=10, cast=float)
 
 # Sentry Error Tracking
 SENTRY_DSN = config('SENTRY_DSN', default='')
@@ -178,6 +179,9 @@ CACHES = {
     }
 }
 
+# Push events fan out across ASGI workers over the cache Redis
+PUSH_REDIS_URL = config('PUSH_REDIS_URL', default=CACHES['default']['LOCATION'])
+
 # Celery settings
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://redis:6379/0')
 CELERY_RESULT_BACKEND = 'django-db'
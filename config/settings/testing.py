@@ -29,6 +29,8 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
     }
 }
+CACHE_L1_ENABLED = False
+PUSH_REDIS_URL = None
 
 # Use console email backend
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
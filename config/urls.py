@@ -20,6 +20,7 @@ urlpatterns = [
     path('api/services/', include('services.urls')),
     path('api/bookings/', include('bookings.urls')),
     path('api/reviews/', include('reviews.urls')),
+    path('api/notifications/', include('notifications.urls')),
 ]
 
 # Serve media files in development
@@ -1,11 +1,44 @@
 """
 Cache utilities and decorators
 """
+from collections import namedtuple
 from functools import wraps
+from urllib.parse import urlencode
 from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 import hashlib
 import json
+import logging
+import math
+import random
+import time
+import uuid
+
+from core.tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Cached value plus the metadata needed for soft expiry
+# soft_expires: epoch seconds after which the value is stale but servable
+# delta: seconds the last recomputation took (drives early expiration)
+# tags: {tag: version} at compute time; any bumped tag invalidates the entry
+CacheEntry = namedtuple('CacheEntry', ['value', 'soft_expires', 'delta', 'tags'], defaults=(None,))
+
+DEFAULT_STALE_TTL = 300
+DEFAULT_LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+TAG_KEY_PREFIX = 'cache_tag'
+
+# Rendered response body and what is needed to replay or validate it
+CachedResponse = namedtuple(
+    'CachedResponse',
+    ['content', 'status_code', 'content_type', 'etag', 'vary', 'metadata']
+)
+
+# Query parameters that never change a response
+IGNORED_QUERY_PARAMS = frozenset(['utm_source', 'utm_medium', 'utm_campaign', '_'])
 
 
 def cache_key_generator(*args, **kwargs):
@@ -16,42 +49,225 @@ def cache_key_generator(*args, **kwargs):
     return hashlib.md5(key_data.encode()).hexdigest()
 
 
-def cached_view(timeout=300, key_prefix='view'):
+class UncacheableResponse(Exception):
+    """
+    Raised while rendering to hand back a response that must not be cached
+    """
+    
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def normalize_query_string(query_dict):
+    """
+    Sorted query string without blank or ignored parameters, so equivalent
+    requests share a cache entry
+    """
+    items = sorted(
+        (key, value)
+        for key in query_dict
+        if key not in IGNORED_QUERY_PARAMS
+        for value in query_dict.getlist(key)
+        if value != ''
+    )
+    return urlencode(items)
+
+
+def response_cache_key(request, key_prefix, vary_on=(), media_type=None):
+    """
+    Cache key for a response
+
+    Always varies on host, path, normalized query and media type. `vary_on`
+    adds 'user', 'role' or 'header:<Name>' rules.
+    """
+    parts = [
+        request.get_host(),
+        request.path,
+        normalize_query_string(request.GET),
+        media_type or request.headers.get('Accept', ''),
+    ]
+    
+    user = getattr(request, 'user', None)
+    for rule in vary_on:
+        if rule == 'user':
+            parts.append(f"user={user.pk if user and user.is_authenticated else ''}")
+        elif rule == 'role':
+            parts.append(f"role={getattr(user, 'role', '') if user and user.is_authenticated else ''}")
+        elif rule.startswith('header:'):
+            name = rule[len('header:'):]
+            parts.append(f"{name.lower()}={request.headers.get(name, '')}")
+        else:
+            raise ValueError(f'Unknown vary rule: {rule}')
+    
+    digest = hashlib.sha256('|'.join(parts).encode()).hexdigest()
+    return f'response:{key_prefix}:{digest}'
+
+
+def vary_headers(vary_on):
     """
-    Decorator to cache view results
+    Vary header values implied by the vary rules
+    """
+    headers = ['Accept']
+    if 'user' in vary_on or 'role' in vary_on:
+        headers.append('Authorization')
+    headers.extend(rule[len('header:'):] for rule in vary_on if rule.startswith('header:'))
+    return headers
+
+
+def etag_matches(request, etag):
+    """
+    Weak comparison of If-None-Match against a strong ETag
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+def cache_response(key, render, timeout=300, tags=None, vary=()):
+    """
+    Rendered response bytes for key, rendering at most once per expiry
+
+    `render` must return a rendered HttpResponse. Only 200 responses without
+    cookies are stored; anything else raises UncacheableResponse carrying
+    the live response. Returns (CachedResponse, rendered response or None
+    on a cache hit).
+    """
+    rendered = []
+    
+    def compute():
+        response = render()
+        if response.status_code != 200 or response.cookies:
+            raise UncacheableResponse(response)
+        rendered.append(response)
+        content = response.content
+        return CachedResponse(
+            content=content,
+            status_code=response.status_code,
+            content_type=response['Content-Type'],
+            etag='"%s"' % hashlib.sha256(content).hexdigest()[:40],
+            vary=list(vary),
+            metadata=getattr(response, 'cache_metadata', None) or {},
+        )
+    
+    cached = CacheManager.get_or_set(key, compute, timeout, tags=tags)
+    return cached, rendered[0] if rendered else None
+
+
+def build_cached_response(request, cached, rendered=None):
+    """
+    Replay a cached response, or 304 if the client already has it
+    The response rendered for this request, if any, is returned as is
+    """
+    if etag_matches(request, cached.etag):
+        response = HttpResponseNotModified()
+    elif rendered is not None:
+        response = rendered
+    else:
+        response = HttpResponse(
+            cached.content,
+            status=cached.status_code,
+            content_type=cached.content_type
+        )
+    response['ETag'] = cached.etag
+    response['X-Cache'] = 'MISS' if rendered is not None else 'HIT'
+    patch_vary_headers(response, cached.vary)
+    return response
+
+
+def cached_view(timeout=300, key_prefix='view', vary_on=(), tags=None):
+    """
+    Decorator to cache rendered view responses with ETag/304 support
     """
     def decorator(func):
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            # Generate cache key
-            cache_key = f"{key_prefix}:{request.path}:{request.GET.urlencode()}"
-            
-            # Try to get from cache
-            cached_data = cache.get(cache_key)
-            if cached_data is not None:
-                return cached_data
+            if request.method not in ('GET', 'HEAD'):
+                return func(request, *args, **kwargs)
             
-            # Execute view
-            response = func(request, *args, **kwargs)
+            def render():
+                response = func(request, *args, **kwargs)
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+                return response
             
-            # Cache the response
-            cache.set(cache_key, response, timeout)
-            
-            return response
+            key = response_cache_key(request, key_prefix, vary_on)
+            try:
+                cached, rendered = cache_response(key, render, timeout, tags, vary_headers(vary_on))
+            except UncacheableResponse as exc:
+                return exc.response
+            return build_cached_response(request, cached, rendered)
         return wrapper
     return decorator
 
 
-def invalidate_cache(key_pattern):
+_tiered_cache = None
+
+
+def get_cache():
+    """
+    Cache holding CacheManager entries and tag versions: the two-tier
+    cache when CACHE_L1_ENABLED, otherwise the Django cache itself
+    """
+    global _tiered_cache
+    if not getattr(settings, 'CACHE_L1_ENABLED', False):
+        return cache
+    if _tiered_cache is None:
+        _tiered_cache = TieredCache.from_settings()
+    return _tiered_cache
+
+
+def tag_key(tag):
+    return f'{TAG_KEY_PREFIX}:{tag}'
+
+
+def tag_versions(tags):
+    """
+    Current version of each tag, as {tag: version}
+
+    Tags are plain strings such as 'service:123', 'provider:45' or the
+    collection tag 'category:*'. Versions live in the cache without expiry;
+    a tag that is unknown or was evicted starts from a fresh time-based
+    version, so entries recorded against an older version never revive.
+    """
+    store = get_cache()
+    keys = {tag_key(tag): tag for tag in tags}
+    found = store.get_many(list(keys))
+    
+    versions = {}
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not store.add(key, version, None):
+                version = store.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every cache entry registered under any of the tags
+    One cache write per tag, regardless of how many entries carry it
+    """
+    store = get_cache()
+    for tag in set(tags):
+        key = tag_key(tag)
+        try:
+            store.incr(key)
+        except ValueError:
+            store.set(key, time.time_ns(), None)
+
+
+def invalidate_cache(*tags):
     """
-    Invalidate cache keys matching pattern
+    Invalidate cache entries by tag
     """
-    # Note: This requires Redis with key pattern support
-    try:
-        cache.delete_pattern(key_pattern)
-    except AttributeError:
-        # If delete_pattern not available, clear all cache
-        cache.clear()
+    invalidate_tags(*tags)
 
 
 class CacheManager:
@@ -60,26 +276,137 @@ class CacheManager:
     """
     
     @staticmethod
-    def get_or_set(key, callback, timeout=300):
+    def get_or_set(key, callback, timeout=300, stale_ttl=DEFAULT_STALE_TTL,
+                   lock_timeout=DEFAULT_LOCK_TIMEOUT, beta=1.0, tags=None):
         """
-        Get from cache or set using callback
+        Get from cache or set using callback, without stampeding
+
+        Values are fresh for `timeout` seconds and then served stale for up
+        to `stale_ttl` more while a single caller refreshes them. Refreshes
+        are single-flight through a short lock; on a cold miss, callers that
+        lose the lock wait for the winner instead of recomputing. Fresh
+        values are also refreshed early with probability rising towards
+        expiry (scaled by `beta` and the last recomputation time), so hot
+        keys rarely go stale at all.
+
+        Entries stored with `tags` are discarded as soon as any of those
+        tags is invalidated (see invalidate_tags).
         """
-        data = cache.get(key)
-        if data is None:
-            data = callback()
-            cache.set(key, data, timeout)
-        return data
+        entry = CacheManager.get_entry(key)
+        
+        now = time.time()
+        if entry is not None:
+            # Probabilistic early expiration (XFetch)
+            jitter = -entry.delta * beta * math.log(random.random() or 1e-12)
+            if now + jitter < entry.soft_expires:
+                return entry.value
+        
+        token = CacheManager.acquire_lock(key, lock_timeout)
+        if token is None:
+            if entry is not None:
+                # Someone else is refreshing; serve what we have
+                return entry.value
+            entry = CacheManager.wait_for(key, lock_timeout)
+            if entry is not None:
+                return entry.value
+            logger.warning('Cache key %s: lock holder did not finish, recomputing', key)
+        
+        try:
+            return CacheManager.refresh(key, callback, timeout, stale_ttl, tags)
+        except Exception:
+            if entry is None:
+                raise
+            logger.exception('Cache key %s: refresh failed, serving stale value', key)
+            return entry.value
+        finally:
+            if token is not None:
+                CacheManager.release_lock(key, token)
+    
+    @staticmethod
+    def get_entry(key):
+        """
+        Cached entry for key, or None if missing or invalidated by a tag
+        """
+        entry = get_cache().get(key)
+        if not isinstance(entry, CacheEntry):
+            return None
+        if entry.tags and tag_versions(entry.tags) != entry.tags:
+            return None
+        return entry
+    
+    @staticmethod
+    def refresh(key, callback, timeout=300, stale_ttl=DEFAULT_STALE_TTL, tags=None):
+        """
+        Recompute a value and store it with soft expiry metadata
+        """
+        # Versions are read before computing so a concurrent invalidation
+        # marks the new entry as already outdated
+        versions = tag_versions(tags) if tags else None
+        started = time.time()
+        value = callback()
+        finished = time.time()
+        
+        get_cache().set(
+            key,
+            CacheEntry(value, finished + timeout, finished - started, versions),
+            timeout + stale_ttl
+        )
+        return value
+    
+    @staticmethod
+    def acquire_lock(key, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        """
+        Try to take the recompute lock for key; returns a token or None
+        """
+        token = uuid.uuid4().hex
+        if cache.add(f'{key}:lock', token, lock_timeout):
+            return token
+        return None
+    
+    @staticmethod
+    def release_lock(key, token):
+        """
+        Release the recompute lock if we still own it
+        """
+        lock_key = f'{key}:lock'
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    
+    @staticmethod
+    def wait_for(key, wait_timeout=DEFAULT_LOCK_TIMEOUT):
+        """
+        Poll for a value another caller is computing
+        """
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = CacheManager.get_entry(key)
+            if entry is not None:
+                return entry
+            if cache.get(f'{key}:lock') is None:
+                break
+        return None
     
     @staticmethod
     def invalidate(key):
         """
         Invalidate specific cache key
         """
-        cache.delete(key)
+        get_cache().delete(key)
+    
+    @staticmethod
+    def invalidate_tags(*tags):
+        """
+        Invalidate cache entries registered under any of the tags
+        """
+        invalidate_tags(*tags)
     
     @staticmethod
-    def invalidate_pattern(pattern):
+    def stats():
         """
-        Invalidate cache keys matching pattern
+        Per-tier hit/miss counters for this process (two-tier cache only)
         """
-        invalidate_cache(pattern)
\ No newline at end of file
+        store = get_cache()
+        if isinstance(store, TieredCache):
+            return store.stats()
+        return {}
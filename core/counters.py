@@ -0,0 +1,236 @@
+"""
+Denormalized counters
+Apply increments as atomic F() deltas, or accumulate hot ones in Redis (or
+in-process) and flush them to the database in batches instead of issuing
+one UPDATE per event
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+
+# Increment unless the hash is full and the key is new; returns 1 if recorded
+_RECORD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 or redis.call('HLEN', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+redis.call('HINCRBY', KEYS[2], 'dropped', ARGV[2])
+return 0
+"""
+
+# Atomically take every pending delta
+_DRAIN_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return items
+"""
+
+
+def apply_deltas(target, field, deltas, key='pk', floor=0, **values):
+    """
+    Add {key value: delta} to an integer column of a model or queryset
+
+    The database does the arithmetic, so concurrent writers never lose
+    increments the way a read-modify-write save() does. Rows sharing a
+    delta share one UPDATE. Decrements are clamped at `floor` (None for
+    no clamp); `values` are set on the same rows. Returns rows updated.
+    """
+    queryset = getattr(target, '_default_manager', target)
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+
+    updated = 0
+    for delta, keys in by_delta.items():
+        expression = F(field) + delta
+        if delta < 0 and floor is not None:
+            expression = Greatest(expression, Value(floor))
+        updated += queryset.filter(**{f'{key}__in': keys}).update(**{field: expression}, **values)
+    return updated
+
+
+def get_redis_client():
+    """
+    Raw Redis client behind the default cache, or None if the cache
+    backend is not django-redis
+    """
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class BufferedCounter:
+    """
+    Bounded buffer of per-key integer deltas with periodic batched flushes
+
+    `apply` receives a {key: delta} dict (keys as strings) and must
+    persist it in one batch. With Redis, deltas are shared by all processes and flushed by the
+    Celery beat task; otherwise each process keeps its own buffer and
+    flushes inline once `flush_interval` seconds have passed.
+
+    Increments for new keys are dropped once `max_keys` keys are pending,
+    so memory stays bounded; drops and failed flushes are counted in
+    stats() rather than silently lost.
+    """
+
+    def __init__(self, name, apply, max_keys=10000, flush_interval=30):
+        self.name = name
+        self.apply = apply
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._stats = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._redis = None
+        self._redis_checked = False
+
+    @property
+    def pending_key(self):
+        return cache.make_key(f'counter:{self.name}:pending')
+
+    @property
+    def stats_key(self):
+        return cache.make_key(f'counter:{self.name}:stats')
+
+    def get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client()
+            self._redis_checked = True
+        return self._redis
+
+    def record(self, key, amount=1):
+        """
+        Buffer an increment; never raises
+        """
+        redis = self.get_redis()
+        if redis is not None:
+            try:
+                redis.eval(
+                    _RECORD_SCRIPT, 2, self.pending_key, self.stats_key,
+                    key, amount, self.max_keys
+                )
+                return
+            except Exception:
+                logger.warning('Counter %s: Redis unavailable, buffering locally', self.name)
+
+        with self._lock:
+            if key in self._pending or len(self._pending) < self.max_keys:
+                self._pending[key] += amount
+            else:
+                self._stats['dropped'] += amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def drain(self):
+        """
+        Remove and return all pending deltas as {key: delta}
+        """
+        deltas = {}
+        redis = self.get_redis()
+        if redis is not None:
+            items = redis.eval(_DRAIN_SCRIPT, 1, self.pending_key)
+            for raw_key, raw_value in zip(items[::2], items[1::2]):
+                key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+                deltas[key] = int(raw_value)
+
+        with self._lock:
+            for key, delta in self._pending.items():
+                key = str(key)
+                deltas[key] = deltas.get(key, 0) + delta
+            self._pending.clear()
+            self._last_flush = time.monotonic()
+
+        return deltas
+
+    def restore(self, deltas):
+        """
+        Put deltas back after a failed flush; anything that cannot be
+        re-buffered is accounted as lost
+
+        With Redis they go back into the shared hash, so whichever process
+        flushes next applies them.
+        """
+        redis = self.get_redis()
+        if redis is not None:
+            try:
+                pipeline = redis.pipeline(transaction=False)
+                for key, delta in deltas.items():
+                    pipeline.hincrby(self.pending_key, key, delta)
+                pipeline.execute()
+                return
+            except Exception:
+                logger.warning('Counter %s: Redis unavailable, restoring locally', self.name)
+
+        lost = 0
+        for key, delta in deltas.items():
+            with self._lock:
+                if key in self._pending or len(self._pending) < self.max_keys:
+                    self._pending[key] += delta
+                    continue
+            lost += delta
+
+        if lost:
+            with self._lock:
+                self._stats['lost'] += lost
+
+    def flush(self):
+        """
+        Apply all pending deltas in one batch; returns the number of keys
+        """
+        try:
+            deltas = self.drain()
+        except Exception:
+            logger.exception('Counter %s: could not drain buffer', self.name)
+            return 0
+
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+
+        try:
+            self.apply(deltas)
+        except Exception:
+            logger.exception('Counter %s: flush of %s keys failed', self.name, len(deltas))
+            self.restore(deltas)
+            with self._lock:
+                self._stats['failed_flushes'] += 1
+            return 0
+
+        with self._lock:
+            self._stats['flushed'] += sum(deltas.values())
+            self._stats['flushes'] += 1
+        return len(deltas)
+
+    def stats(self):
+        """
+        Loss and throughput accounting for this process (plus shared
+        Redis drop counts when available)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_local'] = len(self._pending)
+
+        redis = self.get_redis()
+        if redis is not None:
+            try:
+                shared = redis.hgetall(self.stats_key)
+                stats['dropped_shared'] = int(shared.get(b'dropped', 0))
+                stats['pending_shared'] = redis.hlen(self.pending_key)
+            except Exception:
+                pass
+        return stats
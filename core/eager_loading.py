@@ -0,0 +1,336 @@
+"""
+Eager loading planner
+Derives select_related/prefetch_related/only() for a queryset from the
+fields and source paths a serializer will read
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+# Nested serializers deeper than this are left to lazy loading
+MAX_DEPTH = 6
+
+
+def get_relation(model, attr):
+    """
+    Model field (or reverse relation) reachable as `attr` on instances, or None
+    """
+    try:
+        field = model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        field = None
+
+    if field is not None and (not field.auto_created or field.concrete):
+        return field
+    # Reverse relations are reached through their accessor name
+    for relation in model._meta.related_objects:
+        if relation.get_accessor_name() == attr:
+            return relation
+    return None
+
+
+def is_single_relation(field):
+    return field is not None and field.is_relation and field.related_model is not None and (
+        field.many_to_one or field.one_to_one
+    )
+
+
+def is_many_relation(field):
+    return field is not None and field.is_relation and field.related_model is not None and (
+        field.one_to_many or field.many_to_many
+    )
+
+
+def lookup_name(lookup):
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+class LoadNode:
+    """
+    What the serializer tree reads from one model
+
+    `columns` is None when the whole row is needed: properties, methods and
+    SerializerMethodFields may read any column.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = set()
+        self.selected = {}  # relation name -> LoadNode loaded with a join
+        self.prefetched = {}  # relation name -> LoadNode loaded with a query
+
+    def load_all(self):
+        self.columns = None
+
+    def add_column(self, name):
+        if self.columns is not None:
+            self.columns.add(name)
+
+    def join(self, name):
+        """
+        Child node for a single-valued relation, or None if `name` is not one
+        """
+        if name in self.selected:
+            return self.selected[name]
+
+        field = get_relation(self.model, name)
+        if not is_single_relation(field):
+            return None
+
+        child = LoadNode(field.related_model)
+        if field.concrete:
+            self.add_column(name)
+        else:
+            # Reverse one-to-one: the child row carries the key
+            child.add_column(field.field.name)
+        self.selected[name] = child
+        return child
+
+    def prefetch(self, name):
+        """
+        Child node for a multi-valued relation, or None if `name` is not one
+        """
+        if name in self.prefetched:
+            return self.prefetched[name]
+
+        field = get_relation(self.model, name)
+        if not is_many_relation(field):
+            return None
+
+        child = LoadNode(field.related_model)
+        self.prefetched[name] = child
+        return child
+
+    def all_columns(self):
+        return [field.name for field in self.model._meta.concrete_fields]
+
+    def only_columns(self, prefix=''):
+        """
+        only() names for this node and its joined children
+        """
+        if self.columns is None:
+            names = self.all_columns()
+        else:
+            names = sorted(self.columns | {self.model._meta.pk.name})
+
+        columns = [prefix + name for name in names]
+        for name, child in self.selected.items():
+            columns.extend(child.only_columns(f'{prefix}{name}__'))
+        return columns
+
+    def is_restricted(self):
+        if self.columns is None:
+            return any(child.is_restricted() for child in self.selected.values())
+        return True
+
+
+class EagerLoadingPlan:
+    """
+    Joins, prefetches and columns needed to serialize a model instance
+
+    Built by walking the serializer's readable fields and their `source`
+    paths: nested serializers and dotted sources over foreign keys and
+    one-to-ones become select_related, `many=True` serializers and
+    many-valued relations become prefetch_related (with the nested plan in a
+    Prefetch queryset), and model fields read directly become the only()
+    column list. `get_<field>_display` sources count as reading the field.
+
+    SerializerMethodFields can read anything, so they load the whole row
+    unless the serializer's Meta declares what they read, as dotted paths:
+
+        eager_loading = {'has_response': ['response']}
+    """
+
+    def __init__(self, serializer, model=None):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        model = model or serializer.Meta.model
+        self.root = LoadNode(model)
+        self.visit_serializer(self.root, serializer, 0)
+
+    def visit_serializer(self, node, serializer, depth):
+        if depth > MAX_DEPTH:
+            node.load_all()
+            return
+        for field in serializer.fields.values():
+            if not field.write_only:
+                self.visit_field(node, field, depth)
+        # Attributes read outside the fields (e.g. cache versions)
+        if hasattr(serializer, 'get_eager_loading_paths'):
+            for path in serializer.get_eager_loading_paths():
+                self.visit_path(node, path.split('.'))
+
+    def visit_field(self, node, field, depth):
+        if isinstance(field, serializers.SerializerMethodField):
+            hints = getattr(getattr(field.parent, 'Meta', None), 'eager_loading', {})
+            if field.field_name not in hints:
+                node.load_all()
+            for path in hints.get(field.field_name, ()):
+                self.visit_path(node, path.split('.'))
+            return
+        if field.source == '*':
+            if isinstance(field, serializers.Serializer):
+                self.visit_serializer(node, field, depth + 1)
+            else:
+                node.load_all()
+            return
+
+        *path, attr = field.source_attrs
+        for name in path:
+            child = node.join(name)
+            if child is None:
+                node.load_all()
+                return
+            node = child
+
+        if isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+            child = node.prefetch(attr)
+            if child is None:
+                node.load_all()
+            elif isinstance(field, serializers.ListSerializer):
+                self.visit_serializer(child, field.child, depth + 1)
+            return
+
+        if isinstance(field, serializers.BaseSerializer):
+            child = node.join(attr)
+            if child is None:
+                node.load_all()
+            else:
+                self.visit_serializer(child, field, depth + 1)
+            return
+
+        relation = get_relation(node.model, attr)
+        if isinstance(field, RelatedField) and is_single_relation(relation):
+            if relation.concrete and field.use_pk_only_optimization():
+                node.add_column(attr)
+            else:
+                node.join(attr).load_all()
+            return
+
+        if relation is not None and relation.concrete and not relation.many_to_many:
+            node.add_column(attr)
+            return
+
+        display = self.display_field(node.model, attr)
+        if display is not None:
+            node.add_column(display)
+            return
+
+        # Property, method or annotation
+        node.load_all()
+
+    def visit_path(self, node, attrs):
+        """
+        Load a dotted path a SerializerMethodField declared it reads
+        """
+        *path, attr = attrs
+        for name in path:
+            child = node.join(name)
+            if child is None:
+                node.load_all()
+                return
+            node = child
+
+        relation = get_relation(node.model, attr)
+        if is_single_relation(relation):
+            node.join(attr).load_all()
+        elif is_many_relation(relation):
+            node.prefetch(attr)
+        elif relation is not None and relation.concrete:
+            node.add_column(attr)
+        else:
+            node.load_all()
+
+    def display_field(self, model, attr):
+        if not (attr.startswith('get_') and attr.endswith('_display')):
+            return None
+        field = get_relation(model, attr[len('get_'):-len('_display')])
+        if field is not None and field.concrete and getattr(field, 'choices', None):
+            return field.name
+        return None
+
+    def select_related(self, node=None, prefix=''):
+        node = node or self.root
+        paths = []
+        for name, child in node.selected.items():
+            paths.append(prefix + name)
+            paths.extend(self.select_related(child, f'{prefix}{name}__'))
+        return paths
+
+    def prefetch_related(self, node=None, prefix=''):
+        node = node or self.root
+        lookups = []
+        for name, child in node.selected.items():
+            lookups.extend(self.prefetch_related(child, f'{prefix}{name}__'))
+        for name, child in node.prefetched.items():
+            if child.selected or child.prefetched:
+                queryset = self.apply_to(child, child.model._default_manager.all())
+                lookups.append(Prefetch(prefix + name, queryset=queryset))
+            else:
+                lookups.append(prefix + name)
+        return lookups
+
+    def apply_to(self, node, queryset):
+        select = self.select_related(node)
+        if select:
+            queryset = queryset.select_related(*select)
+
+        seen = {lookup_name(lookup) for lookup in queryset._prefetch_related_lookups}
+        prefetch = [
+            lookup for lookup in self.prefetch_related(node)
+            if lookup_name(lookup) not in seen
+        ]
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def apply(self, queryset, restrict_fields=False, extra_columns=()):
+        """
+        Add the plan's joins and prefetches to queryset
+
+        With `restrict_fields` the plan replaces the queryset's own
+        select_related/prefetch_related, and only the columns the serializer
+        reads (plus `extra_columns` and plain ordering fields) are loaded.
+        Only use it where instances are not saved afterwards. Querysets that
+        already use only()/defer(), values() or a bare select_related() are
+        not restricted.
+        """
+        if not restrict_fields or not self.can_restrict(queryset):
+            return self.apply_to(self.root, queryset)
+
+        queryset = self.apply_to(
+            self.root, queryset.select_related(None).prefetch_related(None)
+        )
+        ordering = queryset.query.order_by
+        if not ordering and queryset.query.default_ordering:
+            ordering = queryset.model._meta.ordering
+        for name in [*ordering, *extra_columns]:
+            if isinstance(name, str):
+                name = name.lstrip('-')
+                relation = get_relation(self.root.model, name)
+                if relation is not None and relation.concrete:
+                    self.root.add_column(name)
+
+        if not self.root.is_restricted():
+            return queryset
+        return queryset.only(*self.root.only_columns())
+
+    @staticmethod
+    def can_restrict(queryset):
+        deferred, _ = queryset.query.deferred_loading
+        return (
+            not deferred
+            and queryset._fields is None
+            and queryset.query.select_related is not True
+        )
+
+
+def eager_load(queryset, serializer, restrict_fields=False, extra_columns=()):
+    """
+    Apply the eager loading plan of a serializer (class or instance)
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    plan = EagerLoadingPlan(serializer, queryset.model)
+    return plan.apply(queryset, restrict_fields, extra_columns)
@@ -0,0 +1,109 @@
+"""
+Fake SMTP server
+Accepts and records messages on a local port so email code can be tested
+and benchmarked against a real socket without a mail provider
+"""
+import socketserver
+import threading
+import time
+from collections import namedtuple
+
+ReceivedMessage = namedtuple('ReceivedMessage', ['sender', 'recipients', 'data'])
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP dialogue: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT
+    """
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        # Stand-in for TCP/TLS setup and login on a real provider
+        if server.connect_latency:
+            time.sleep(server.connect_latency)
+        self.reply('220 fake-smtp ready')
+
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-fake-smtp')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 fake-smtp')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append(ReceivedMessage(sender, recipients, b''.join(data)))
+                sender, recipients = None, []
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Threaded fake SMTP server; use as a context manager
+
+        with FakeSMTPServer() as server:
+            ... send to ('127.0.0.1', server.port) ...
+        server.messages, server.connections
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, connect_latency=0):
+        super().__init__((host, port), FakeSMTPHandler)
+        self.connect_latency = connect_latency
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.thread = None
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,180 @@
+"""
+Geospatial helpers for proximity searches
+Geohash cell encoding plus a batched Haversine pass over candidate points
+"""
+from math import radians, cos, sin, asin, sqrt
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+# Precision stored on index rows (~150m cells); coarser cells are prefixes
+GEOHASH_PRECISION = 7
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_MAP = {char: index for index, char in enumerate(_BASE32)}
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode a coordinate into a geohash string
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    """
+    Decode a geohash into its (min_lat, min_lon, max_lat, max_lon) cell
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _BASE32_MAP[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def cell_size_km(precision, latitude=0.0):
+    """
+    Approximate (height, width) of a geohash cell in kilometers
+    """
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lon_bits = total_bits - lat_bits
+
+    height = (180.0 / (1 << lat_bits)) * KM_PER_DEGREE
+    width = (360.0 / (1 << lon_bits)) * KM_PER_DEGREE * cos(radians(float(latitude)))
+    return height, width
+
+
+def precision_for_radius(radius_km, latitude=0.0):
+    """
+    Finest precision whose cells are at least radius_km on each side,
+    so a 3x3 block of cells always covers the search circle
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size_km(precision, latitude)
+        if min(height, width) >= radius_km:
+            return precision
+    return 1
+
+
+def geohash_neighbors(geohash):
+    """
+    Return the cell itself plus its (up to) eight surrounding cells
+    """
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    lat_step = max_lat - min_lat
+    lon_step = max_lon - min_lon
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+    precision = len(geohash)
+
+    cells = []
+    for d_lat in (-1, 0, 1):
+        lat = center_lat + d_lat * lat_step
+        if lat < -90 or lat > 90:
+            continue
+        for d_lon in (-1, 0, 1):
+            lon = center_lon + d_lon * lon_step
+            # Wrap around the antimeridian
+            lon = ((lon + 180) % 360) - 180
+            cell = geohash_encode(lat, lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose union covers a circle of radius_km
+    """
+    precision = precision_for_radius(radius_km, latitude)
+    return geohash_neighbors(geohash_encode(latitude, longitude, precision))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Lat/lon bounding box around a point: (min_lat, min_lon, max_lat, max_lon)
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_scale = cos(radians(latitude)) or 1e-12
+    lon_delta = radius_km / (KM_PER_DEGREE * lon_scale)
+    return (
+        latitude - lat_delta,
+        longitude - lon_delta,
+        latitude + lat_delta,
+        longitude + lon_delta,
+    )
+
+
+def haversine_many(latitude, longitude, points):
+    """
+    Distances in kilometers from one origin to many (lat, lon) points
+
+    Origin terms are computed once and the loop only touches locals,
+    which keeps the pass cheap for a few thousand candidates.
+    """
+    origin_lat = radians(float(latitude))
+    origin_lon = radians(float(longitude))
+    origin_cos = cos(origin_lat)
+    diameter = 2 * EARTH_RADIUS_KM
+    _radians, _sin, _cos, _asin, _sqrt = radians, sin, cos, asin, sqrt
+
+    distances = []
+    append = distances.append
+    for point_lat, point_lon in points:
+        lat = _radians(float(point_lat))
+        half_dlat = _sin((lat - origin_lat) / 2)
+        half_dlon = _sin((_radians(float(point_lon)) - origin_lon) / 2)
+        a = half_dlat * half_dlat + origin_cos * _cos(lat) * half_dlon * half_dlon
+        append(diameter * _asin(_sqrt(min(1.0, a))))
+    return distances
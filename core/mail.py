@@ -0,0 +1,298 @@
+"""
+Pooled SMTP email backend
+Keeps SMTP connections open between sends so many messages share one
+TCP/TLS handshake and login, recycles them after a message limit and paces
+sends to stay under the mail provider's quota
+"""
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+
+from core.counters import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+# GCRA token bucket: reserve the next send slot, returning microseconds to
+# wait for it. The key holds the theoretical arrival time of the next send
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local interval = tonumber(ARGV[1])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + interval
+redis.call('SET', KEYS[1], string.format('%.0f', tat), 'PX', math.ceil((tat - now) / 1000) + 1000)
+return math.max(tat - now - tonumber(ARGV[2]) * interval, 0)
+"""
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` messages per second with bursts of `burst`
+
+    The bucket lives in this process; SharedRateLimiter spreads one limit
+    across processes.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class SharedRateLimiter:
+    """
+    Token bucket shared through Redis by every process sending as one
+    account, so N workers together stay under `rate` messages per second
+
+    Each acquire() is one script call that reserves a send slot. Should
+    Redis be unreachable, sends fall back to a per-process bucket.
+    """
+
+    def __init__(self, key, rate, burst=None, client=None, sleep=time.sleep):
+        self.key = key
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.client = client
+        self.sleep = sleep
+        self.fallback = RateLimiter(rate, burst, sleep=sleep)
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available
+        """
+        try:
+            wait = self.client.eval(
+                _ACQUIRE_SCRIPT, 1, self.key, int(1000000 / self.rate), self.burst
+            ) / 1000000
+        except Exception:
+            logger.warning('Email rate limit: Redis unavailable, limiting per process')
+            return self.fallback.acquire()
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class ConnectionPool:
+    """
+    Idle SMTP connections for one server and account
+    """
+
+    def __init__(self, size, max_idle):
+        self.size = size
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        (connection, messages sent on it) for a live idle connection, or None
+        """
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, sent, released = self.idle.pop()
+            idle_for = time.monotonic() - released
+            if idle_for < self.max_idle:
+                return connection, sent
+            # The server may have dropped it; check before reuse
+            try:
+                if connection.noop()[0] == 250:
+                    return connection, sent
+            except (smtplib.SMTPException, OSError):
+                pass
+            close_quietly(connection)
+
+    def release(self, connection, sent):
+        """
+        Keep a connection for reuse; returns False if the pool is full
+        """
+        with self.lock:
+            if len(self.idle) >= self.size:
+                return False
+            self.idle.append((connection, sent, time.monotonic()))
+            return True
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _, _ in idle:
+            close_quietly(connection)
+
+
+def close_quietly(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+_pools = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def close_pools():
+    """
+    Close every idle pooled connection in this process
+    """
+    with _registry_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _limiters.clear()
+    for pool in pools:
+        pool.clear()
+
+
+class PooledEmailBackend(SMTPEmailBackend):
+    """
+    SMTP backend that returns connections to a process-wide pool on close()
+
+    Settings:
+        EMAIL_POOL_SIZE: idle connections kept per server and account
+        EMAIL_POOL_MAX_IDLE: seconds an idle connection is reused without
+            a NOOP check
+        EMAIL_MAX_MESSAGES_PER_CONNECTION: messages sent before a
+            connection is replaced, as many providers cap this
+        EMAIL_RATE_LIMIT: messages per second (0 for no limit), shared by
+            all processes when the cache is Redis, else per process
+    """
+
+    def __init__(self, pool_size=None, max_idle=None, max_messages_per_connection=None,
+                 rate_limit=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_size = settings.EMAIL_POOL_SIZE if pool_size is None else pool_size
+        self.max_idle = settings.EMAIL_POOL_MAX_IDLE if max_idle is None else max_idle
+        self.max_messages_per_connection = (
+            settings.EMAIL_MAX_MESSAGES_PER_CONNECTION
+            if max_messages_per_connection is None else max_messages_per_connection
+        )
+        self.rate_limit = settings.EMAIL_RATE_LIMIT if rate_limit is None else rate_limit
+        self.sent_on_connection = 0
+        self.broken = False
+
+    @property
+    def pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    @property
+    def pool(self):
+        with _registry_lock:
+            if self.pool_key not in _pools:
+                _pools[self.pool_key] = ConnectionPool(self.pool_size, self.max_idle)
+            return _pools[self.pool_key]
+
+    @property
+    def rate_limiter(self):
+        if not self.rate_limit:
+            return None
+        with _registry_lock:
+            if self.pool_key not in _limiters:
+                _limiters[self.pool_key] = self.make_rate_limiter()
+            return _limiters[self.pool_key]
+
+    def make_rate_limiter(self):
+        client = get_redis_client()
+        if client is None:
+            return RateLimiter(self.rate_limit)
+        # The quota belongs to the account, whichever worker sends
+        key = cache.make_key(f'mail:rate:{self.host}:{self.port}:{self.username}')
+        return SharedRateLimiter(key, self.rate_limit, client=client)
+
+    def open(self):
+        if self.connection:
+            return False
+        pooled = self.pool.acquire()
+        if pooled is not None:
+            self.connection, self.sent_on_connection = pooled
+            self.broken = False
+            return True
+        self.sent_on_connection = 0
+        self.broken = False
+        return super().open()
+
+    def close(self):
+        """
+        Return the connection to the pool unless it failed or is used up
+        """
+        if self.connection is None:
+            return
+        reusable = (
+            not self.broken
+            and self.sent_on_connection < self.max_messages_per_connection
+        )
+        if reusable and self.pool.release(self.connection, self.sent_on_connection):
+            self.connection = None
+            return
+        super().close()
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        with self._lock:
+            new_conn_created = self.open()
+            if not self.connection or new_conn_created is None:
+                return 0
+            num_sent = 0
+            try:
+                for message in email_messages:
+                    if self.sent_on_connection >= self.max_messages_per_connection:
+                        # Replace the used-up connection mid-batch
+                        super().close()
+                        if self.open() is None or not self.connection:
+                            break
+                    limiter = self.rate_limiter
+                    if limiter is not None:
+                        limiter.acquire()
+                    if self._send(message):
+                        num_sent += 1
+            finally:
+                if new_conn_created:
+                    self.close()
+        return num_sent
+
+    def _send(self, email_message):
+        if not email_message.recipients():
+            return False
+        self.sent_on_connection += 1
+        try:
+            sent = super()._send(email_message)
+        except Exception:
+            self.broken = True
+            raise
+        if not sent:
+            # Failed silently; the connection may be unusable
+            self.broken = True
+        return sent
+
+
+def send_batch(messages, fail_silently=False, connection=None):
+    """
+    Send EmailMessages over one connection; returns how many were sent
+    """
+    connection = connection or get_connection(fail_silently=fail_silently)
+    return connection.send_messages(list(messages))
@@ -0,0 +1,87 @@
+"""
+Reusable view mixins
+"""
+from django.db.models import QuerySet
+from rest_framework.permissions import SAFE_METHODS
+
+from core.cache import (
+    UncacheableResponse, build_cached_response, cache_response,
+    response_cache_key, vary_headers
+)
+from core.eager_loading import eager_load
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from the byte-level response cache
+
+    Responses are cached as rendered bytes with a strong ETag, so repeat
+    requests skip serialization and If-None-Match is answered with 304
+    straight from the cache. Set `cache_vary_on` to ('user',), ('role',) or
+    ('header:<Name>',) rules when the body depends on them, and return
+    invalidation tags from get_cache_tags().
+    """
+    cache_timeout = 60
+    cache_key_prefix = None
+    cache_vary_on = ()
+    cache_tags = ()
+
+    def get_cache_tags(self):
+        return list(self.cache_tags)
+
+    def get_response_cache_key(self, request):
+        return response_cache_key(
+            request,
+            self.cache_key_prefix or type(self).__name__,
+            self.cache_vary_on,
+            media_type=getattr(request, 'accepted_media_type', None)
+        )
+
+    def cached_response_hit(self, request, cached):
+        """
+        Hook for side effects that must run even when the view is skipped
+        """
+
+    def get(self, request, *args, **kwargs):
+        def render():
+            response = super(CachedResponseMixin, self).get(request, *args, **kwargs)
+            response = self.finalize_response(request, response, *args, **kwargs)
+            return response.render()
+
+        try:
+            cached, rendered = cache_response(
+                self.get_response_cache_key(request),
+                render,
+                self.cache_timeout,
+                self.get_cache_tags(),
+                vary_headers(self.cache_vary_on)
+            )
+        except UncacheableResponse as exc:
+            return exc.response
+
+        if rendered is None:
+            self.cached_response_hit(request, cached)
+        return build_cached_response(request, cached, rendered)
+
+
+class EagerLoadingMixin:
+    """
+    Eager-load whatever the view's serializer reads
+
+    The serializer's eager loading plan (see core.eager_loading) is applied
+    in filter_queryset, so it covers list() and get_object() whatever
+    get_queryset() returns. Read-only requests also load only the columns
+    the serializer needs; writes load whole rows so saves stay complete.
+    """
+    eager_loading = True
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.eager_loading or not isinstance(queryset, QuerySet):
+            return queryset
+        return eager_load(
+            queryset,
+            self.get_serializer(),
+            restrict_fields=self.request.method in SAFE_METHODS,
+            extra_columns=getattr(self, 'cursor_ordering', ())
+        )
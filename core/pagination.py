@@ -1,8 +1,21 @@
 """
 Custom pagination classes
 """
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.core.exceptions import (
+    FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+)
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -40,4 +53,208 @@ class StandardResultsSetPagination(PageNumberPagination):
     """
     page_size = 20
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination without COUNT(*) or OFFSET
+    
+    Pages are addressed by an opaque cursor holding the ordering values of
+    the boundary row, so every page is a bounded index range scan. The
+    ordering is taken from the queryset (falling back to the view's
+    `cursor_ordering`), and `id` is appended as a tie-breaker.
+    
+    A capped total is available with `?with_count=true`, and legacy
+    `?page=N` requests are still served by CustomPagination.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    max_count = 1000
+    legacy_page_query_param = 'page'
+    default_ordering = ('-created_at',)
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        
+        if self.legacy_page_query_param and request.query_params.get(self.legacy_page_query_param):
+            self.legacy = CustomPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+        
+        self.limit = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset, view)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request)
+        
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() == 'true':
+            self.count = self.get_approximate_count(queryset)
+        
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        
+        if reverse:
+            rows.reverse()
+            self.has_previous = has_more
+            self.has_next = position is not None
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        
+        self.page = rows
+        return rows
+    
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'page_size': self.limit,
+        }
+        if self.count is not None:
+            payload['count'], payload['count_is_approximate'] = self.count
+        payload['results'] = data
+        return Response(payload)
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'count': {'type': 'integer'},
+                'count_is_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+    
+    def get_ordering(self, queryset, view):
+        ordering = list(queryset.query.order_by)
+        if not ordering:
+            ordering = list(getattr(view, 'cursor_ordering', None) or self.default_ordering)
+        
+        for field in ordering:
+            if not isinstance(field, str):
+                raise ImproperlyConfigured(
+                    'KeysetPagination only supports field name orderings.'
+                )
+        
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        return ordering
+    
+    def get_approximate_count(self, queryset):
+        """
+        Count at most max_count rows; returns (count, is_approximate)
+        """
+        count = queryset.order_by()[:self.max_count + 1].count()
+        if count > self.max_count:
+            return self.max_count, True
+        return count, False
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def encode_cursor(self, obj, reverse):
+        values = [self._dump(self._value(obj, field.lstrip('-'))) for field in self.ordering]
+        token = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+        url = remove_query_param(self.base_url, self.legacy_page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            token = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw_values = token['p']
+            reverse = bool(token['r'])
+            if len(raw_values) != len(self.ordering):
+                raise ValueError('Cursor does not match ordering')
+            position = [
+                self._load(field.lstrip('-'), value)
+                for field, value in zip(self.ordering, raw_values)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        
+        return position, reverse
+    
+    def _after(self, ordering, position):
+        """
+        Rows strictly after position: (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+    
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+    
+    @staticmethod
+    def _value(obj, name):
+        if name == 'pk':
+            return obj.pk
+        for part in name.split('__'):
+            obj = getattr(obj, part)
+        return obj
+    
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (Decimal, uuid.UUID)):
+            return str(value)
+        return value
+    
+    def _load(self, name, value):
+        if value is None or '__' in name:
+            return value
+        try:
+            field = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. search relevance) round-trip as JSON values
+            return value
+        return field.to_python(value)
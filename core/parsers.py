@@ -0,0 +1,40 @@
+"""
+Fast JSON parser
+orjson-backed drop-in for rest_framework.parsers.JSONParser
+"""
+import codecs
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from core.renderers import FastJSONRenderer, orjson
+
+# orjson reads integers beyond 64 bits as floats; such bodies take the stock path
+LONG_NUMBER_RE = re.compile(rb'\d{20}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes UTF-8 bodies with orjson when available
+
+    Bodies orjson rejects, or that contain 20+ digit runs (which could be
+    integers beyond 64 bits), are parsed by the stock parser, so results
+    and error messages match JSONParser.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if not LONG_NUMBER_RE.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,54 @@
+"""
+Fast JSON renderer
+orjson-backed drop-in for rest_framework.renderers.JSONRenderer
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when available
+
+    Output is byte-for-byte identical to JSONRenderer except that:
+    - floats needing an exponent are written as 1e16 / 0.00001 rather than
+      1e+16 / 1e-05 (same value)
+    - NaN and Infinity render as null instead of raising
+
+    Indented output, ensure_ascii, non-compact settings and integers beyond
+    64 bits fall back to the stock encoder. Decimal, datetime and other
+    non-native types go through the same DRF encoder as JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            # Let the stock encoder handle (or reject) what orjson cannot
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape U+2028/U+2029 as JSONRenderer does, keeping output a strict
+        # JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
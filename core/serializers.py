@@ -0,0 +1,196 @@
+"""
+Reusable serializer mixins
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from core.cache import cache_key_generator, get_cache
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def parse_field_paths(value):
+    """
+    Comma-separated dotted paths as a tree:
+    'id,provider.email' -> {'id': {}, 'provider': {'email': {}}}
+    """
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients choose fields with ?fields= and nested objects with ?expand=
+
+    `?fields=id,title,provider.email` keeps only those fields (dotted paths
+    prune nested serializers that use this mixin as well). `?expand=provider`
+    swaps a field for the serializer in `Meta.expandable_fields`, e.g.
+    {'provider': UserSerializer}. Selections can also be passed to the
+    constructor as `fields=` / `expand=` trees or strings. Query parameters
+    apply to the top-level serializer of read-only requests; unknown names
+    are a validation error.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.requested_fields = self.as_tree(kwargs.pop('fields', None))
+        self.requested_expand = self.as_tree(kwargs.pop('expand', None))
+        self.selection_prefix = ''
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def as_tree(value):
+        if value is None or isinstance(value, dict):
+            return value
+        return parse_field_paths(value)
+
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_field_selection(self):
+        """
+        (fields tree or None for all, expand tree) for this serializer
+        """
+        requested, expand = self.requested_fields, self.requested_expand
+        request = self.context.get('request')
+        if self.is_top_level() and request is not None and request.method in SAFE_METHODS:
+            params = request.query_params
+            if requested is None and params.get(FIELDS_QUERY_PARAM):
+                requested = parse_field_paths(params[FIELDS_QUERY_PARAM])
+            if expand is None and params.get(EXPAND_QUERY_PARAM):
+                expand = parse_field_paths(params[EXPAND_QUERY_PARAM])
+        return requested or None, expand or {}
+
+    def unknown(self, param, names):
+        paths = ', '.join(sorted(self.selection_prefix + name for name in names))
+        raise serializers.ValidationError({param: [f'Unknown field(s): {paths}']})
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self.get_field_selection()
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        if set(expand) - set(expandable) - set(fields):
+            self.unknown(EXPAND_QUERY_PARAM, set(expand) - set(expandable) - set(fields))
+        for name in expand:
+            if name in expandable:
+                fields[name] = expandable[name](read_only=True)
+
+        if requested is not None:
+            if set(requested) - set(fields):
+                self.unknown(FIELDS_QUERY_PARAM, set(requested) - set(fields))
+            fields = type(fields)(
+                (name, field) for name, field in fields.items() if name in requested
+            )
+
+        # Hand nested selections down to nested serializers
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            nested_fields = requested.get(name) if requested else None
+            if not isinstance(nested, SparseFieldsetMixin):
+                if nested_fields:
+                    self.unknown(FIELDS_QUERY_PARAM, [f'{name}.{child}' for child in nested_fields])
+                if name in expand and name not in expandable:
+                    self.unknown(EXPAND_QUERY_PARAM, [name])
+                continue
+            if nested_fields:
+                nested.requested_fields = nested_fields
+            if expand.get(name):
+                nested.requested_expand = expand[name]
+            nested.selection_prefix = f'{self.selection_prefix}{name}.'
+        return fields
+
+
+def resolve_path(instance, path):
+    """
+    Value at a dotted attribute path, or None if any step is missing
+    """
+    value = instance
+    for attr in path.split('.'):
+        try:
+            value = getattr(value, attr)
+        except ObjectDoesNotExist:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+class FragmentCacheMixin:
+    """
+    Cache each instance's representation, keyed by its version
+
+    `Meta.fragment_version` lists dotted paths whose values change whenever
+    the representation does, e.g. ['updated_at', 'provider.updated_at'], so
+    entries never need invalidating. Set `Meta.list_serializer_class` to
+    FragmentCachedListSerializer. Representations narrowed by ?fields= or
+    ?expand= are not cached. Keys include the request's scheme and host,
+    as file and hyperlinked fields render absolute URLs from them.
+    """
+    fragment_timeout = 3600
+
+    def fragment_cache_enabled(self):
+        if not getattr(self.Meta, 'fragment_version', None):
+            return False
+        if isinstance(self, SparseFieldsetMixin):
+            requested, expand = self.get_field_selection()
+            return requested is None and not expand
+        return True
+
+    def fragment_origin(self):
+        request = self.context.get('request')
+        if request is None:
+            return ''
+        return f'{request.scheme}://{request.get_host()}'
+
+    def fragment_key(self, instance):
+        versions = [resolve_path(instance, path) for path in self.Meta.fragment_version]
+        key = cache_key_generator(self.fragment_origin(), *versions)
+        return f'fragment:{type(self).__name__}:{instance.pk}:{key}'
+
+    def get_eager_loading_paths(self):
+        """
+        Version paths are read outside the declared fields
+        """
+        if not self.fragment_cache_enabled():
+            return []
+        return list(self.Meta.fragment_version)
+
+
+class FragmentCachedListSerializer(serializers.ListSerializer):
+    """
+    List serializer that assembles rows from the fragment cache
+
+    One get_many fetches every row's cached representation; only misses
+    are serialized, and they are written back with one set_many.
+    """
+
+    def to_representation(self, data):
+        if not self.child.fragment_cache_enabled():
+            return super().to_representation(data)
+
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        keys = [self.child.fragment_key(item) for item in items]
+        store = get_cache()
+        cached = store.get_many(keys)
+
+        missing = {}
+        representation = []
+        for item, key in zip(items, keys):
+            if key not in cached and key not in missing:
+                missing[key] = self.child.to_representation(item)
+            representation.append(cached.get(key, missing.get(key)))
+
+        if missing:
+            store.set_many(missing, self.child.fragment_timeout)
+        return representation
@@ -0,0 +1,284 @@
+"""
+Two-tier cache
+In-process LRU (bounded by bytes and entries, with TTL) in front of the
+shared Django cache, kept coherent across processes through Redis pub/sub
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from core.counters import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+class LocalLRUCache:
+    """
+    Thread-safe LRU of pickled values
+
+    Values are stored pickled, so callers get a private copy exactly as
+    they would from Redis, and the byte bound is the real payload size.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=10000, timeout=30):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires, size, payload)
+        self._bytes = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] <= time.monotonic():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            payload = item[2]
+        return pickle.loads(payload)
+
+    def set(self, key, value, timeout=None):
+        """
+        Store a value for at most the local timeout; values larger than
+        the whole cache are not stored
+        """
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(payload) + len(key)
+        ttl = self.timeout if timeout is None else min(timeout, self.timeout)
+
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes or ttl <= 0:
+                return False
+
+            self._data[key] = (time.monotonic() + ttl, size, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+
+class TieredCache:
+    """
+    L1 in-process cache in front of the shared (L2) Django cache
+
+    Reads try L1 first and fill it from L2. Writes go to L2, update the
+    local L1 and publish the key on a Redis channel; every other process
+    drops it from its own L1. L1 entries live at most `timeout` seconds, which
+    bounds staleness if an invalidation message is lost. Without Redis,
+    L1 is process-local and only the TTL keeps it fresh.
+    """
+
+    def __init__(self, local, channel='cache:invalidate', remote=cache):
+        self.local = local
+        self.channel = channel
+        self.remote = remote
+
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+        self._pid = None
+        self._origin = None
+        self._listener = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            LocalLRUCache(
+                max_bytes=settings.CACHE_L1_MAX_BYTES,
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                timeout=settings.CACHE_L1_TIMEOUT,
+            ),
+            channel=settings.CACHE_INVALIDATION_CHANNEL,
+        )
+
+    def count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def ensure_listener(self):
+        """
+        Start the invalidation listener once per process (also after fork)
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child must not trust entries inherited from its parent
+            self.local.clear()
+            self._pid = os.getpid()
+            self._origin = uuid.uuid4().hex
+
+            if get_redis_client() is None:
+                return
+            self._listener = threading.Thread(
+                target=self.listen,
+                name='cache-invalidation',
+                daemon=True
+            )
+            self._listener.start()
+
+    def listen(self):
+        """
+        Apply invalidations published by other processes; reconnects forever
+        """
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything cached before subscribing may have missed messages
+                self.local.clear()
+                delay = RECONNECT_DELAY
+
+                for message in pubsub.listen():
+                    self.apply_invalidation(json.loads(message['data']))
+            except Exception:
+                logger.warning('Cache invalidation listener disconnected; retrying in %ss', delay)
+                self.local.clear()
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def apply_invalidation(self, data):
+        """
+        Drop keys another process changed
+        """
+        if data.get('origin') == self._origin:
+            return
+        for key in data.get('keys', []):
+            self.local.delete(key)
+        self.count('invalidations_received')
+
+    def publish(self, keys):
+        redis = get_redis_client()
+        if redis is None:
+            return
+        try:
+            redis.publish(self.channel, json.dumps({'origin': self._origin, 'keys': keys}))
+            self.count('invalidations_sent')
+        except Exception:
+            logger.warning('Could not publish cache invalidation for %s keys', len(keys))
+
+    def get(self, key, default=None):
+        self.ensure_listener()
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self.count('l1_hits')
+            return value
+        self.count('l1_misses')
+
+        value = self.remote.get(key, _MISSING)
+        if value is _MISSING:
+            self.count('l2_misses')
+            return default
+        self.count('l2_hits')
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        self.ensure_listener()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        self.count('l1_hits', len(found))
+        self.count('l1_misses', len(missing))
+
+        if missing:
+            remote = self.remote.get_many(missing)
+            self.count('l2_hits', len(remote))
+            self.count('l2_misses', len(missing) - len(remote))
+            for key, value in remote.items():
+                self.local.set(key, value)
+            found.update(remote)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.ensure_listener()
+        self.remote.set(key, value, timeout)
+        self.local.set(key, value, None if timeout is DEFAULT_TIMEOUT else timeout)
+        self.publish([key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT):
+        self.ensure_listener()
+        self.remote.set_many(data, timeout)
+        for key, value in data.items():
+            self.local.set(key, value, None if timeout is DEFAULT_TIMEOUT else timeout)
+        self.publish(list(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        # L1 never holds misses, so a successful add needs no invalidation
+        return self.remote.add(key, value, timeout)
+
+    def incr(self, key, delta=1):
+        self.ensure_listener()
+        value = self.remote.incr(key, delta)
+        self.local.delete(key)
+        self.publish([key])
+        return value
+
+    def delete(self, key):
+        self.ensure_listener()
+        self.remote.delete(key)
+        self.local.delete(key)
+        self.publish([key])
+
+    def stats(self):
+        """
+        Hit/miss counters per tier for this process, plus L1 occupancy
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        for stat in ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'):
+            stats.setdefault(stat, 0)
+        stats['l1'] = self.local.stats()
+        stats['pid'] = os.getpid()
+        return stats
@@ -0,0 +1,113 @@
+"""
+Dirty-field tracking
+Remembers the saved values of selected model fields so signal handlers can
+tell what a save actually changed without re-reading the row
+"""
+from functools import lru_cache
+
+SAVED_VALUES = '_tracked_values'
+
+
+@lru_cache(maxsize=None)
+def tracked_attnames(model):
+    """
+    {field name: attribute name} for a model's tracked_fields
+    """
+    return {name: model._meta.get_field(name).attname for name in model.tracked_fields}
+
+
+class FieldTracker:
+    """
+    Saved values of one instance's tracked fields
+
+    Values are captured when the instance is loaded and after every save.
+    Fields deferred at load time have no saved value and count as changed
+    once they are assigned, so callers never miss a real change.
+    """
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.attnames = tracked_attnames(type(instance))
+        self.saved = instance.__dict__.setdefault(SAVED_VALUES, {})
+
+    def current(self, field):
+        return self.instance.__dict__.get(self.attnames[field])
+
+    def loaded(self, field):
+        return self.attnames[field] in self.instance.__dict__
+
+    def reset(self, fields=None):
+        """
+        Take the in-memory values (of fields, default all) as saved
+        """
+        if fields is None:
+            fields = self.attnames
+        for field in fields:
+            if field in self.attnames and self.loaded(field):
+                self.saved[field] = self.current(field)
+
+    def has_changed(self, field):
+        """
+        True if the field differs from its saved value; always True for
+        unsaved instances
+        """
+        if field not in self.attnames:
+            raise ValueError(f'{field!r} is not tracked')
+        if self.instance._state.adding:
+            return True
+        if field not in self.saved:
+            return self.loaded(field)
+        return self.current(field) != self.saved[field]
+
+    def known(self, field):
+        """
+        True if the saved value of the field is known (not deferred at load)
+        """
+        return not self.instance._state.adding and field in self.saved
+
+    def previous(self, field):
+        """
+        Saved value of the field; None for unsaved instances
+        """
+        if self.instance._state.adding:
+            return None
+        return self.saved.get(field)
+
+    def changed(self):
+        """
+        {field: saved value} for every tracked field that changed
+        """
+        return {
+            field: self.previous(field)
+            for field in self.attnames
+            if self.has_changed(field)
+        }
+
+
+class FieldTrackerMixin:
+    """
+    Model mixin adding `instance.tracker` for the fields in tracked_fields
+
+    post_save handlers see the values from before the save; the tracker is
+    reset once the save (and its signals) are done. QuerySet.update() does
+    not go through here, so code using it tracks changes itself.
+    """
+    tracked_fields = ()
+
+    @property
+    def tracker(self):
+        return FieldTracker(self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.tracker.reset()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.tracker.reset(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.tracker.reset(fields)